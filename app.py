@@ -5,10 +5,11 @@ Clean, maintainable architecture met proper separation of concerns
 """
 
 from flask import Flask
-import os
 
 # Import onze nieuwe modules
-from models.database import init_database
+from models.database import init_database, configure_database, close_db_connection
+from models.repository import configure_repository
+from services.hash_filter import configure_hash_filter
 from routes.main import main_bp
 from routes.import_routes import import_bp  
 from routes.transaction_routes import transaction_bp
@@ -21,15 +22,33 @@ def create_app():
     
     # Configuration
     app.secret_key = 'jouw_geheime_sleutel_hier'  # TODO: Move to config.py
-    app.config['UPLOAD_FOLDER'] = 'uploads'
+    app.config['DATABASE'] = 'transacties.db'  # ':memory:' for a shared in-memory database
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
+    app.config['HASH_FORMAAT'] = 'hex'  # 'blob32' or 'blob16' stores compact binary hashes
+    app.config['HASH_FILTER'] = 'exact'  # 'bloom' for a smaller prefilter, None to disable
+    app.config['HASH_FILTER_FOUT_KANS'] = 0.001  # false-positive rate of the Bloom filter
+    app.config['SQLITE_SYNCHRONOUS'] = 'NORMAL'  # 'FULL' for an fsync on every commit
+    app.config['SQLITE_CACHE_SIZE'] = -64000  # page cache: negative is KiB, positive is pages
+    app.config['SQLITE_MMAP_SIZE'] = 256 * 1024 * 1024  # bytes of the database file to memory-map
+    app.config['SQLITE_TEMP_STORE'] = 'MEMORY'  # temp tables and sort spills in memory
+    app.config['QUERY_TIMING'] = False  # time every repository query, see /reports/query-statistieken
+    app.config['STREAM_TEMPLATES'] = True  # send long tables (transacties, suggesties) while they render
     
-    # Ensure upload folder exists
-    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    # Connection pragmas; every connection runs in WAL mode, so reads continue during imports
+    configure_database(pad=app.config['DATABASE'],
+                       synchronous=app.config['SQLITE_SYNCHRONOUS'],
+                       cache_size=app.config['SQLITE_CACHE_SIZE'],
+                       mmap_size=app.config['SQLITE_MMAP_SIZE'],
+                       temp_store=app.config['SQLITE_TEMP_STORE'])
+    
+    configure_repository(timing=app.config['QUERY_TIMING'])
     
     # Initialize database
     with app.app_context():
-        init_database()
+        init_database(hash_formaat=app.config['HASH_FORMAAT'])
+    
+    # In-memory duplicate prefilter for imports, loaded lazily on first use
+    configure_hash_filter(app.config['HASH_FILTER'], app.config['HASH_FILTER_FOUT_KANS'])
     
     # Register blueprints - modular route organization
     app.register_blueprint(main_bp)
@@ -38,6 +57,9 @@ def create_app():
     app.register_blueprint(category_bp, url_prefix='/categories')
     app.register_blueprint(report_bp, url_prefix='/reports')
     
+    # One connection per request, closed (and rolled back if uncommitted) afterwards
+    app.teardown_appcontext(close_db_connection)
+    
     return app
 
 # Application instance
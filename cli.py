@@ -0,0 +1,203 @@
+"""
+ING Transactie Verwerker - Command Line
+=======================================
+Bulk import and reports without the web server. Only the models and
+services are imported (no Flask, no blueprints), so it starts fast:
+
+    python cli.py importeer exports/ --jobs 4
+    python cli.py importeer januari.csv februari.xml --dry-run
+    python cli.py kruistabel --jaar 2024
+    python cli.py kruistabel --van 2023-07 --tot 2024-06
+    python cli.py dashboard --jaar 2024 --maand 6
+    python cli.py migreer
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from models.database import (init_database, configure_database, get_db_connection, close_db_connection,
+                             DEFAULT_DATABASE)
+from models.repository import configure_repository, query_statistieken
+from models.migrations import schema_versie
+from services.hash_filter import configure_hash_filter
+from services.parser_registry import BESTANDSEXTENSIES
+from services.csv_processor import process_ing_files, BATCH_SIZE
+from services import rapportage
+
+# Files picked up when a directory is given
+IMPORT_EXTENSIES = BESTANDSEXTENSIES + ('.zip',)
+
+def verzamel_bestanden(paden):
+    """
+    Expand the given paths into the files to import
+    
+    Directories are searched recursively for statement files and ZIP
+    archives, in sorted order so older exports usually go first.
+    
+    Args:
+        paden (list): Files and directories
+    
+    Returns:
+        list: File paths
+    """
+    bestanden = []
+    for pad in paden:
+        if os.path.isdir(pad):
+            for map_pad, mappen, namen in os.walk(pad):
+                mappen.sort()
+                bestanden.extend(os.path.join(map_pad, naam) for naam in sorted(namen)
+                                 if naam.lower().endswith(IMPORT_EXTENSIES))
+        elif os.path.isfile(pad):
+            bestanden.append(pad)
+        else:
+            raise FileNotFoundError(f"Bestand of map niet gevonden: {pad}")
+    return bestanden
+
+def importeer(args):
+    """Import files or directories in bulk and print the throughput"""
+    bestanden = verzamel_bestanden(args.paden)
+    if not bestanden:
+        print('Geen bestanden gevonden', file=sys.stderr)
+        return 1
+    
+    configure_hash_filter(None if args.hash_filter == 'geen' else args.hash_filter)
+    
+    def toon_voortgang(stats):
+        print(f"\r{stats['rijen']} rijen, {stats['imported']} nieuw, "
+              f"{stats['duplicates']} duplicaten, {stats['errors']} fouten",
+              end='', file=sys.stderr, flush=True)
+    
+    grootte = sum(os.path.getsize(bestand) for bestand in bestanden)
+    start = time.perf_counter()
+    result = process_ing_files(bestanden, jobs=args.jobs,
+                               progress_callback=toon_voortgang if args.voortgang else None,
+                               batch_size=args.batch_size, dry_run=args.dry_run)
+    duur = time.perf_counter() - start
+    if args.voortgang:
+        print(file=sys.stderr)
+    
+    rijen = result['imported'] + result['duplicates'] + result['errors']
+    result.update({
+        'dry_run': args.dry_run,
+        'bestanden': len(bestanden),
+        'bytes': grootte,
+        'rijen': rijen,
+        'seconden': round(duur, 3),
+        'rijen_per_seconde': round(rijen / duur) if duur else None,
+        'mb_per_seconde': round(grootte / duur / 1024 / 1024, 2) if duur else None
+    })
+    
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    else:
+        print(f"{'Proefimport' if args.dry_run else 'Import'} van {len(bestanden)} bestand(en), "
+              f"{grootte / 1024 / 1024:.1f} MB in {duur:.2f} s")
+        print(f"  {rijen} rijen: {result['imported']} nieuw, {result['duplicates']} duplicaten, "
+              f"{result['errors']} fouten")
+        if duur:
+            print(f"  {result['rijen_per_seconde']} rijen/s, {result['mb_per_seconde']} MB/s")
+        for bestandsnaam in result['bekende_bestanden']:
+            print(f"  {bestandsnaam} is al eerder geïmporteerd en is overgeslagen")
+        for bestandsnaam, aantal in result['hervat']:
+            print(f"  Import van {bestandsnaam} hervat na {aantal} eerder verwerkte rijen")
+        for error in result['error_details'][:args.max_fouten]:
+            print(f"  {error}", file=sys.stderr)
+    
+    return 1 if result['errors'] else 0
+
+def kruistabel(args):
+    """Print the kruistabel of one year, or of a range of months, as JSON"""
+    if args.jaar:
+        data = rapportage.kruistabel(args.jaar)
+    elif args.van and args.tot:
+        try:
+            data = rapportage.kruistabel_periode(*args.van, *args.tot)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+    else:
+        print('Geef --jaar, of --van en --tot', file=sys.stderr)
+        return 2
+    
+    print(json.dumps(data, indent=2, ensure_ascii=False))
+    return 0
+
+def dashboard(args):
+    """Print the dashboard aggregates of one period as JSON"""
+    data = rapportage.dashboard(args.jaar, args.maand)
+    
+    print(json.dumps(data, indent=2, ensure_ascii=False))
+    return 0
+
+def migreer(args):
+    """Report the schema version and the migrations main() just applied"""
+    versie = schema_versie(get_db_connection())
+    
+    if args.json:
+        print(json.dumps({'schema_versie': versie,
+                          'uitgevoerd': [{'versie': v, 'beschrijving': b} for v, b in args.migraties]},
+                         indent=2, ensure_ascii=False))
+    else:
+        for v, beschrijving in args.migraties:
+            print(f"Migratie {v} uitgevoerd: {beschrijving}")
+        print(f"Schemaversie {versie}")
+    return 0
+
+def maak_parser():
+    """Command line arguments of the subcommands"""
+    parser = argparse.ArgumentParser(description='ING transacties importeren en rapporteren zonder webserver')
+    parser.add_argument('--database', default=DEFAULT_DATABASE, help='Pad van de database')
+    parser.add_argument('--timing', action='store_true', help='Tijd per query tonen op stderr')
+    subparsers = parser.add_subparsers(dest='commando', required=True)
+    
+    imp = subparsers.add_parser('importeer', help='Bestanden of mappen met exports importeren')
+    imp.add_argument('paden', nargs='+', help='CSV-, CAMT.053-, MT940- of ZIP-bestanden, of mappen daarmee')
+    imp.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                     help='Aantal parserprocessen (standaard: aantal CPU-kernen)')
+    imp.add_argument('--dry-run', action='store_true',
+                     help='Alles verwerken maar niets opslaan')
+    imp.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rijen per batch')
+    imp.add_argument('--hash-filter', choices=('exact', 'bloom', 'geen'), default='exact',
+                     help='Duplicaten-voorfilter in het geheugen')
+    imp.add_argument('--voortgang', action='store_true', help='Voortgang tonen op stderr')
+    imp.add_argument('--json', action='store_true', help='Resultaat als JSON')
+    imp.add_argument('--max-fouten', type=int, default=20, help='Maximaal aantal getoonde fouten')
+    imp.set_defaults(functie=importeer)
+    
+    kruis = subparsers.add_parser('kruistabel', help='Kruistabel van een jaar of een reeks maanden als JSON')
+    kruis.add_argument('--jaar', type=int)
+    kruis.add_argument('--van', type=rapportage.lees_jaar_maand, metavar='JJJJ-MM', help='Eerste maand')
+    kruis.add_argument('--tot', type=rapportage.lees_jaar_maand, metavar='JJJJ-MM', help='Laatste maand')
+    kruis.set_defaults(functie=kruistabel)
+    
+    dash = subparsers.add_parser('dashboard', help='Dashboardcijfers als JSON')
+    dash.add_argument('--jaar', type=int, help='Laatste jaar van de periode (standaard: meest recente maand)')
+    dash.add_argument('--maand', type=int, choices=range(1, 13), metavar='MAAND',
+                      help='Laatste maand van de periode')
+    dash.set_defaults(functie=dashboard)
+    
+    mig = subparsers.add_parser('migreer', help='Database bijwerken naar het nieuwste schema')
+    mig.add_argument('--json', action='store_true', help='Resultaat als JSON')
+    mig.set_defaults(functie=migreer)
+    
+    return parser
+
+def main(argv=None):
+    """Entry point; returns the exit code"""
+    args = maak_parser().parse_args(argv)
+    configure_database(pad=args.database)
+    configure_repository(timing=args.timing)
+    # Every command first brings the database up to the current schema
+    args.migraties = init_database()
+    try:
+        return args.functie(args)
+    finally:
+        close_db_connection()
+        if args.timing:
+            print(json.dumps(query_statistieken(), indent=2), file=sys.stderr)
+
+if __name__ == '__main__':
+    sys.exit(main())
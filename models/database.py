@@ -5,52 +5,221 @@ Clean separation of database concerns
 """
 
 import sqlite3
+import threading
+from services.hash_generator import HASH_FORMATEN, DEFAULT_HASH_FORMAAT
+from .migrations import voer_migraties_uit, begin_schrijven, INSERT_TRIGGERS, MIGRATIE_BATCH_SIZE
 
-def init_database():
-    """Initialize database and create tables if they don't exist"""
-    conn = sqlite3.connect('transacties.db')
+DEFAULT_DATABASE = 'transacties.db'
+
+# ':memory:' becomes one shared in-memory database, so every connection
+# (request threads, import jobs) sees the same tables
+GEHEUGEN_URI = 'file:transacties_geheugen?mode=memory&cache=shared'
+
+# Prepared statements kept per connection; the repository's SQL constants
+# are found here again on every request instead of being compiled anew
+STATEMENT_CACHE = 256
+
+# Pragmas applied to every connection. WAL lets the dashboards keep reading
+# while an import writes; NORMAL is durable enough in WAL mode and avoids an
+# fsync per commit. cache_size is negative for KiB, mmap_size is in bytes.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000  # ms a writer waits for another writer's lock
+}
+
+_database = DEFAULT_DATABASE
+_pragmas = dict(DEFAULT_PRAGMAS)
+_thread_connections = threading.local()
+_geheugen_anker = None  # keeps the shared in-memory database alive
+
+def configure_database(pad=None, **pragmas):
+    """
+    Choose the database file and override pragmas for connections opened from now on
+    
+    Args:
+        pad (str): Path of the database file, or ':memory:' for a shared
+            in-memory database (None keeps the current path)
+        **pragmas: Pragma names and values, e.g. synchronous='FULL';
+            None restores the default of that pragma
+    """
+    global _database, _geheugen_anker
+    if pad is not None:
+        _database = pad
+        if pad == ':memory:' and _geheugen_anker is None:
+            _geheugen_anker = sqlite3.connect(GEHEUGEN_URI, uri=True)
+    
+    for naam, waarde in pragmas.items():
+        if naam not in DEFAULT_PRAGMAS:
+            raise ValueError(f"Onbekende pragma: {naam}")
+        _pragmas[naam] = DEFAULT_PRAGMAS[naam] if waarde is None else waarde
+
+def open_connection():
+    """
+    Open a new connection with the configured pragmas
+    
+    For work that needs a connection of its own, such as an import job
+    that commits in chunks; request handlers use get_db_connection().
+    
+    Returns:
+        sqlite3.Connection: The new connection, to be closed by the caller
+    """
+    if _database == ':memory:':
+        conn = sqlite3.connect(GEHEUGEN_URI, uri=True, cached_statements=STATEMENT_CACHE)
+    else:
+        conn = sqlite3.connect(_database, cached_statements=STATEMENT_CACHE)
+    for naam, waarde in _pragmas.items():
+        conn.execute(f"PRAGMA {naam} = {waarde}")
+    return conn
+
+def init_database(hash_formaat=None):
+    """
+    Bring the database up to the current schema version
+    
+    Creates a new database or applies the migrations an existing one has
+    not had yet (see models.migrations); called by create_app and the CLI.
+    
+    Args:
+        hash_formaat (str): Optional storage format for transacties.hash
+            (see HASH_FORMATEN); existing hashes are converted when it differs
+            from the format the database currently uses
+    
+    Returns:
+        list: (versie, beschrijving) of the migrations applied
+    """
+    conn = open_connection()
+    
+    uitgevoerd = voer_migraties_uit(conn)
+    
+    if hash_formaat and hash_formaat != get_hash_formaat(conn):
+        migrate_hash_formaat(conn, hash_formaat)
+    
+    conn.close()
+    return uitgevoerd
+
+def get_hash_formaat(conn):
+    """Storage format of transacties.hash in this database (see HASH_FORMATEN)"""
+    row = conn.execute("SELECT waarde FROM instellingen WHERE sleutel = 'hash_formaat'").fetchone()
+    return row[0] if row else DEFAULT_HASH_FORMAAT
+
+def migrate_hash_formaat(conn, nieuw_formaat, batch_size=MIGRATIE_BATCH_SIZE):
+    """
+    Convert every stored transaction hash to another storage format, batch by batch
+    
+    Hex hashes can become 32- or 16-byte BLOBs and 32-byte BLOBs can be
+    truncated to 16 bytes or turned back into hex. A 16-byte digest cannot be
+    expanded again. Rows are converted in id-range batches with a commit per
+    batch; the new format is only recorded once every row has been converted,
+    so an interrupted run is simply repeated on the next start.
+    
+    Args:
+        conn (sqlite3.Connection): Open database connection
+        nieuw_formaat (str): Target format, one of HASH_FORMATEN
+        batch_size (int): Number of rows per transaction
+        
+    Returns:
+        int: Number of rows converted
+    """
+    if nieuw_formaat not in HASH_FORMATEN:
+        raise ValueError(f"Onbekend hash formaat: {nieuw_formaat}")
+    
+    huidig_formaat = get_hash_formaat(conn)
+    if huidig_formaat == 'blob16' and nieuw_formaat != 'blob16':
+        raise ValueError('Hashes van 16 bytes kunnen niet terug worden omgezet')
+    
+    lengte = HASH_FORMATEN[nieuw_formaat]
+    
+    def converteer(oude_hash):
+        # Rows left over from an interrupted run may already be converted
+        digest = bytes.fromhex(oude_hash) if isinstance(oude_hash, str) else oude_hash
+        return digest.hex() if lengte is None else digest[:lengte]
+    
     cursor = conn.cursor()
+    cursor.execute('SELECT MIN(id), MAX(id) FROM transacties')
+    laagste_id, hoogste_id = cursor.fetchone()
     
-    # Tabel voor categorieën
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS categorien (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            naam TEXT UNIQUE NOT NULL,
-            beschrijving TEXT,
-            kleur TEXT DEFAULT '#3498db'
-        )
-    ''')
-    
-    # Tabel voor transacties
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS transacties (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            datum DATE NOT NULL,
-            jaar INTEGER NOT NULL,
-            maand INTEGER NOT NULL,
-            dag INTEGER NOT NULL,
-            naam TEXT NOT NULL,
-            rekening TEXT NOT NULL,
-            tegenrekening TEXT,
-            code TEXT NOT NULL,
-            bedrag REAL NOT NULL,
-            mededelingen TEXT,
-            saldo_na_mutatie REAL,
-            tag TEXT,
-            categorie_id INTEGER,
-            hash TEXT UNIQUE NOT NULL,
-            FOREIGN KEY (categorie_id) REFERENCES categorien (id)
-        )
-    ''')
-    
-    # Indexes voor performance
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_datum ON transacties(datum)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_categorie ON transacties(categorie_id)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_hash ON transacties(hash)')
+    omgezet = 0
+    if laagste_id is not None:
+        for start_id in range(laagste_id, hoogste_id + 1, batch_size):
+            cursor.execute('SELECT id, hash FROM transacties WHERE id >= ? AND id < ?',
+                           (start_id, start_id + batch_size))
+            nieuwe_hashes = [(converteer(oude_hash), transactie_id)
+                             for transactie_id, oude_hash in cursor.fetchall()]
+            cursor.executemany('UPDATE transacties SET hash = ? WHERE id = ?', nieuwe_hashes)
+            omgezet += len(nieuwe_hashes)
+            conn.commit()
     
+    cursor.execute("INSERT OR REPLACE INTO instellingen (sleutel, waarde) VALUES ('hash_formaat', ?)",
+                   (nieuw_formaat,))
     conn.commit()
-    conn.close()
+    
+    return omgezet
+
+def pauzeer_insert_triggers(conn):
+    """
+    Drop the per-row insert triggers for the rest of the write transaction
+    
+    For bulk imports, where a trigger call per row costs more than the
+    insert itself. The caller must call herstel_insert_triggers() before it
+    commits: the drop and the restore fall in one transaction, so other
+    connections never see the triggers missing.
+    
+    Args:
+        conn (sqlite3.Connection): Open database connection; a write
+            transaction is started if none is open
+    
+    Returns:
+        tuple: (highest transaction id before the import, {trigger name: CREATE statement})
+    """
+    begin_schrijven(conn)
+    vanaf_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM transacties').fetchone()[0]
+    
+    plaatsen = ', '.join('?' * len(INSERT_TRIGGERS))
+    triggers = dict(conn.execute(f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' "
+                                 f"AND name IN ({plaatsen})", tuple(INSERT_TRIGGERS)))
+    for naam in triggers:
+        conn.execute(f'DROP TRIGGER {naam}')
+    return vanaf_id, triggers
+
+def herstel_insert_triggers(conn, gepauzeerd):
+    """
+    Bring the derived tables up to date and recreate the paused insert triggers
+    
+    New rows get AUTOINCREMENT ids, so the rows inserted since the pause are
+    exactly those after its highest id; each derived table takes them in one
+    set-based statement (see INSERT_TRIGGERS).
+    
+    Args:
+        conn (sqlite3.Connection): Connection that paused the triggers
+        gepauzeerd (tuple): Return value of pauzeer_insert_triggers()
+    """
+    vanaf_id, triggers = gepauzeerd
+    for naam, sql in triggers.items():
+        conn.execute(INSERT_TRIGGERS[naam], (vanaf_id,))
+        conn.execute(sql)
 
 def get_db_connection():
-    """Get database connection - helper function"""
-    return sqlite3.connect('transacties.db')
\ No newline at end of file
+    """
+    The connection of the current thread, opened on first use
+    
+    Every request (and every CLI command) reuses one connection instead of
+    connecting per query; close_db_connection() ends it, which rolls back
+    anything the caller did not commit.
+    
+    Returns:
+        sqlite3.Connection: Connection owned by this thread; do not close it
+    """
+    conn = getattr(_thread_connections, 'conn', None)
+    if conn is None:
+        conn = _thread_connections.conn = open_connection()
+    return conn
+
+def close_db_connection(exception=None):
+    """Close the connection of the current thread, if it has one (teardown handler)"""
+    conn = getattr(_thread_connections, 'conn', None)
+    if conn is not None:
+        _thread_connections.conn = None
+        conn.close()
\ No newline at end of file
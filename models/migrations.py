@@ -0,0 +1,463 @@
+"""
+Schema Migrations
+=================
+Versioned schema changes, tracked in PRAGMA user_version. Every migration
+runs once per database, in order; init_database() applies the ones a
+database has not had yet, so both the web app and the CLI bring an
+existing transacties.db up to date on start.
+
+Data migrations run through batch_update(): id-range batches with a commit
+per batch, so readers keep going (WAL) and an interrupted migration
+continues where it stopped on the next start. Derived tables that
+triggers keep up to date are the exception: they are filled in the same
+transaction that creates their triggers, so no write can fall in between.
+"""
+
+# Rows per transaction in data migrations
+MIGRATIE_BATCH_SIZE = 5000
+
+# Key prefix in instellingen for the progress of an unfinished batch migration
+VOORTGANG_SLEUTEL = 'migratie_voortgang:'
+
+def schema_versie(conn):
+    """Schema version of the database (0 for a database from before migrations)"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def zet_schema_versie(conn, versie):
+    """Record the schema version; PRAGMA does not take parameters, hence int()"""
+    conn.execute(f'PRAGMA user_version = {int(versie)}')
+
+def begin_schrijven(conn):
+    """Take the write lock for the rest of the migration, unless a transaction is already open"""
+    if not conn.in_transaction:
+        conn.execute('BEGIN IMMEDIATE')
+
+def batch_update(conn, naam, sql, batch_size=MIGRATIE_BATCH_SIZE):
+    """
+    Run an UPDATE (or INSERT ... SELECT) over transacties in resumable id-range batches
+    
+    The statement gets the range as two parameters (start id inclusive, end
+    id exclusive). The end of every batch is stored in instellingen in the
+    same transaction as the batch itself, so a restart skips the rows that
+    are already done. Rows added while the migration runs are written by
+    the new code and need no conversion.
+    
+    Args:
+        conn (sqlite3.Connection): Open database connection
+        naam (str): Name of the migration step, for its progress record
+        sql (str): Statement with 'id >= ? AND id < ?' in its WHERE clause
+        batch_size (int): Number of ids per transaction
+    
+    Returns:
+        int: Number of rows updated
+    """
+    sleutel = VOORTGANG_SLEUTEL + naam
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT MIN(id), MAX(id) FROM transacties')
+    laagste_id, hoogste_id = cursor.fetchone()
+    
+    bijgewerkt = 0
+    if laagste_id is not None:
+        cursor.execute('SELECT waarde FROM instellingen WHERE sleutel = ?', (sleutel,))
+        voortgang = cursor.fetchone()
+        start_id = int(voortgang[0]) if voortgang else laagste_id
+        
+        while start_id <= hoogste_id:
+            eind_id = start_id + batch_size
+            cursor.execute(sql, (start_id, eind_id))
+            bijgewerkt += cursor.rowcount
+            cursor.execute('INSERT OR REPLACE INTO instellingen (sleutel, waarde) VALUES (?, ?)',
+                           (sleutel, str(eind_id)))
+            conn.commit()
+            start_id = eind_id
+    
+    cursor.execute('DELETE FROM instellingen WHERE sleutel = ?', (sleutel,))
+    conn.commit()
+    
+    return bijgewerkt
+
+def basisschema(conn, batch_size):
+    """Version 1: the tables and indexes as they were before versioned migrations"""
+    cursor = conn.cursor()
+    
+    # Tabel voor categorieën
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS categorien (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            naam TEXT UNIQUE NOT NULL,
+            beschrijving TEXT,
+            kleur TEXT DEFAULT '#3498db'
+        )
+    ''')
+    
+    # Tabel voor transacties
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transacties (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            datum DATE NOT NULL,
+            jaar INTEGER NOT NULL,
+            maand INTEGER NOT NULL,
+            dag INTEGER NOT NULL,
+            naam TEXT NOT NULL,
+            rekening TEXT NOT NULL,
+            tegenrekening TEXT,
+            code TEXT NOT NULL,
+            bedrag REAL NOT NULL,
+            mededelingen TEXT,
+            saldo_na_mutatie REAL,
+            tag TEXT,
+            categorie_id INTEGER,
+            hash TEXT UNIQUE NOT NULL,
+            bedrag_cent INTEGER,
+            saldo_cent INTEGER,
+            FOREIGN KEY (categorie_id) REFERENCES categorien (id)
+        )
+    ''')
+    
+    # Ledger of imported export files, for skipping identical re-imports
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS import_bestanden (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bestandsnaam TEXT NOT NULL,
+            digest TEXT NOT NULL,
+            grootte INTEGER NOT NULL,
+            aantal_rijen INTEGER NOT NULL,
+            eerste_datum DATE,
+            laatste_datum DATE,
+            imported INTEGER NOT NULL DEFAULT 0,
+            duplicates INTEGER NOT NULL DEFAULT 0,
+            errors INTEGER NOT NULL DEFAULT 0,
+            geimporteerd_op TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_import_digest ON import_bestanden(digest)')
+    
+    # Progress of unfinished imports, so an interrupted import can resume
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS import_checkpoints (
+            digest TEXT PRIMARY KEY,
+            bestandsnaam TEXT NOT NULL,
+            rijen INTEGER NOT NULL,
+            imported INTEGER NOT NULL,
+            duplicates INTEGER NOT NULL,
+            errors INTEGER NOT NULL,
+            eerste_datum DATE,
+            laatste_datum DATE,
+            bijgewerkt_op TEXT NOT NULL
+        )
+    ''')
+    
+    # Database-wide settings, such as the storage format of transacties.hash
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS instellingen (
+            sleutel TEXT PRIMARY KEY,
+            waarde TEXT NOT NULL
+        )
+    ''')
+    
+    # Indexes voor performance
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_datum ON transacties(datum)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_categorie ON transacties(categorie_id)')
+    
+    # The UNIQUE constraint on hash already has its own index; idx_hash duplicated it
+    cursor.execute('DROP INDEX IF EXISTS idx_hash')
+    
+    # Databases created before the cent columns existed get them added in place
+    kolommen = [row[1] for row in cursor.execute('PRAGMA table_info(transacties)')]
+    if 'bedrag_cent' not in kolommen:
+        cursor.execute('ALTER TABLE transacties ADD COLUMN bedrag_cent INTEGER')
+    if 'saldo_cent' not in kolommen:
+        cursor.execute('ALTER TABLE transacties ADD COLUMN saldo_cent INTEGER')
+
+def bedrag_naar_centen(conn, batch_size):
+    """Version 2: fill bedrag_cent and saldo_cent from the REAL columns"""
+    batch_update(conn, 'bedrag_naar_centen', '''
+        UPDATE transacties
+        SET bedrag_cent = CAST(ROUND(bedrag * 100) AS INTEGER),
+            saldo_cent = CAST(ROUND(saldo_na_mutatie * 100) AS INTEGER)
+        WHERE id >= ? AND id < ? AND bedrag_cent IS NULL
+    ''', batch_size)
+
+def periode_sleutel(conn, batch_size):
+    """
+    Version 3: integer period key yyyymm with covering indexes
+    
+    periode is a VIRTUAL generated column, so adding it rewrites no rows and
+    every insert fills it automatically; only the indexes store it. The
+    12-month window queries become a range on periode instead of an OR over
+    jaar and maand that no index can serve.
+    """
+    cursor = conn.cursor()
+    
+    # table_xinfo, because table_info leaves generated columns out
+    kolommen = [row[1] for row in cursor.execute('PRAGMA table_xinfo(transacties)')]
+    if 'periode' not in kolommen:
+        cursor.execute('''
+            ALTER TABLE transacties
+            ADD COLUMN periode INTEGER GENERATED ALWAYS AS (jaar * 100 + maand) VIRTUAL
+        ''')
+    
+    # Dashboard windows: range on periode, categorie_id and amount read from the index
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_periode_categorie
+        ON transacties(periode, categorie_id, bedrag_cent)
+    ''')
+    # Drill-down and kruistabel per category; its prefix replaces idx_categorie
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_categorie_periode
+        ON transacties(categorie_id, periode, bedrag_cent)
+    ''')
+    cursor.execute('DROP INDEX IF EXISTS idx_categorie')
+    cursor.execute('ANALYZE transacties')
+
+# Adds one transaction to its (periode, categorie) row of maandtotalen;
+# categorie_id 0 stands for "zonder categorie", so the key has no NULLs
+MAANDTOTALEN_OPTELLEN = '''
+    INSERT INTO maandtotalen (periode, categorie_id, aantal, aantal_uitgaven, inkomsten_cent, uitgaven_cent)
+    VALUES (NEW.jaar * 100 + NEW.maand, COALESCE(NEW.categorie_id, 0), 1, COALESCE(NEW.bedrag_cent, 0) < 0,
+            MAX(COALESCE(NEW.bedrag_cent, 0), 0), MIN(COALESCE(NEW.bedrag_cent, 0), 0))
+    ON CONFLICT (periode, categorie_id) DO UPDATE SET
+        aantal = aantal + excluded.aantal,
+        aantal_uitgaven = aantal_uitgaven + excluded.aantal_uitgaven,
+        inkomsten_cent = inkomsten_cent + excluded.inkomsten_cent,
+        uitgaven_cent = uitgaven_cent + excluded.uitgaven_cent;
+'''
+MAANDTOTALEN_AFTREKKEN = '''
+    UPDATE maandtotalen SET
+        aantal = aantal - 1,
+        aantal_uitgaven = aantal_uitgaven - (COALESCE(OLD.bedrag_cent, 0) < 0),
+        inkomsten_cent = inkomsten_cent - MAX(COALESCE(OLD.bedrag_cent, 0), 0),
+        uitgaven_cent = uitgaven_cent - MIN(COALESCE(OLD.bedrag_cent, 0), 0)
+    WHERE periode = OLD.jaar * 100 + OLD.maand AND categorie_id = COALESCE(OLD.categorie_id, 0);
+    DELETE FROM maandtotalen
+    WHERE periode = OLD.jaar * 100 + OLD.maand AND categorie_id = COALESCE(OLD.categorie_id, 0) AND aantal = 0;
+'''
+# Adds the transactions after an id (parameter) to maandtotalen in one grouped
+# upsert: the initial fill, and the catch-up of a bulk import that paused the
+# insert trigger (see INSERT_TRIGGERS)
+MAANDTOTALEN_BIJTELLEN = '''
+    INSERT INTO maandtotalen (periode, categorie_id, aantal, aantal_uitgaven, inkomsten_cent, uitgaven_cent)
+    SELECT jaar * 100 + maand, COALESCE(categorie_id, 0), COUNT(*), SUM(COALESCE(bedrag_cent, 0) < 0),
+           SUM(MAX(COALESCE(bedrag_cent, 0), 0)), SUM(MIN(COALESCE(bedrag_cent, 0), 0))
+    FROM transacties
+    WHERE id > ?
+    GROUP BY 1, 2
+    ON CONFLICT (periode, categorie_id) DO UPDATE SET
+        aantal = aantal + excluded.aantal,
+        aantal_uitgaven = aantal_uitgaven + excluded.aantal_uitgaven,
+        inkomsten_cent = inkomsten_cent + excluded.inkomsten_cent,
+        uitgaven_cent = uitgaven_cent + excluded.uitgaven_cent
+'''
+
+def maandtotalen(conn, batch_size):
+    """
+    Version 4: per-month, per-category totals kept in sync by triggers
+    
+    The dashboard, kruistabel and category page read maandtotalen instead
+    of aggregating transacties, so their cost depends on the number of
+    months and categories. Triggers on insert, delete and on updates of
+    category, amount or date keep it exact, also for bulk category updates.
+    
+    Unlike the other data migrations this one is not batched: the triggers
+    and the totals of the existing rows are created in one transaction
+    that holds the write lock from the start. A row changed by another
+    connection between trigger creation and its batch would otherwise be
+    subtracted before it was ever counted. One grouped scan per database
+    is short enough to hold the lock for.
+    """
+    cursor = conn.cursor()
+    begin_schrijven(conn)
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS maandtotalen (
+            periode INTEGER NOT NULL,
+            categorie_id INTEGER NOT NULL,
+            aantal INTEGER NOT NULL,
+            aantal_uitgaven INTEGER NOT NULL,
+            inkomsten_cent INTEGER NOT NULL,
+            uitgaven_cent INTEGER NOT NULL,
+            PRIMARY KEY (periode, categorie_id)
+        ) WITHOUT ROWID
+    ''')
+    
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_maandtotalen_insert AFTER INSERT ON transacties
+        BEGIN {MAANDTOTALEN_OPTELLEN} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_maandtotalen_delete AFTER DELETE ON transacties
+        BEGIN {MAANDTOTALEN_AFTREKKEN} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_maandtotalen_update
+        AFTER UPDATE OF categorie_id, bedrag_cent, jaar, maand ON transacties
+        WHEN OLD.categorie_id IS NOT NEW.categorie_id OR OLD.bedrag_cent IS NOT NEW.bedrag_cent
+          OR OLD.jaar IS NOT NEW.jaar OR OLD.maand IS NOT NEW.maand
+        BEGIN {MAANDTOTALEN_AFTREKKEN} {MAANDTOTALEN_OPTELLEN} END
+    ''')
+    
+    # Totals of the existing transactions, rebuilt from scratch so a repeated
+    # run (or one that an earlier batched version left halfway) ends up exact
+    cursor.execute('DELETE FROM maandtotalen')
+    cursor.execute(MAANDTOTALEN_BIJTELLEN, (0,))
+    cursor.execute('DELETE FROM instellingen WHERE sleutel = ?', (VOORTGANG_SLEUTEL + 'maandtotalen',))
+
+# Columns of transacties in the full-text index; the external-content
+# 'delete' command needs exactly the values that were indexed
+ZOEKINDEX_KOLOMMEN = 'naam, mededelingen, tegenrekening'
+ZOEKINDEX_TOEVOEGEN = f'''
+    INSERT INTO transacties_zoek (rowid, {ZOEKINDEX_KOLOMMEN})
+    VALUES (NEW.id, NEW.naam, NEW.mededelingen, NEW.tegenrekening);
+'''
+ZOEKINDEX_VERWIJDEREN = f'''
+    INSERT INTO transacties_zoek (transacties_zoek, rowid, {ZOEKINDEX_KOLOMMEN})
+    VALUES ('delete', OLD.id, OLD.naam, OLD.mededelingen, OLD.tegenrekening);
+'''
+# Indexes the transactions after an id in one statement, for a bulk import
+# that paused the insert trigger: FTS5 flushes its pending terms at the end
+# of every statement, so an insert per row writes a tiny segment per row
+ZOEKINDEX_BIJWERKEN = f'''
+    INSERT INTO transacties_zoek (rowid, {ZOEKINDEX_KOLOMMEN})
+    SELECT id, {ZOEKINDEX_KOLOMMEN} FROM transacties WHERE id > ?
+'''
+
+def zoekindex(conn, batch_size):
+    """
+    Version 5: FTS5 trigram index over the searchable text columns
+    
+    The transaction search becomes a lookup in transacties_zoek instead of
+    seven LIKE '%term%' scans; the trigram tokenizer keeps substring
+    matches on merchant names working. The index reads its content from
+    transacties (external content), so only the index itself is stored.
+    Only the free-text columns are indexed: date, amount and code are
+    searched with the field filters of the search box, on their own
+    indexes, and every indexed column costs import time. Category names
+    are not indexed either: they are matched in the small categorien
+    table, so assigning or renaming a category never touches the index.
+    
+    Like maandtotalen, the index is filled in the transaction that creates
+    its triggers: an update trigger firing for a row that is not indexed
+    yet would delete entries that were never added.
+    """
+    cursor = conn.cursor()
+    begin_schrijven(conn)
+    
+    cursor.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS transacties_zoek USING fts5(
+            {ZOEKINDEX_KOLOMMEN},
+            content='transacties', content_rowid='id', tokenize='trigram'
+        )
+    ''')
+    
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_zoekindex_insert AFTER INSERT ON transacties
+        BEGIN {ZOEKINDEX_TOEVOEGEN} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_zoekindex_delete AFTER DELETE ON transacties
+        BEGIN {ZOEKINDEX_VERWIJDEREN} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_zoekindex_update
+        AFTER UPDATE OF {ZOEKINDEX_KOLOMMEN} ON transacties
+        BEGIN {ZOEKINDEX_VERWIJDEREN} {ZOEKINDEX_TOEVOEGEN} END
+    ''')
+    
+    # FTS5 merges segments of equal size as soon as 4 of them exist; every
+    # import commit adds one, so with 16 most merging happens once per
+    # dozens of commits instead of every few (a third less indexing time,
+    # searches are no slower)
+    cursor.execute("INSERT INTO transacties_zoek (transacties_zoek, rank) VALUES ('automerge', 16)")
+    
+    # Index the existing transactions from scratch, also after an earlier partial run
+    cursor.execute("INSERT INTO transacties_zoek (transacties_zoek) VALUES ('rebuild')")
+    cursor.execute('DELETE FROM instellingen WHERE sleutel = ?', (VOORTGANG_SLEUTEL + 'zoekindex',))
+
+def zoekfilter_indexen(conn, batch_size):
+    """
+    Version 6: index for the field filters of the search box (services.zoektaal)
+    
+    datum, periode and categorie already have indexes. code is mostly
+    combined with a period and an amount ("card payments over 100 last
+    quarter"), which idx_code_periode answers from the index alone.
+    Amount and counter-account filters get no index of their own: on 100k
+    rows they scan in tens of milliseconds, while every index on
+    transacties slows down each import.
+    """
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_code_periode
+        ON transacties(code, periode, bedrag_cent)
+    ''')
+    cursor.execute('ANALYZE transacties')
+
+def sorteer_indexen(conn, batch_size):
+    """
+    Version 7: index in the name order of the transaction list
+    
+    The list pages by keyset on (column, id). An index on the column holds
+    exactly that order (the rowid is its last key), so a page is a seek and
+    a short scan instead of sorting every match. datum already has one.
+    code gets none: idx_code_periode serves the code filters, and sorting
+    on code, like amount and category, is a top-N sort per page (tens of
+    milliseconds on 100k rows) rather than one more index that every
+    import has to maintain.
+    """
+    cursor = conn.cursor()
+    
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_naam ON transacties(naam)')
+    cursor.execute('ANALYZE transacties')
+
+# Per-row insert triggers that a bulk import may drop for the duration of its
+# write transaction, with the statement that then brings their derived table
+# up to date for the rows after an id (see models.database.pauzeer_insert_triggers)
+INSERT_TRIGGERS = {
+    'trg_maandtotalen_insert': MAANDTOTALEN_BIJTELLEN,
+    'trg_zoekindex_insert': ZOEKINDEX_BIJWERKEN
+}
+
+# (versie, beschrijving, functie) in order; a migration is never changed
+# once released, a later change gets a new version instead
+MIGRATIES = [
+    (1, 'Basisschema', basisschema),
+    (2, 'Bedragen in centen', bedrag_naar_centen),
+    (3, 'Periodesleutel met indexen', periode_sleutel),
+    (4, 'Maandtotalen per categorie', maandtotalen),
+    (5, 'Zoekindex op transacties', zoekindex),
+    (6, 'Index voor zoekfilters', zoekfilter_indexen),
+    (7, 'Index voor sorteren op naam', sorteer_indexen)
+]
+
+def voer_migraties_uit(conn, batch_size=MIGRATIE_BATCH_SIZE):
+    """
+    Apply every migration newer than the database's schema version
+    
+    The version is raised after each migration, so a run that stops
+    halfway repeats only the unfinished migration. Migrations are written
+    to be safe to repeat (IF NOT EXISTS, batch_update progress).
+    
+    Args:
+        conn (sqlite3.Connection): Open database connection
+        batch_size (int): Rows per transaction in data migrations
+    
+    Returns:
+        list: (versie, beschrijving) of the migrations applied
+    """
+    huidige_versie = schema_versie(conn)
+    nieuwste_versie = MIGRATIES[-1][0]
+    if huidige_versie > nieuwste_versie:
+        raise RuntimeError(f"Database heeft schemaversie {huidige_versie}, "
+                           f"deze versie van de applicatie kent tot en met {nieuwste_versie}")
+    
+    uitgevoerd = []
+    for versie, beschrijving, functie in MIGRATIES:
+        if versie <= huidige_versie:
+            continue
+        functie(conn, batch_size)
+        zet_schema_versie(conn, versie)
+        conn.commit()
+        uitgevoerd.append((versie, beschrijving))
+    
+    return uitgevoerd
@@ -0,0 +1,691 @@
+"""
+Repository - Every Query the Blueprints Run
+===========================================
+SQL lives in module-level constants, so each string is built once and the
+connection's statement cache hands back the prepared statement on every
+request. All queries go through _uitvoeren(), the one place for timing
+(and, where it pays off, caching) around a query.
+"""
+
+import threading
+import time
+from functools import lru_cache
+from .database import get_db_connection
+
+_cursors = threading.local()
+
+# Query timing per query name, switched on with configure_repository(timing=True)
+_timing_actief = False
+_query_tijden = {}
+_query_tijden_lock = threading.Lock()
+
+# A window of months as a range on the integer key periode (yyyymm), which
+# idx_periode_categorie and idx_categorie_periode serve; parameters are the
+# first and last periode of the window (see periode())
+PERIODE_FILTER = ' periode BETWEEN ? AND ? '
+PERIODE_FILTER_T = ' t.periode BETWEEN ? AND ? '
+PERIODE_FILTER_M = ' m.periode BETWEEN ? AND ? '
+
+def periode(jaar, maand):
+    """Integer period key yyyymm of a year and month"""
+    return jaar * 100 + maand
+
+def configure_repository(timing=False):
+    """
+    Switch query timing on or off
+    
+    Args:
+        timing (bool): Record the number of calls and total time per query
+    """
+    global _timing_actief
+    _timing_actief = timing
+    with _query_tijden_lock:
+        _query_tijden.clear()
+
+def query_statistieken():
+    """
+    Timing per query since timing was switched on
+    
+    Returns:
+        dict: Per query name: aantal, totaal_ms and gemiddeld_ms, slowest total first
+    """
+    with _query_tijden_lock:
+        tijden = sorted(_query_tijden.items(), key=lambda item: item[1][1], reverse=True)
+    return {naam: {'aantal': aantal,
+                   'totaal_ms': round(seconden * 1000, 3),
+                   'gemiddeld_ms': round(seconden * 1000 / aantal, 3)}
+            for naam, (aantal, seconden) in tijden}
+
+def _cursor():
+    """One cursor per thread, reused for as long as its connection is"""
+    conn = get_db_connection()
+    cursor = getattr(_cursors, 'cursor', None)
+    if cursor is None or cursor.connection is not conn:
+        cursor = _cursors.cursor = conn.cursor()
+    return cursor
+
+def _uitvoeren(naam, sql, params=(), ophalen='alle', many=False):
+    """
+    Run one named query
+    
+    Args:
+        naam (str): Name of the query, for the timing statistics
+        sql (str): One of the SQL constants of this module
+        params: Query parameters (a sequence of them when many=True)
+        ophalen (str): 'alle' for fetchall, 'een' for fetchone, 'aantal' for
+            rowcount, 'stroom' for the cursor itself, to be iterated
+        many (bool): Run the statement with executemany
+    
+    Returns:
+        list, tuple, int or sqlite3.Cursor: Depending on ophalen
+    """
+    start = time.perf_counter() if _timing_actief else None
+    
+    # A stream is read after other queries have run, so it gets a cursor of
+    # its own; its timing covers the execute, not the rows read later
+    cursor = get_db_connection().cursor() if ophalen == 'stroom' else _cursor()
+    if many:
+        cursor.executemany(sql, params)
+    else:
+        cursor.execute(sql, params)
+    
+    if ophalen == 'alle':
+        resultaat = cursor.fetchall()
+    elif ophalen == 'een':
+        resultaat = cursor.fetchone()
+    elif ophalen == 'stroom':
+        resultaat = cursor
+    else:
+        resultaat = cursor.rowcount
+    
+    if start is not None:
+        duur = time.perf_counter() - start
+        with _query_tijden_lock:
+            aantal, totaal = _query_tijden.get(naam, (0, 0.0))
+            _query_tijden[naam] = (aantal + 1, totaal + duur)
+    
+    return resultaat
+
+def commit():
+    """Commit the current request's connection"""
+    get_db_connection().commit()
+
+# --- Categories -------------------------------------------------------------
+
+CATEGORIEN_MET_TOTALEN_SQL = '''
+    SELECT c.id, c.naam, c.beschrijving, c.kleur,
+           COALESCE(SUM(m.aantal), 0) as aantal_transacties,
+           COALESCE(SUM(m.uitgaven_cent), 0) / 100.0 as totaal_uitgaven,
+           COALESCE(SUM(m.inkomsten_cent), 0) / 100.0 as totaal_inkomsten
+    FROM categorien c
+    LEFT JOIN maandtotalen m ON c.id = m.categorie_id
+    GROUP BY c.id, c.naam, c.beschrijving, c.kleur
+    ORDER BY aantal_transacties DESC, c.naam
+'''
+ALLE_CATEGORIEN_SQL = 'SELECT id, naam FROM categorien ORDER BY naam'
+ALLE_CATEGORIEN_MET_KLEUR_SQL = 'SELECT id, naam, kleur FROM categorien ORDER BY naam'
+AANTAL_CATEGORIEN_SQL = 'SELECT COUNT(*) FROM categorien'
+CATEGORIE_NAAM_SQL = 'SELECT naam FROM categorien WHERE id = ?'
+NIEUWE_CATEGORIE_SQL = 'INSERT INTO categorien (naam, beschrijving, kleur) VALUES (?, ?, ?)'
+WERK_CATEGORIE_BIJ_SQL = 'UPDATE categorien SET naam = ?, beschrijving = ?, kleur = ? WHERE id = ?'
+ONTKOPPEL_CATEGORIE_SQL = 'UPDATE transacties SET categorie_id = NULL WHERE categorie_id = ?'
+VERWIJDER_CATEGORIE_SQL = 'DELETE FROM categorien WHERE id = ?'
+
+def categorien_met_totalen():
+    """All categories with their number of transactions, expenses and income"""
+    return _uitvoeren('categorien_met_totalen', CATEGORIEN_MET_TOTALEN_SQL)
+
+def alle_categorien():
+    """(id, naam) of every category, by name"""
+    return _uitvoeren('alle_categorien', ALLE_CATEGORIEN_SQL)
+
+def alle_categorien_met_kleur():
+    """(id, naam, kleur) of every category, by name"""
+    return _uitvoeren('alle_categorien_met_kleur', ALLE_CATEGORIEN_MET_KLEUR_SQL)
+
+def aantal_categorien():
+    """Number of categories"""
+    return _uitvoeren('aantal_categorien', AANTAL_CATEGORIEN_SQL, ophalen='een')[0]
+
+def categorie_naam(categorie_id):
+    """Name of a category, or None when it does not exist"""
+    rij = _uitvoeren('categorie_naam', CATEGORIE_NAAM_SQL, (categorie_id,), ophalen='een')
+    return rij[0] if rij else None
+
+def nieuwe_categorie(naam, beschrijving, kleur):
+    """Add and commit a category; raises sqlite3.IntegrityError when the name exists"""
+    _uitvoeren('nieuwe_categorie', NIEUWE_CATEGORIE_SQL, (naam, beschrijving, kleur), ophalen='aantal')
+    commit()
+
+def werk_categorie_bij(categorie_id, naam, beschrijving, kleur):
+    """Update and commit a category; raises sqlite3.IntegrityError when the name exists"""
+    _uitvoeren('werk_categorie_bij', WERK_CATEGORIE_BIJ_SQL, (naam, beschrijving, kleur, categorie_id),
+               ophalen='aantal')
+    commit()
+
+def verwijder_categorie(categorie_id):
+    """Delete a category and commit; its transactions are kept without category"""
+    _uitvoeren('ontkoppel_categorie', ONTKOPPEL_CATEGORIE_SQL, (categorie_id,), ophalen='aantal')
+    _uitvoeren('verwijder_categorie', VERWIJDER_CATEGORIE_SQL, (categorie_id,), ophalen='aantal')
+    commit()
+
+# --- Transactions -----------------------------------------------------------
+
+ZET_CATEGORIE_SQL = 'UPDATE transacties SET categorie_id = ? WHERE id = ?'
+ZET_CATEGORIE_ONGECATEGORISEERD_SQL = 'UPDATE transacties SET categorie_id = ? WHERE id = ? AND categorie_id IS NULL'
+AANTAL_TRANSACTIES_SQL = 'SELECT COALESCE(SUM(aantal), 0) FROM maandtotalen'
+AANTAL_ZONDER_CATEGORIE_SQL = 'SELECT COALESCE(SUM(aantal), 0) FROM maandtotalen WHERE categorie_id = 0'
+AANTAL_GECATEGORISEERD_SQL = 'SELECT COALESCE(SUM(aantal), 0) FROM maandtotalen WHERE categorie_id <> 0'
+LAATSTE_DATUM_SQL = 'SELECT MAX(datum) FROM transacties'
+NAMEN_IN_CATEGORIE_SQL = 'SELECT DISTINCT naam FROM transacties WHERE categorie_id = ? LIMIT ?'
+ONGECATEGORISEERDE_TRANSACTIES_SQL = '''
+    SELECT id, datum, naam, bedrag, code, mededelingen
+    FROM transacties
+    WHERE categorie_id IS NULL
+    ORDER BY datum DESC
+'''
+ONGECATEGORISEERDE_NAMEN_SQL = 'SELECT id, naam FROM transacties WHERE categorie_id IS NULL'
+NAAM_STATISTIEKEN_SQL = '''
+    SELECT naam, COUNT(*) as aantal,
+           AVG(bedrag) as gemiddeld_bedrag,
+           MIN(bedrag) as min_bedrag,
+           MAX(bedrag) as max_bedrag
+    FROM transacties
+    WHERE categorie_id IS NULL
+    GROUP BY naam
+    ORDER BY COUNT(*) DESC
+'''
+
+# Sortable columns of the transaction list; only these ever reach the SQL.
+# The list is ordered on the column and then t.id in the same direction, a
+# total order that pages by keyset: the next page starts after the
+# (value, id) of the last row, seeking in the column's index (datum, naam)
+# or with a top-N sort of the rows after it (bedrag, code, categorie)
+SORTEER_KOLOMMEN = {
+    'datum': 't.datum',
+    'naam': 't.naam',
+    'bedrag': 't.bedrag_cent',
+    'code': 't.code',
+    'categorie': 'c.naam'
+}
+SORTEER_RICHTINGEN = ('asc', 'desc')
+
+TRANSACTIE_LIJST_SQL = '''
+    SELECT t.id, t.datum, t.naam, t.bedrag, t.code, t.mededelingen,
+           t.tegenrekening, t.saldo_na_mutatie, c.naam as categorie_naam, c.id as categorie_id,
+           t.bedrag_cent
+    FROM transacties t
+    LEFT JOIN categorien c ON t.categorie_id = c.id
+'''
+# Position of every sort column in a row of TRANSACTIE_LIJST_SQL
+SORTEER_POSITIES = {'datum': 1, 'naam': 2, 'bedrag': 10, 'code': 4, 'categorie': 8}
+# Terms of at least this many characters go through the trigram index
+# (transacties_zoek); shorter ones cannot match a trigram and use LIKE
+MIN_ZOEKINDEX_LENGTE = 3
+
+# Transactions whose name, description or counter account matches the index,
+# or whose category name matches
+ZOEK_IDS = '''
+    SELECT rowid FROM transacties_zoek WHERE transacties_zoek MATCH ?
+    UNION
+    SELECT id FROM transacties
+    WHERE categorie_id IN (SELECT id FROM categorien WHERE naam LIKE ?)
+'''
+
+# Free-text predicate per filter kind (see _zoekfilter)
+ZOEK_VOORWAARDEN = {
+    'index': f't.id IN ({ZOEK_IDS})',
+    'like': '''(t.datum LIKE ? OR
+           t.naam LIKE ? OR
+           t.bedrag LIKE ? OR
+           t.code LIKE ? OR
+           t.mededelingen LIKE ? OR
+           t.tegenrekening LIKE ? OR
+           c.naam LIKE ?)'''
+}
+
+# Field filters of services.zoektaal per (veld, operator); each one is an
+# equality or range on a column, so filters on datum, periode, categorie
+# and code combine into index scans and the others narrow their results
+ZOEKFILTERS = {
+    ('bedrag', '='): 't.bedrag_cent = ?',
+    ('bedrag', '<'): 't.bedrag_cent < ?',
+    ('bedrag', '<='): 't.bedrag_cent <= ?',
+    ('bedrag', '>'): 't.bedrag_cent > ?',
+    ('bedrag', '>='): 't.bedrag_cent >= ?',
+    ('bedrag', 'tussen'): 't.bedrag_cent BETWEEN ? AND ?',
+    ('periode', 'tussen'): 't.periode BETWEEN ? AND ?',
+    ('periode', '>='): 't.periode >= ?',
+    ('periode', '<='): 't.periode <= ?',
+    ('datum', 'tussen'): 't.datum BETWEEN ? AND ?',
+    ('datum', '>='): 't.datum >= ?',
+    ('datum', '<='): 't.datum <= ?',
+    ('categorie', '='): 't.categorie_id IN (SELECT id FROM categorien WHERE naam = ? COLLATE NOCASE)',
+    ('code', '='): 't.code = ?',
+    ('tegenrekening', '='): 't.tegenrekening = ?',
+    ('tegenrekening', 'begint'): 't.tegenrekening >= ? AND t.tegenrekening < ?'
+}
+
+TEL_RIJEN_SQL = 'SELECT 1 FROM transacties t'
+# Only the LIKE filter reads c.naam; without it the join would keep the
+# planner from counting straight from a filter's index
+TEL_RIJEN_LIKE_SQL = TEL_RIJEN_SQL + ' LEFT JOIN categorien c ON t.categorie_id = c.id'
+
+def _zoekfilter(zoekterm, filters):
+    """
+    Filter kind, WHERE keys and parameters for a search
+    
+    Args:
+        zoekterm (str): Free text, or ''
+        filters (list): (veld, operator, parameters) from services.zoektaal
+    
+    Returns:
+        tuple: Filter kind ('index', 'like' or None), the ZOEKFILTERS keys
+            used and all parameters in WHERE order
+    """
+    if not zoekterm:
+        filter_soort, params = None, []
+    elif len(zoekterm) >= MIN_ZOEKINDEX_LENGTE:
+        # One quoted phrase: the term is matched literally, as a substring
+        fraze = '"' + zoekterm.replace('"', '""') + '"'
+        filter_soort, params = 'index', [fraze, f'%{zoekterm}%']
+    else:
+        filter_soort, params = 'like', [f'%{zoekterm}%'] * 7
+    
+    sleutels = tuple((veld, operator) for veld, operator, _ in filters)
+    for _, _, waarden in filters:
+        params.extend(waarden)
+    return filter_soort, sleutels, params
+
+def _where(filter_soort, sleutels, *extra):
+    """WHERE clause of free text, field filters and extra conditions, joined with AND"""
+    voorwaarden = [ZOEK_VOORWAARDEN[filter_soort]] if filter_soort else []
+    voorwaarden.extend(ZOEKFILTERS[sleutel] for sleutel in sleutels)
+    voorwaarden.extend(extra)
+    return f" WHERE {' AND '.join(voorwaarden)}" if voorwaarden else ''
+
+@lru_cache(maxsize=None)
+def _transactie_lijst_sql(sort_column, sort_order, filter_soort, sleutels, na):
+    """
+    SQL of the transaction list for one sort/search/page combination, built once
+    
+    na is None for the first page, 'waarde' after a row with a sort value
+    and 'leeg' after a row without one (only the category can be NULL).
+    """
+    sql_column = SORTEER_KOLOMMEN[sort_column]
+    richting = sort_order.upper()
+    # Rows after the cursor in this direction, as one row-value comparison
+    na_operator = '<' if sort_order == 'desc' else '>'
+    
+    if sort_column == 'categorie':
+        # NULL values at the bottom in both directions
+        order_clause = f' ORDER BY {sql_column} IS NULL, {sql_column} {richting}, t.id {richting}'
+        na_voorwaarden = {
+            'waarde': f'({sql_column} IS NULL OR ({sql_column}, t.id) {na_operator} (?, ?))',
+            'leeg': f'{sql_column} IS NULL AND t.id {na_operator} ?'
+        }
+    else:
+        order_clause = f' ORDER BY {sql_column} {richting}, t.id {richting}'
+        na_voorwaarden = {'waarde': f'({sql_column}, t.id) {na_operator} (?, ?)'}
+    
+    extra = (na_voorwaarden[na],) if na else ()
+    return TRANSACTIE_LIJST_SQL + _where(filter_soort, sleutels, *extra) + order_clause + ' LIMIT ?'
+
+@lru_cache(maxsize=None)
+def _tel_sql(filter_soort, sleutels, begrensd):
+    """SQL of the result count for one search combination, built once"""
+    if filter_soort == 'index' and not sleutels:
+        rijen = ZOEK_IDS
+    elif filter_soort == 'like':
+        rijen = TEL_RIJEN_LIKE_SQL + _where(filter_soort, sleutels)
+    else:
+        rijen = TEL_RIJEN_SQL + _where(filter_soort, sleutels)
+    
+    if begrensd:
+        rijen += ' LIMIT ?'
+    return f'SELECT COUNT(*) FROM ({rijen})'
+
+def pagina_sleutel(rij, sort_column):
+    """
+    Keyset cursor after a row of zoek_transacties, for its na argument
+    
+    Returns:
+        tuple: (value of the sort column, id)
+    """
+    return rij[SORTEER_POSITIES[sort_column]], rij[0]
+
+def zoek_transacties(zoekterm, sort_column, sort_order, limit=1000, filters=(), na=None, stroom=False):
+    """
+    Transactions for the list page, searched over every text column
+    
+    Args:
+        zoekterm (str): Text to search for, or '' for all transactions
+        sort_column (str): Key of SORTEER_KOLOMMEN
+        sort_order (str): 'asc' or 'desc'
+        limit (int): Maximum number of rows
+        filters (list): Field filters (veld, operator, parameters) from
+            services.zoektaal, combined with zoekterm
+        na (tuple): pagina_sleutel() of the last row of the previous page,
+            or None for the first page
+        stroom (bool): Return the cursor to iterate instead of a list
+    """
+    filter_soort, sleutels, params = _zoekfilter(zoekterm, filters)
+    
+    if na is None:
+        soort_na = None
+    elif na[0] is None:
+        soort_na = 'leeg'
+        params.append(na[1])
+    else:
+        soort_na = 'waarde'
+        params.extend(na)
+    
+    return _uitvoeren('zoek_transacties',
+                      _transactie_lijst_sql(sort_column, sort_order, filter_soort, sleutels, soort_na),
+                      params + [limit], ophalen='stroom' if stroom else 'alle')
+
+def tel_transacties(zoekterm='', filters=(), maximum=None):
+    """
+    Number of transactions matching zoekterm and filters (all transactions without either)
+    
+    Args:
+        zoekterm (str): Free text, or ''
+        filters (list): Field filters from services.zoektaal
+        maximum (int): Stop counting a search after this many rows; the
+            result is then maximum + 1, meaning "more than maximum"
+    """
+    filter_soort, sleutels, params = _zoekfilter(zoekterm, filters)
+    if filter_soort or sleutels:
+        if maximum is not None:
+            params.append(maximum + 1)
+        return _uitvoeren('tel_zoekresultaten', _tel_sql(filter_soort, sleutels, maximum is not None),
+                          params, ophalen='een')[0]
+    return _uitvoeren('aantal_transacties', AANTAL_TRANSACTIES_SQL, ophalen='een')[0]
+
+def zet_transactie_categorie(transactie_id, categorie_id):
+    """Set (or clear, with None) the category of one transaction and commit"""
+    _uitvoeren('zet_categorie', ZET_CATEGORIE_SQL, (categorie_id, transactie_id), ophalen='aantal')
+    commit()
+
+def zet_transactie_categorien(wijzigingen):
+    """
+    Set (or clear, with None) the category of many transactions and commit once
+    
+    Args:
+        wijzigingen (iterable): (transactie_id, categorie_id) pairs, applied in order
+    
+    Returns:
+        int: Number of transactions updated
+    """
+    aantal = _uitvoeren('zet_categorie', ZET_CATEGORIE_SQL,
+                        [(categorie_id, transactie_id) for transactie_id, categorie_id in wijzigingen],
+                        ophalen='aantal', many=True)
+    commit()
+    return aantal
+
+def ken_categorie_toe(categorie_id, transactie_ids, alleen_ongecategoriseerd=False):
+    """
+    Assign a category to many transactions and commit
+    
+    One prepared UPDATE is run per id, instead of an IN list whose SQL
+    differs with every number of ids.
+    
+    Returns:
+        int: Number of transactions updated
+    """
+    if alleen_ongecategoriseerd:
+        naam, sql = 'zet_categorie_ongecategoriseerd', ZET_CATEGORIE_ONGECATEGORISEERD_SQL
+    else:
+        naam, sql = 'zet_categorie', ZET_CATEGORIE_SQL
+    aantal = _uitvoeren(naam, sql, [(categorie_id, transactie_id) for transactie_id in transactie_ids],
+                        ophalen='aantal', many=True)
+    commit()
+    return aantal
+
+def aantal_zonder_categorie():
+    """Number of transactions without category"""
+    return _uitvoeren('aantal_zonder_categorie', AANTAL_ZONDER_CATEGORIE_SQL, ophalen='een')[0]
+
+def aantal_gecategoriseerd():
+    """Number of transactions with a category"""
+    return _uitvoeren('aantal_gecategoriseerd', AANTAL_GECATEGORISEERD_SQL, ophalen='een')[0]
+
+def laatste_datum():
+    """Date of the most recent transaction, or None"""
+    return _uitvoeren('laatste_datum', LAATSTE_DATUM_SQL, ophalen='een')[0]
+
+def namen_in_categorie(categorie_id, limit=20):
+    """Distinct transaction names in a category"""
+    return [rij[0] for rij in _uitvoeren('namen_in_categorie', NAMEN_IN_CATEGORIE_SQL, (categorie_id, limit))]
+
+def ongecategoriseerde_transacties(stroom=False):
+    """
+    (id, datum, naam, bedrag, code, mededelingen) of transactions without category, newest first
+    
+    With stroom=True the cursor is returned, to be iterated, instead of a list
+    """
+    return _uitvoeren('ongecategoriseerde_transacties', ONGECATEGORISEERDE_TRANSACTIES_SQL,
+                      ophalen='stroom' if stroom else 'alle')
+
+def ongecategoriseerde_namen(stroom=False):
+    """(id, naam) of transactions without category; a cursor to iterate with stroom=True"""
+    return _uitvoeren('ongecategoriseerde_namen', ONGECATEGORISEERDE_NAMEN_SQL,
+                      ophalen='stroom' if stroom else 'alle')
+
+def naam_statistieken_ongecategoriseerd():
+    """Per name without category: naam, aantal, gemiddeld, min and max bedrag"""
+    return _uitvoeren('naam_statistieken', NAAM_STATISTIEKEN_SQL)
+
+# --- Imports ----------------------------------------------------------------
+
+RECENTE_IMPORTS_KOLOMMEN = ('bestandsnaam', 'grootte', 'aantal_rijen', 'eerste_datum', 'laatste_datum',
+                            'imported', 'duplicates', 'errors', 'geimporteerd_op')
+RECENTE_IMPORTS_SQL = f'''
+    SELECT {', '.join(RECENTE_IMPORTS_KOLOMMEN)}
+    FROM import_bestanden
+    ORDER BY id DESC
+    LIMIT ?
+'''
+
+def recente_imports(limit=10):
+    """
+    Most recent entries of the import ledger, for the import page
+    
+    Returns:
+        list: Dicts describing each imported file, newest first
+    """
+    return [dict(zip(RECENTE_IMPORTS_KOLOMMEN, rij))
+            for rij in _uitvoeren('recente_imports', RECENTE_IMPORTS_SQL, (limit,))]
+
+# --- Reports ----------------------------------------------------------------
+
+# Aggregates read maandtotalen (one row per month and category, kept up to
+# date by triggers; categorie_id 0 is "zonder categorie"), so they cost the
+# same however many transactions a month holds
+
+BESCHIKBARE_PERIODES_SQL = '''
+    SELECT DISTINCT periode / 100, periode % 100
+    FROM maandtotalen
+    ORDER BY periode DESC
+'''
+BESCHIKBARE_JAREN_SQL = 'SELECT DISTINCT periode / 100 FROM maandtotalen ORDER BY periode DESC'
+LAATSTE_PERIODE_SQL = 'SELECT MAX(periode) FROM maandtotalen'
+
+UITGAVEN_PER_MAAND_SQL = '''
+    SELECT periode / 100, periode % 100, SUM(uitgaven_cent) / 100.0 as totaal
+    FROM maandtotalen
+    WHERE aantal_uitgaven > 0
+    AND ''' + PERIODE_FILTER + '''
+    GROUP BY periode
+    ORDER BY periode
+'''
+UITGAVEN_LAATSTE_MAANDEN_SQL = '''
+    SELECT periode / 100, periode % 100, SUM(uitgaven_cent) / 100.0 as totaal
+    FROM maandtotalen
+    WHERE aantal_uitgaven > 0
+    GROUP BY periode
+    ORDER BY periode DESC
+    LIMIT ?
+'''
+TOP_CATEGORIEN_SQL = '''
+    SELECT c.id, c.naam, c.kleur, SUM(m.uitgaven_cent) / 100.0 as totaal
+    FROM maandtotalen m
+    JOIN categorien c ON m.categorie_id = c.id
+    WHERE m.aantal_uitgaven > 0
+    AND ''' + PERIODE_FILTER_M + '''
+    GROUP BY c.id, c.naam, c.kleur
+    ORDER BY SUM(m.uitgaven_cent) ASC
+    LIMIT ?
+'''
+UITGAVEN_ZONDER_CATEGORIE_SQL = '''
+    SELECT SUM(uitgaven_cent) / 100.0 as totaal
+    FROM maandtotalen
+    WHERE aantal_uitgaven > 0 AND categorie_id = 0
+    AND ''' + PERIODE_FILTER
+INKOMSTEN_UITGAVEN_SQL = '''
+    SELECT periode / 100, periode % 100,
+           SUM(inkomsten_cent) / 100.0 as inkomsten,
+           SUM(uitgaven_cent) / 100.0 as uitgaven
+    FROM maandtotalen
+    WHERE ''' + PERIODE_FILTER + '''
+    GROUP BY periode
+    ORDER BY periode
+'''
+INKOMSTEN_UITGAVEN_LAATSTE_MAANDEN_SQL = '''
+    SELECT periode / 100, periode % 100,
+           SUM(inkomsten_cent) / 100.0 as inkomsten,
+           SUM(uitgaven_cent) / 100.0 as uitgaven
+    FROM maandtotalen
+    GROUP BY periode
+    ORDER BY periode DESC
+    LIMIT ?
+'''
+PERIODE_TOTALEN_SQL = '''
+    SELECT
+        COALESCE(SUM(aantal), 0) as totaal_transacties,
+        SUM(inkomsten_cent) / 100.0 as totaal_inkomsten,
+        SUM(uitgaven_cent) / 100.0 as totaal_uitgaven,
+        COUNT(DISTINCT NULLIF(categorie_id, 0)) as gecategoriseerd
+    FROM maandtotalen
+    WHERE ''' + PERIODE_FILTER
+ZONDER_CATEGORIE_IN_PERIODE_SQL = '''
+    SELECT COALESCE(SUM(aantal), 0) FROM maandtotalen
+    WHERE categorie_id = 0
+    AND ''' + PERIODE_FILTER
+# Every category with its amount per month in a range, plus "zonder
+# categorie"; categories without amounts come back once with periode NULL
+KRUISTABEL_SQL = '''
+    SELECT c.id, c.naam, m.periode, m.inkomsten_cent + m.uitgaven_cent
+    FROM categorien c
+    LEFT JOIN maandtotalen m ON m.categorie_id = c.id AND ''' + PERIODE_FILTER_M + '''
+    UNION ALL
+    SELECT NULL, NULL, periode, inkomsten_cent + uitgaven_cent
+    FROM maandtotalen
+    WHERE categorie_id = 0 AND ''' + PERIODE_FILTER + '''
+    ORDER BY 2 NULLS LAST
+'''
+
+# Drill-down rows: id, datum, naam, bedrag, code, mededelingen, tegenrekening, categorie, bedrag_cent
+DETAIL_KOLOMMEN = '''
+    SELECT t.id, t.datum, t.naam, t.bedrag, t.code, t.mededelingen,
+           t.tegenrekening, c.naam as categorie_naam, t.bedrag_cent
+    FROM transacties t
+    LEFT JOIN categorien c ON t.categorie_id = c.id
+'''
+DETAIL_KOLOMMEN_ZONDER_CATEGORIE = '''
+    SELECT t.id, t.datum, t.naam, t.bedrag, t.code, t.mededelingen,
+           t.tegenrekening, 'Zonder categorie' as categorie_naam, t.bedrag_cent
+    FROM transacties t
+'''
+DETAIL_ORDER = ' ORDER BY t.datum DESC, t.bedrag DESC'
+TRANSACTIES_IN_MAAND_SQL = DETAIL_KOLOMMEN + ' WHERE t.periode = ?' + DETAIL_ORDER
+CATEGORIE_IN_MAAND_SQL = DETAIL_KOLOMMEN + ' WHERE t.categorie_id = ? AND t.periode = ?' + DETAIL_ORDER
+ZONDER_CATEGORIE_IN_MAAND_SQL = (DETAIL_KOLOMMEN_ZONDER_CATEGORIE
+                                 + ' WHERE t.categorie_id IS NULL AND t.periode = ?' + DETAIL_ORDER)
+CATEGORIE_IN_PERIODE_SQL = (DETAIL_KOLOMMEN + ' WHERE t.categorie_id = ? AND ' + PERIODE_FILTER_T
+                            + DETAIL_ORDER)
+ZONDER_CATEGORIE_IN_PERIODE_DETAILS_SQL = (DETAIL_KOLOMMEN_ZONDER_CATEGORIE
+                                           + ' WHERE t.categorie_id IS NULL AND ' + PERIODE_FILTER_T
+                                           + DETAIL_ORDER)
+
+def _periode(start_jaar, start_maand, eind_jaar, eind_maand):
+    """Parameters of PERIODE_FILTER"""
+    return (periode(start_jaar, start_maand), periode(eind_jaar, eind_maand))
+
+def beschikbare_periodes():
+    """(jaar, maand) of every month with transactions, newest first"""
+    return _uitvoeren('beschikbare_periodes', BESCHIKBARE_PERIODES_SQL)
+
+def beschikbare_jaren():
+    """Every year with transactions, newest first"""
+    return [rij[0] for rij in _uitvoeren('beschikbare_jaren', BESCHIKBARE_JAREN_SQL)]
+
+def laatste_periode():
+    """(jaar, maand) of the most recent transaction, or None"""
+    laatste = _uitvoeren('laatste_periode', LAATSTE_PERIODE_SQL, ophalen='een')[0]
+    return divmod(laatste, 100) if laatste else None
+
+def uitgaven_per_maand(start_jaar, start_maand, eind_jaar, eind_maand):
+    """(jaar, maand, totaal) of expenses per month in a period, oldest first"""
+    return _uitvoeren('uitgaven_per_maand', UITGAVEN_PER_MAAND_SQL,
+                      _periode(start_jaar, start_maand, eind_jaar, eind_maand))
+
+def uitgaven_laatste_maanden(aantal):
+    """(jaar, maand, totaal) of expenses in the most recent months with expenses, newest first"""
+    return _uitvoeren('uitgaven_laatste_maanden', UITGAVEN_LAATSTE_MAANDEN_SQL, (aantal,))
+
+def top_categorien(start_jaar, start_maand, eind_jaar, eind_maand, limit=8):
+    """(id, naam, kleur, totaal) of the categories with the most expenses in a period"""
+    return _uitvoeren('top_categorien', TOP_CATEGORIEN_SQL,
+                      _periode(start_jaar, start_maand, eind_jaar, eind_maand) + (limit,))
+
+def uitgaven_zonder_categorie(start_jaar, start_maand, eind_jaar, eind_maand):
+    """Expenses without category in a period (0 when there are none)"""
+    return _uitvoeren('uitgaven_zonder_categorie', UITGAVEN_ZONDER_CATEGORIE_SQL,
+                      _periode(start_jaar, start_maand, eind_jaar, eind_maand), ophalen='een')[0] or 0
+
+def inkomsten_uitgaven(start_jaar, start_maand, eind_jaar, eind_maand):
+    """(jaar, maand, inkomsten, uitgaven) per month in a period, oldest first"""
+    return _uitvoeren('inkomsten_uitgaven', INKOMSTEN_UITGAVEN_SQL,
+                      _periode(start_jaar, start_maand, eind_jaar, eind_maand))
+
+def inkomsten_uitgaven_laatste_maanden(aantal):
+    """(jaar, maand, inkomsten, uitgaven) of the most recent months, newest first"""
+    return _uitvoeren('inkomsten_uitgaven_laatste_maanden', INKOMSTEN_UITGAVEN_LAATSTE_MAANDEN_SQL, (aantal,))
+
+def periode_totalen(start_jaar, start_maand, eind_jaar, eind_maand):
+    """(aantal, inkomsten, uitgaven, aantal categorieën) of a period"""
+    return _uitvoeren('periode_totalen', PERIODE_TOTALEN_SQL,
+                      _periode(start_jaar, start_maand, eind_jaar, eind_maand), ophalen='een')
+
+def zonder_categorie_in_periode(start_jaar, start_maand, eind_jaar, eind_maand):
+    """Number of transactions without category in a period"""
+    return _uitvoeren('zonder_categorie_in_periode', ZONDER_CATEGORIE_IN_PERIODE_SQL,
+                      _periode(start_jaar, start_maand, eind_jaar, eind_maand), ophalen='een')[0]
+
+def kruistabel_bedragen(start_jaar, start_maand, eind_jaar, eind_maand):
+    """
+    (categorie_id, naam, periode, cents) for every category and month of a range
+    
+    Rows without category have categorie_id and naam None and come last;
+    a category without amounts in the range has one row with periode None.
+    """
+    bereik = _periode(start_jaar, start_maand, eind_jaar, eind_maand)
+    return _uitvoeren('kruistabel_bedragen', KRUISTABEL_SQL, bereik + bereik)
+
+def transacties_in_maand(jaar, maand):
+    """Drill-down rows (see DETAIL_KOLOMMEN) of one month"""
+    return _uitvoeren('transacties_in_maand', TRANSACTIES_IN_MAAND_SQL, (periode(jaar, maand),))
+
+def categorie_in_maand(jaar, maand, categorie_id):
+    """Drill-down rows of one category (None: without category) in one month"""
+    if categorie_id is None:
+        return _uitvoeren('zonder_categorie_in_maand', ZONDER_CATEGORIE_IN_MAAND_SQL, (periode(jaar, maand),))
+    return _uitvoeren('categorie_in_maand', CATEGORIE_IN_MAAND_SQL, (categorie_id, periode(jaar, maand)))
+
+def categorie_in_periode(categorie_id, start_jaar, start_maand, eind_jaar, eind_maand):
+    """Drill-down rows of one category (None: without category) in a period"""
+    periode = _periode(start_jaar, start_maand, eind_jaar, eind_maand)
+    if categorie_id is None:
+        return _uitvoeren('zonder_categorie_in_periode_details', ZONDER_CATEGORIE_IN_PERIODE_DETAILS_SQL, periode)
+    return _uitvoeren('categorie_in_periode', CATEGORIE_IN_PERIODE_SQL, (categorie_id,) + periode)
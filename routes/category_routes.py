@@ -6,6 +6,8 @@ Handles all category CRUD operations and smart categorization features
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 import sqlite3
+from models import repository
+from .weergave import toon, RijenStroom
 import re
 
 # Create blueprint for category routes
@@ -14,28 +16,11 @@ category_bp = Blueprint('categories', __name__)
 @category_bp.route('/')
 def categorien():
     """Show all categories with transaction count per category"""
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
     # Get all categories with transaction counts
-    cursor.execute('''
-        SELECT c.id, c.naam, c.beschrijving, c.kleur, 
-               COUNT(t.id) as aantal_transacties,
-               COALESCE(SUM(CASE WHEN t.bedrag < 0 THEN t.bedrag ELSE 0 END), 0) as totaal_uitgaven,
-               COALESCE(SUM(CASE WHEN t.bedrag > 0 THEN t.bedrag ELSE 0 END), 0) as totaal_inkomsten
-        FROM categorien c
-        LEFT JOIN transacties t ON c.id = t.categorie_id
-        GROUP BY c.id, c.naam, c.beschrijving, c.kleur
-        ORDER BY aantal_transacties DESC, c.naam
-    ''')
-    
-    categorien_data = cursor.fetchall()
+    categorien_data = repository.categorien_met_totalen()
     
     # Count transactions without category
-    cursor.execute('SELECT COUNT(*) FROM transacties WHERE categorie_id IS NULL')
-    zonder_categorie = cursor.fetchone()[0]
-    
-    conn.close()
+    zonder_categorie = repository.aantal_zonder_categorie()
     
     return render_template('categorien.html', 
                          categorien=categorien_data, 
@@ -52,20 +37,11 @@ def nieuwe_categorie():
         flash('Categorienaam is verplicht', 'error')
         return redirect(url_for('categories.categorien'))
     
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute('''
-            INSERT INTO categorien (naam, beschrijving, kleur)
-            VALUES (?, ?, ?)
-        ''', (naam, beschrijving, kleur))
-        conn.commit()
+        repository.nieuwe_categorie(naam, beschrijving, kleur)
         flash(f'Categorie "{naam}" toegevoegd!', 'success')
     except sqlite3.IntegrityError:
         flash(f'Categorie "{naam}" bestaat al', 'error')
-    finally:
-        conn.close()
     
     return redirect(url_for('categories.categorien'))
 
@@ -80,49 +56,26 @@ def bewerk_categorie(categorie_id):
         flash('Categorienaam is verplicht', 'error')
         return redirect(url_for('categories.categorien'))
     
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute('''
-            UPDATE categorien 
-            SET naam = ?, beschrijving = ?, kleur = ?
-            WHERE id = ?
-        ''', (naam, beschrijving, kleur, categorie_id))
-        conn.commit()
+        repository.werk_categorie_bij(categorie_id, naam, beschrijving, kleur)
         flash(f'Categorie "{naam}" bijgewerkt!', 'success')
     except sqlite3.IntegrityError:
         flash(f'Categorienaam "{naam}" bestaat al', 'error')
-    finally:
-        conn.close()
     
     return redirect(url_for('categories.categorien'))
 
 @category_bp.route('/<int:categorie_id>/verwijderen', methods=['POST'])
 def verwijder_categorie(categorie_id):
     """Delete a category (transactions are kept but unlinked)"""
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
     # Get category name for confirmation message
-    cursor.execute('SELECT naam FROM categorien WHERE id = ?', (categorie_id,))
-    categorie = cursor.fetchone()
+    naam = repository.categorie_naam(categorie_id)
     
-    if not categorie:
+    if naam is None:
         flash('Categorie niet gevonden', 'error')
-        conn.close()
         return redirect(url_for('categories.categorien'))
     
-    naam = categorie[0]
-    
-    # Unlink all transactions from this category
-    cursor.execute('UPDATE transacties SET categorie_id = NULL WHERE categorie_id = ?', (categorie_id,))
-    
-    # Delete the category
-    cursor.execute('DELETE FROM categorien WHERE id = ?', (categorie_id,))
-    
-    conn.commit()
-    conn.close()
+    # Unlink all transactions from this category and delete it
+    repository.verwijder_categorie(categorie_id)
     
     flash(f'Categorie "{naam}" verwijderd. Transacties zijn behouden maar hebben geen categorie meer.', 'info')
     return redirect(url_for('categories.categorien'))
@@ -137,19 +90,8 @@ def bulk_toewijzen():
         flash('Geen categorie of transacties geselecteerd', 'error')
         return redirect(url_for('categories.categorien'))
     
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
     # Update all selected transactions
-    placeholders = ','.join('?' * len(transactie_ids))
-    cursor.execute(f'''
-        UPDATE transacties 
-        SET categorie_id = ? 
-        WHERE id IN ({placeholders})
-    ''', [categorie_id] + transactie_ids)
-    
-    conn.commit()
-    conn.close()
+    repository.ken_categorie_toe(categorie_id, transactie_ids)
     
     flash(f'{len(transactie_ids)} transacties toegewezen aan categorie!', 'success')
     return redirect(url_for('categories.categorien'))
@@ -164,46 +106,22 @@ def bulk_winkel_toewijzen():
         flash('Categorie of winkelnaam ontbreekt', 'error')
         return redirect(url_for('categories.categorien'))
     
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
-    # Get all uncategorized transactions from this store and filter with Python regex
-    cursor.execute('''
-        SELECT id FROM transacties 
-        WHERE categorie_id IS NULL
-    ''')
-    
-    alle_transacties = cursor.fetchall()
+    # Stream the uncategorized transactions (id and name in one query) and filter with Python regex
+    alle_transacties = repository.ongecategoriseerde_namen(stroom=True)
     
     # Filter with Python regex for whole word matching
-    pattern = r'\b' + re.escape(winkel_naam) + r'\b'
-    to_update_ids = []
-    
-    for (transactie_id,) in alle_transacties:
-        cursor.execute('SELECT naam FROM transacties WHERE id = ?', (transactie_id,))
-        naam = cursor.fetchone()[0]
-        if re.search(pattern, naam, re.IGNORECASE):
-            to_update_ids.append(transactie_id)
+    pattern = re.compile(r'\b' + re.escape(winkel_naam) + r'\b', re.IGNORECASE)
+    to_update_ids = [transactie_id for transactie_id, naam in alle_transacties if pattern.search(naam)]
     
     if not to_update_ids:
         flash(f'Geen ongecategoriseerde {winkel_naam} transacties gevonden', 'info')
-        conn.close()
         return redirect(url_for('categories.categorien'))
     
     # Update all matching transactions
-    placeholders = ','.join('?' * len(to_update_ids))
-    cursor.execute(f'''
-        UPDATE transacties 
-        SET categorie_id = ? 
-        WHERE id IN ({placeholders})
-    ''', [categorie_id] + to_update_ids)
-    
-    conn.commit()
+    repository.ken_categorie_toe(categorie_id, to_update_ids)
     
     # Get category name for confirmation message
-    cursor.execute('SELECT naam FROM categorien WHERE id = ?', (categorie_id,))
-    categorie_naam = cursor.fetchone()[0]
-    conn.close()
+    categorie_naam = repository.categorie_naam(categorie_id)
     
     flash(f'{len(to_update_ids)} {winkel_naam} transacties toegewezen aan "{categorie_naam}"!', 'success')
     return redirect(url_for('categories.categorien'))
@@ -211,71 +129,28 @@ def bulk_winkel_toewijzen():
 @category_bp.route('/suggesties/<int:categorie_id>')
 def categorie_suggesties(categorie_id):
     """Find transactions similar to this category for bulk assignment"""
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
     # Get category info
-    cursor.execute('SELECT naam FROM categorien WHERE id = ?', (categorie_id,))
-    categorie = cursor.fetchone()
+    categorie = repository.categorie_naam(categorie_id)
     
-    if not categorie:
+    if categorie is None:
         flash('Categorie niet gevonden', 'error')
         return redirect(url_for('categories.categorien'))
     
     # Get all transactions from this category to find patterns
-    cursor.execute('''
-        SELECT DISTINCT naam 
-        FROM transacties 
-        WHERE categorie_id = ? 
-        LIMIT 20
-    ''', (categorie_id,))
-    
-    bestaande_namen = [row[0] for row in cursor.fetchall()]
+    bestaande_namen = repository.namen_in_categorie(categorie_id, limit=20)
     
     # Find similar uncategorized transactions
     suggesties = []
     winkel_patronen = {}
     
     if bestaande_namen:
-        # Get ALL uncategorized transactions and filter with Python regex
-        cursor.execute('''
-            SELECT DISTINCT t.id, t.datum, t.naam, t.bedrag
-            FROM transacties t
-            WHERE t.categorie_id IS NULL 
-            ORDER BY t.datum DESC
-        ''')
-        
-        alle_ongecategoriseerd = cursor.fetchall()
-        
-        # Filter with Python regex for exact matches
-        for transactie_id, datum, naam, bedrag in alle_ongecategoriseerd:
-            matched = False
-            
-            # Check exact matches
-            for bestaande_naam in bestaande_namen:
-                if naam == bestaande_naam:
-                    suggesties.append((transactie_id, datum, naam, bedrag))
-                    matched = True
-                    break
-            
-            # Check partial matches with whole words
-            if not matched:
-                for bestaande_naam in bestaande_namen:
-                    # Try first word of existing name as pattern
-                    eerste_woord = bestaande_naam.split()[0] if bestaande_naam.split() else bestaande_naam
-                    if len(eerste_woord) > 3:  # Only if word is long enough
-                        pattern = r'\b' + re.escape(eerste_woord) + r'\b'
-                        if re.search(pattern, naam, re.IGNORECASE):
-                            suggesties.append((transactie_id, datum, naam, bedrag))
-                            break
-        
-        # Limit suggestions to 50
-        suggesties = suggesties[:50]
+        # Stream the uncategorized transactions and filter with Python regex while
+        # the template renders; reading stops after 50 suggestions
+        suggesties = RijenStroom(vergelijkbare_transacties(bestaande_namen), limit=50)
         
         # Detect store patterns for bulk options
+        winkel_kandidaten = []
         for naam in bestaande_namen:
-            winkel_kandidaten = []
-            
             # Known supermarket patterns
             if 'ALBERT HEIJN' in naam.upper():
                 winkel_kandidaten.append('ALBERT HEIJN')
@@ -294,27 +169,44 @@ def categorie_suggesties(categorie_id):
                 eerste_woord = naam.split()[0] if naam.split() else naam
                 if len(eerste_woord) > 3:
                     winkel_kandidaten.append(eerste_woord)
-            
-            # Count uncategorized transactions per store with regex
-            for winkel in winkel_kandidaten:
-                if winkel not in winkel_patronen:
-                    cursor.execute('''
-                        SELECT naam FROM transacties 
-                        WHERE categorie_id IS NULL
-                    ''')
-                    alle_namen = [row[0] for row in cursor.fetchall()]
-                    
-                    # Count matches with regex
-                    pattern = r'\b' + re.escape(winkel) + r'\b'
-                    aantal = sum(1 for n in alle_namen if re.search(pattern, n, re.IGNORECASE))
-                    
-                    if aantal >= 5:  # Only show if at least 5 transactions
-                        winkel_patronen[winkel] = aantal
-    
-    conn.close()
-    
-    return render_template('categorie_suggesties.html', 
-                         categorie=categorie[0], 
-                         categorie_id=categorie_id,
-                         suggesties=suggesties,
-                         winkel_patronen=winkel_patronen)
\ No newline at end of file
+        
+        # Count uncategorized transactions per store with regex, in one pass over the names
+        patronen = {winkel: re.compile(r'\b' + re.escape(winkel) + r'\b', re.IGNORECASE)
+                    for winkel in winkel_kandidaten}
+        aantallen = dict.fromkeys(patronen, 0)
+        for _transactie_id, naam in repository.ongecategoriseerde_namen(stroom=True):
+            for winkel, pattern in patronen.items():
+                if pattern.search(naam):
+                    aantallen[winkel] += 1
+        
+        # Only show if at least 5 transactions
+        winkel_patronen = {winkel: aantal for winkel, aantal in aantallen.items() if aantal >= 5}
+    
+    return toon('categorie_suggesties.html', 
+                categorie=categorie, 
+                categorie_id=categorie_id,
+                suggesties=suggesties,
+                winkel_patronen=winkel_patronen)
+
+def vergelijkbare_transacties(bestaande_namen):
+    """
+    Uncategorized transactions whose name matches one of bestaande_namen, newest first
+    
+    A name matches exactly, or contains the first word (longer than three
+    letters) of an existing name as a whole word.
+    
+    Yields:
+        tuple: (id, datum, naam, bedrag)
+    """
+    exacte_namen = set(bestaande_namen)
+    woord_patronen = []
+    for bestaande_naam in bestaande_namen:
+        # Try first word of existing name as pattern
+        eerste_woord = bestaande_naam.split()[0] if bestaande_naam.split() else bestaande_naam
+        if len(eerste_woord) > 3:  # Only if word is long enough
+            woord_patronen.append(re.compile(r'\b' + re.escape(eerste_woord) + r'\b', re.IGNORECASE))
+    
+    ongecategoriseerd = repository.ongecategoriseerde_transacties(stroom=True)
+    for transactie_id, datum, naam, bedrag, _code, _mededelingen in ongecategoriseerd:
+        if naam in exacte_namen or any(pattern.search(naam) for pattern in woord_patronen):
+            yield transactie_id, datum, naam, bedrag
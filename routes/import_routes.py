@@ -4,57 +4,191 @@ Import Routes - CSV File Upload and Processing
 Handles all CSV import functionality with proper separation
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
-import sqlite3
-import os
-from werkzeug.utils import secure_filename
-from services.csv_processor import process_ing_csv
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify
+from models import repository
+import io
+from services.import_jobs import start_import_job, get_job, mark_job_reported
+from services.hash_filter import hash_filter_statistieken
+from services.parser_registry import BESTANDSEXTENSIES
+from services.chunked_uploads import (start_upload, voeg_chunk_toe, voltooi_upload, annuleer_upload,
+                                      get_upload, UploadFout)
 
 # Create blueprint for import routes
 import_bp = Blueprint('import', __name__)
 
+def flash_import_result(job):
+    """Show the summary of a finished import job as flash messages"""
+    for bestandsnaam in job['bekende_bestanden']:
+        flash(f"{bestandsnaam} is al eerder geïmporteerd en is overgeslagen", 'info')
+    for bestandsnaam, rijen in job['hervat']:
+        flash(f"Import van {bestandsnaam} hervat na {rijen} eerder verwerkte rijen", 'info')
+    if job['imported'] > 0:
+        flash(f"Succesvol {job['imported']} transacties geïmporteerd!", 'success')
+    if job['duplicates'] > 0:
+        flash(f"{job['duplicates']} duplicaten overgeslagen", 'info')
+    if job['errors'] > 0:
+        flash(f"{job['errors']} fouten opgetreden", 'warning')
+        for error in job['error_details'][:5]:  # Show max 5 errors
+            flash(error, 'error')
+
+def take_upload_stream(file):
+    """
+    Take over the stream of an uploaded file
+    
+    Werkzeug already spools uploads to a temporary file (in memory while
+    small), so the background job can read that directly instead of a copy
+    in the uploads folder. The FileStorage gets an empty stream in return,
+    so closing the request at teardown leaves the job's stream open.
+    """
+    stream = file.stream
+    file.stream = io.BytesIO()
+    return stream
+
 @import_bp.route('/', methods=['GET', 'POST'])
 def importeren():
-    """Upload and process ING CSV files"""
+    """Upload ING CSV, CAMT.053, MT940 or ZIP files and start a background import job"""
     if request.method == 'POST':
-        if 'file' not in request.files:
+        files = [f for f in request.files.getlist('file') if f.filename]
+        if not files:
             flash('Geen bestand geselecteerd', 'error')
             return redirect(request.url)
         
-        file = request.files['file']
-        if file.filename == '':
-            flash('Geen bestand geselecteerd', 'error')
-            return redirect(request.url)
-        
-        if file and file.filename.lower().endswith('.csv'):
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            
-            # Process the CSV file using our service
-            result = process_ing_csv(filepath)
+        if all(f.filename.lower().endswith(BESTANDSEXTENSIES + ('.zip',)) for f in files):
+            # Import straight from the spooled upload streams; the job closes them when done
+            streams = [take_upload_stream(file) for file in files]
+            job_id = start_import_job(streams, bestandsnamen=[f.filename for f in files])
             
-            # Show results
-            if result['imported'] > 0:
-                flash(f"Succesvol {result['imported']} transacties geïmporteerd!", 'success')
-            if result['duplicates'] > 0:
-                flash(f"{result['duplicates']} duplicaten overgeslagen", 'info')
-            if result['errors'] > 0:
-                flash(f"{result['errors']} fouten opgetreden", 'warning')
-                for error in result['error_details'][:5]:  # Show max 5 errors
-                    flash(error, 'error')
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify({'job_id': job_id,
+                                'status_url': url_for('import.import_status', job_id=job_id)}), 202
             
-            # Remove temporary file
-            os.remove(filepath)
+            return redirect(url_for('import.importeren', job=job_id))
             
         else:
-            flash('Alleen CSV bestanden zijn toegestaan', 'error')
+            flash('Alleen CSV-, CAMT.053-, MT940- en ZIP-bestanden zijn toegestaan', 'error')
+    
+    # Show the result of finished jobs and the progress of running ones
+    # (a chunked upload of several files has a job per file: ?job=a&job=b)
+    actieve_jobs = []
+    for job_id in request.args.getlist('job'):
+        job = get_job(job_id)
+        if job is None:
+            flash('Importtaak niet gevonden of verlopen', 'warning')
+        elif job['klaar_op'] is not None:
+            if not job['gemeld']:
+                flash_import_result(job)
+                mark_job_reported(job_id)
+        else:
+            actieve_jobs.append(job)
     
     # Get most recent date from database for display
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT MAX(datum) FROM transacties')
-    laatste_datum = cursor.fetchone()[0]
-    conn.close()
+    laatste_datum = repository.laatste_datum()
+    
+    # Recently imported files from the import ledger
+    import_historie = repository.recente_imports()
+    
+    return render_template('importeren.html', laatste_datum=laatste_datum, actieve_jobs=actieve_jobs,
+                           import_historie=import_historie, max_upload=current_app.config['MAX_CONTENT_LENGTH'])
+
+@import_bp.route('/status/<job_id>')
+def import_status(job_id):
+    """API for the progress of a background import job"""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Importtaak niet gevonden'}), 404
+    
+    return jsonify({
+        'id': job['id'],
+        'bestandsnaam': job['bestandsnaam'],
+        'status': job['status'],
+        'klaar': job['klaar_op'] is not None,
+        'rijen': job['rijen'],
+        'imported': job['imported'],
+        'duplicates': job['duplicates'],
+        'errors': job['errors'],
+        'error_details': job['error_details'][:5]
+    })
+
+@import_bp.route('/hash-filter')
+def hash_filter_status():
+    """API for memory footprint and hit rate of the duplicate prefilter"""
+    return jsonify(hash_filter_statistieken())
+
+@import_bp.route('/historie')
+def import_historie():
+    """API for the import ledger: recently imported files with their date range"""
+    limit = request.args.get('limit', type=int, default=50)
+    
+    historie = repository.recente_imports(limit)
+    
+    return jsonify({'bestanden': historie})
+
+def upload_response(upload, status=200):
+    """JSON for a chunked upload, with the URLs the client needs next"""
+    return jsonify({
+        **upload,
+        'chunk_url': url_for('import.upload_chunk', upload_id=upload['id']),
+        'status_url': url_for('import.import_status', job_id=upload['job_id']) if upload['job_id'] else None
+    }), status
+
+@import_bp.route('/uploads', methods=['POST'])
+def upload_starten():
+    """
+    API to begin a chunked upload, for exports larger than MAX_CONTENT_LENGTH
+    
+    Expects JSON with bestandsnaam and optionally grootte (bytes). Chunks are
+    then sent with PUT to chunk_url?offset=N, and the upload is finished with
+    POST to chunk_url + '/voltooien'.
+    """
+    data = request.get_json(silent=True) or {}
+    bestandsnaam = data.get('bestandsnaam', '')
+    if not bestandsnaam.lower().endswith(BESTANDSEXTENSIES + ('.zip',)):
+        return jsonify({'error': 'Alleen CSV-, CAMT.053-, MT940- en ZIP-bestanden zijn toegestaan'}), 400
+    
+    grootte = data.get('grootte')
+    if grootte is not None and (not isinstance(grootte, int) or grootte < 0):
+        return jsonify({'error': 'Ongeldige grootte'}), 400
+    
+    return upload_response(start_upload(bestandsnaam, grootte), 201)
+
+@import_bp.route('/uploads/<upload_id>', methods=['GET', 'PUT', 'DELETE'])
+def upload_chunk(upload_id):
+    """
+    API for one chunked upload
+    
+    GET returns how many bytes have arrived (where to resume after a dropped
+    connection), PUT appends the request body at ?offset=N (optionally
+    checked against an X-Chunk-SHA256 header), DELETE cancels the upload.
+    """
+    if request.method == 'DELETE':
+        if not annuleer_upload(upload_id):
+            return jsonify({'error': 'Upload niet gevonden'}), 404
+        return jsonify({'success': True})
+    
+    if request.method == 'PUT':
+        offset = request.args.get('offset', type=int)
+        if offset is None:
+            return jsonify({'error': 'Offset ontbreekt'}), 400
+        try:
+            upload = voeg_chunk_toe(upload_id, offset, request.stream, request.headers.get('X-Chunk-SHA256'))
+        except UploadFout as e:
+            return jsonify({'error': str(e), 'ontvangen': e.ontvangen}), 409
+    else:
+        upload = get_upload(upload_id)
+    
+    if upload is None:
+        return jsonify({'error': 'Upload niet gevonden'}), 404
+    return upload_response(upload)
+
+@import_bp.route('/uploads/<upload_id>/voltooien', methods=['POST'])
+def upload_voltooien(upload_id):
+    """API to finish a chunked upload, optionally checked against the SHA256 of the whole file"""
+    data = request.get_json(silent=True) or {}
+    try:
+        upload = voltooi_upload(upload_id, data.get('sha256'))
+    except UploadFout as e:
+        return jsonify({'error': str(e), 'ontvangen': e.ontvangen}), 409
     
-    return render_template('importeren.html', laatste_datum=laatste_datum)
\ No newline at end of file
+    if upload is None:
+        return jsonify({'error': 'Upload niet gevonden'}), 404
+    return upload_response(upload)
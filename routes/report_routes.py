@@ -5,9 +5,10 @@ Handles all reporting functionality including dashboard, kruistabel, and smart c
 """
 
 from flask import Blueprint, render_template, request, jsonify
-import sqlite3
+from models import repository
 import re
 from datetime import datetime
+from services import rapportage
 
 # Create blueprint for report routes
 report_bp = Blueprint('reports', __name__)
@@ -16,17 +17,8 @@ report_bp = Blueprint('reports', __name__)
 def dashboard():
     """Dashboard with graphical displays of transactions"""
     # Get available years and months for dropdowns
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
     # Get all available year/month combinations
-    cursor.execute('''
-        SELECT DISTINCT jaar, maand 
-        FROM transacties 
-        ORDER BY jaar DESC, maand DESC
-    ''')
-    
-    beschikbare_periodes = cursor.fetchall()
+    beschikbare_periodes = repository.beschikbare_periodes()
     
     # Get unique years
     jaren = sorted(list(set([periode[0] for periode in beschikbare_periodes])), reverse=True)
@@ -39,8 +31,6 @@ def dashboard():
         default_jaar = datetime.now().year
         default_maand = datetime.now().month
     
-    conn.close()
-    
     return render_template('dashboard.html', 
                          jaren=jaren,
                          default_jaar=default_jaar,
@@ -53,62 +43,9 @@ def dashboard_uitgaven_per_maand():
     eind_jaar = request.args.get('jaar', type=int)
     eind_maand = request.args.get('maand', type=int)
     
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
-    if eind_jaar and eind_maand:
-        # Calculate start date (12 months back)
-        if eind_maand == 12:
-            start_jaar = eind_jaar
-            start_maand = 1
-        else:
-            start_jaar = eind_jaar - 1
-            start_maand = eind_maand + 1
-        
-        # Get data for specific period
-        cursor.execute('''
-            SELECT jaar, maand, SUM(bedrag) as totaal
-            FROM transacties 
-            WHERE bedrag < 0 
-            AND ((jaar = ? AND maand >= ?) OR 
-                 (jaar > ? AND jaar < ?) OR 
-                 (jaar = ? AND maand <= ?))
-            GROUP BY jaar, maand
-            ORDER BY jaar, maand
-        ''', (start_jaar, start_maand, start_jaar, eind_jaar, eind_jaar, eind_maand))
-    else:
-        # Default: last 12 months
-        cursor.execute('''
-            SELECT jaar, maand, SUM(bedrag) as totaal
-            FROM transacties 
-            WHERE bedrag < 0
-            GROUP BY jaar, maand
-            ORDER BY jaar DESC, maand DESC
-            LIMIT 12
-        ''')
-    
-    data = cursor.fetchall()
-    conn.close()
-    
-    # Convert to Chart.js format
-    maanden = ['Jan', 'Feb', 'Mrt', 'Apr', 'Mei', 'Jun', 
-               'Jul', 'Aug', 'Sep', 'Okt', 'Nov', 'Dec']
-    
-    labels = []
-    bedragen = []
-    
-    # For specific period: chronological order
-    # For default: reverse for chronological order
-    data_sorted = data if (eind_jaar and eind_maand) else reversed(data)
-    
-    for jaar, maand, totaal in data_sorted:
-        labels.append(f"{maanden[maand-1]} {jaar}")
-        bedragen.append(abs(totaal))
+    data = rapportage.uitgaven_per_maand(eind_jaar, eind_maand)
     
-    return jsonify({
-        'labels': labels,
-        'data': bedragen
-    })
+    return jsonify(data)
 
 @report_bp.route('/dashboard/top-categorien')
 def dashboard_top_categorien():
@@ -116,69 +53,9 @@ def dashboard_top_categorien():
     eind_jaar = request.args.get('jaar', type=int) or datetime.now().year
     eind_maand = request.args.get('maand', type=int) or datetime.now().month
     
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
-    # Calculate period (12 months)
-    if eind_maand == 12:
-        start_jaar = eind_jaar
-        start_maand = 1
-    else:
-        start_jaar = eind_jaar - 1
-        start_maand = eind_maand + 1
-    
-    cursor.execute('''
-        SELECT c.id, c.naam, c.kleur, SUM(t.bedrag) as totaal
-        FROM transacties t
-        JOIN categorien c ON t.categorie_id = c.id
-        WHERE t.bedrag < 0 
-        AND ((t.jaar = ? AND t.maand >= ?) OR 
-             (t.jaar > ? AND t.jaar < ?) OR 
-             (t.jaar = ? AND t.maand <= ?))
-        GROUP BY c.id, c.naam, c.kleur
-        ORDER BY SUM(t.bedrag) ASC
-        LIMIT 8
-    ''', (start_jaar, start_maand, start_jaar, eind_jaar, eind_jaar, eind_maand))
-    
-    data = cursor.fetchall()
-    
-    # Also uncategorized transactions for this period
-    cursor.execute('''
-        SELECT SUM(bedrag) as totaal
-        FROM transacties 
-        WHERE bedrag < 0 AND categorie_id IS NULL
-        AND ((jaar = ? AND maand >= ?) OR 
-             (jaar > ? AND jaar < ?) OR 
-             (jaar = ? AND maand <= ?))
-    ''', (start_jaar, start_maand, start_jaar, eind_jaar, eind_jaar, eind_maand))
-    
-    zonder_categorie = cursor.fetchone()[0] or 0
-    
-    conn.close()
-    
-    labels = []
-    bedragen = []
-    kleuren = []
-    categorie_ids = []
-    
-    for cat_id, naam, kleur, totaal in data:
-        labels.append(naam)
-        bedragen.append(abs(totaal))
-        kleuren.append(kleur)
-        categorie_ids.append(cat_id)
-    
-    if abs(zonder_categorie) > 50:
-        labels.append('Zonder categorie')
-        bedragen.append(abs(zonder_categorie))
-        kleuren.append('#6c757d')
-        categorie_ids.append(None)
+    data = rapportage.top_categorien(eind_jaar, eind_maand)
     
-    return jsonify({
-        'labels': labels,
-        'data': bedragen,
-        'colors': kleuren,
-        'categorie_ids': categorie_ids
-    })
+    return jsonify(data)
 
 @report_bp.route('/dashboard/inkomsten-uitgaven')
 def dashboard_inkomsten_uitgaven():
@@ -186,63 +63,9 @@ def dashboard_inkomsten_uitgaven():
     eind_jaar = request.args.get('jaar', type=int)
     eind_maand = request.args.get('maand', type=int)
     
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
-    if eind_jaar and eind_maand:
-        # Last 6 months from chosen period
-        if eind_maand > 6:
-            start_jaar = eind_jaar
-            start_maand = eind_maand - 5
-        else:
-            start_jaar = eind_jaar - 1
-            start_maand = eind_maand + 6
-        
-        cursor.execute('''
-            SELECT jaar, maand,
-                   SUM(CASE WHEN bedrag > 0 THEN bedrag ELSE 0 END) as inkomsten,
-                   SUM(CASE WHEN bedrag < 0 THEN bedrag ELSE 0 END) as uitgaven
-            FROM transacties 
-            WHERE ((jaar = ? AND maand >= ?) OR 
-                   (jaar > ? AND jaar < ?) OR 
-                   (jaar = ? AND maand <= ?))
-            GROUP BY jaar, maand
-            ORDER BY jaar, maand
-        ''', (start_jaar, start_maand, start_jaar, eind_jaar, eind_jaar, eind_maand))
-    else:
-        # Default: last 6 months
-        cursor.execute('''
-            SELECT jaar, maand,
-                   SUM(CASE WHEN bedrag > 0 THEN bedrag ELSE 0 END) as inkomsten,
-                   SUM(CASE WHEN bedrag < 0 THEN bedrag ELSE 0 END) as uitgaven
-            FROM transacties 
-            GROUP BY jaar, maand
-            ORDER BY jaar DESC, maand DESC
-            LIMIT 6
-        ''')
-    
-    data = cursor.fetchall()
-    conn.close()
-    
-    maanden = ['Jan', 'Feb', 'Mrt', 'Apr', 'Mei', 'Jun', 
-               'Jul', 'Aug', 'Sep', 'Okt', 'Nov', 'Dec']
-    
-    labels = []
-    inkomsten_data = []
-    uitgaven_data = []
-    
-    data_sorted = data if (eind_jaar and eind_maand) else reversed(data)
-    
-    for jaar, maand, inkomsten, uitgaven in data_sorted:
-        labels.append(f"{maanden[maand-1]} {jaar}")
-        inkomsten_data.append(inkomsten)
-        uitgaven_data.append(abs(uitgaven))
+    data = rapportage.inkomsten_uitgaven(eind_jaar, eind_maand)
     
-    return jsonify({
-        'labels': labels,
-        'inkomsten': inkomsten_data,
-        'uitgaven': uitgaven_data
-    })
+    return jsonify(data)
 
 @report_bp.route('/dashboard/statistieken')
 def dashboard_statistieken():
@@ -250,163 +73,43 @@ def dashboard_statistieken():
     eind_jaar = request.args.get('jaar', type=int) or datetime.now().year
     eind_maand = request.args.get('maand', type=int) or datetime.now().month
     
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
-    # Calculate period (12 months)
-    if eind_maand == 12:
-        start_jaar = eind_jaar
-        start_maand = 1
-    else:
-        start_jaar = eind_jaar - 1
-        start_maand = eind_maand + 1
-    
-    # Totals for selected period
-    cursor.execute('''
-        SELECT 
-            COUNT(*) as totaal_transacties,
-            SUM(CASE WHEN bedrag > 0 THEN bedrag ELSE 0 END) as totaal_inkomsten,
-            SUM(CASE WHEN bedrag < 0 THEN bedrag ELSE 0 END) as totaal_uitgaven,
-            COUNT(DISTINCT categorie_id) as gecategoriseerd
-        FROM transacties 
-        WHERE ((jaar = ? AND maand >= ?) OR 
-               (jaar > ? AND jaar < ?) OR 
-               (jaar = ? AND maand <= ?))
-    ''', (start_jaar, start_maand, start_jaar, eind_jaar, eind_jaar, eind_maand))
-    
-    stats = cursor.fetchone()
-    
-    # Number of categories (total, not period-specific)
-    cursor.execute('SELECT COUNT(*) FROM categorien')
-    aantal_categorien = cursor.fetchone()[0]
-    
-    # Without category for this period
-    cursor.execute('''
-        SELECT COUNT(*) FROM transacties 
-        WHERE categorie_id IS NULL
-        AND ((jaar = ? AND maand >= ?) OR 
-             (jaar > ? AND jaar < ?) OR 
-             (jaar = ? AND maand <= ?))
-    ''', (start_jaar, start_maand, start_jaar, eind_jaar, eind_jaar, eind_maand))
-    
-    zonder_categorie = cursor.fetchone()[0]
-    
-    conn.close()
-    
-    totaal_transacties, totaal_inkomsten, totaal_uitgaven, gecategoriseerd = stats
-    netto = totaal_inkomsten + totaal_uitgaven  # expenses are negative
-    
-    # Determine period label
-    maanden = ['Jan', 'Feb', 'Mrt', 'Apr', 'Mei', 'Jun', 
-               'Jul', 'Aug', 'Sep', 'Okt', 'Nov', 'Dec']
-    periode_label = f"{maanden[start_maand-1]} {start_jaar} - {maanden[eind_maand-1]} {eind_jaar}"
+    data = rapportage.statistieken(eind_jaar, eind_maand)
     
-    return jsonify({
-        'totaal_transacties': totaal_transacties,
-        'totaal_inkomsten': totaal_inkomsten,
-        'totaal_uitgaven': abs(totaal_uitgaven),
-        'netto_resultaat': netto,
-        'aantal_categorien': aantal_categorien,
-        'zonder_categorie': zonder_categorie,
-        'periode': periode_label,
-        'eind_jaar': eind_jaar,
-        'eind_maand': eind_maand
-    })
+    return jsonify(data)
 
 @report_bp.route('/')
 def rapportages():
     """Main reports page with kruistabel"""
     # Get available years for dropdowns
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT DISTINCT jaar FROM transacties ORDER BY jaar DESC')
-    jaren = [row[0] for row in cursor.fetchall()]
+    jaren = repository.beschikbare_jaren()
     
     # Get most recent year as default
     huidig_jaar = request.args.get('jaar', str(jaren[0]) if jaren else str(datetime.now().year))
     
-    conn.close()
-    
     return render_template('rapportages.html', jaren=jaren, huidig_jaar=int(huidig_jaar))
 
 @report_bp.route('/kruistabel')
 def kruistabel_data():
-    """API endpoint for kruistabel data with category IDs"""
+    """API endpoint for kruistabel data with category IDs (?jaar=2024, or ?van=2023-07&tot=2024-06)"""
+    van = request.args.get('van')
+    tot = request.args.get('tot')
+    
+    if van and tot:
+        try:
+            data = rapportage.kruistabel_periode(*rapportage.lees_jaar_maand(van),
+                                                 *rapportage.lees_jaar_maand(tot))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(data)
+    
     jaar = request.args.get('jaar', type=int)
     
     if not jaar:
         return jsonify({'error': 'Jaar parameter ontbreekt'}), 400
     
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
-    # Get all categories
-    cursor.execute('SELECT id, naam FROM categorien ORDER BY naam')
-    categorien = cursor.fetchall()
-    
-    # Build kruistabel data
-    kruistabel_data = {}
-    categorie_ids = {}
-    maand_totalen = {i: 0 for i in range(1, 13)}
-    categorie_totalen = {}
-    
-    # For each category, get amounts per month
-    for cat_id, cat_naam in categorien:
-        cursor.execute('''
-            SELECT maand, SUM(bedrag) 
-            FROM transacties 
-            WHERE categorie_id = ? AND jaar = ? 
-            GROUP BY maand
-        ''', (cat_id, jaar))
-        
-        maand_bedragen = dict(cursor.fetchall())
-        kruistabel_data[cat_naam] = {}
-        categorie_ids[cat_naam] = cat_id
-        categorie_totaal = 0
-        
-        for maand in range(1, 13):
-            bedrag = maand_bedragen.get(maand, 0)
-            kruistabel_data[cat_naam][maand] = bedrag
-            maand_totalen[maand] += bedrag
-            categorie_totaal += bedrag
-        
-        categorie_totalen[cat_naam] = categorie_totaal
+    data = rapportage.kruistabel(jaar)
     
-    # Also transactions without category
-    cursor.execute('''
-        SELECT maand, SUM(bedrag) 
-        FROM transacties 
-        WHERE categorie_id IS NULL AND jaar = ? 
-        GROUP BY maand
-    ''', (jaar,))
-    
-    maand_bedragen = dict(cursor.fetchall())
-    kruistabel_data['Zonder categorie'] = {}
-    categorie_ids['Zonder categorie'] = None
-    zonder_categorie_totaal = 0
-    
-    for maand in range(1, 13):
-        bedrag = maand_bedragen.get(maand, 0)
-        kruistabel_data['Zonder categorie'][maand] = bedrag
-        maand_totalen[maand] += bedrag
-        zonder_categorie_totaal += bedrag
-    
-    categorie_totalen['Zonder categorie'] = zonder_categorie_totaal
-    
-    # Calculate grand total
-    grand_total = sum(maand_totalen.values())
-    
-    conn.close()
-    
-    return jsonify({
-        'data': kruistabel_data,
-        'categorie_ids': categorie_ids,
-        'maand_totalen': maand_totalen,
-        'categorie_totalen': categorie_totalen,
-        'grand_total': grand_total,
-        'jaar': jaar
-    })
+    return jsonify(data)
 
 @report_bp.route('/transactie-details')
 def transactie_details():
@@ -430,46 +133,22 @@ def transactie_details():
         except ValueError:
             return jsonify({'error': 'Ongeldige categorie_id'}), 400
     
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
-    # Build query based on category
+    # Category name (404 for an unknown category)
     if categorie_id is not None:
-        cursor.execute('SELECT naam FROM categorien WHERE id = ?', (categorie_id,))
-        categorie_result = cursor.fetchone()
-        if not categorie_result:
-            conn.close()
+        categorie_naam = repository.categorie_naam(categorie_id)
+        if categorie_naam is None:
             return jsonify({'error': f'Categorie {categorie_id} niet gevonden'}), 404
-        categorie_naam = categorie_result[0]
-        
-        cursor.execute('''
-            SELECT t.id, t.datum, t.naam, t.bedrag, t.code, t.mededelingen, 
-                   t.tegenrekening, c.naam as categorie_naam
-            FROM transacties t
-            LEFT JOIN categorien c ON t.categorie_id = c.id
-            WHERE t.jaar = ? AND t.maand = ? AND t.categorie_id = ?
-            ORDER BY t.datum DESC, t.bedrag DESC
-        ''', (jaar, maand, categorie_id))
-        
     else:
-        cursor.execute('''
-            SELECT t.id, t.datum, t.naam, t.bedrag, t.code, t.mededelingen, 
-                   t.tegenrekening, 'Zonder categorie' as categorie_naam
-            FROM transacties t
-            WHERE t.jaar = ? AND t.maand = ? AND t.categorie_id IS NULL
-            ORDER BY t.datum DESC, t.bedrag DESC
-        ''', (jaar, maand))
-        
         categorie_naam = 'Zonder categorie'
     
-    transacties = cursor.fetchall()
+    transacties = repository.categorie_in_maand(jaar, maand, categorie_id)
     
-    # Calculate statistics
+    # Calculate statistics (exact, in integer cents)
     if transacties:
-        bedragen = [t[3] for t in transacties]
-        totaal_bedrag = sum(bedragen)
-        uitgaven = sum(b for b in bedragen if b < 0)
-        inkomsten = sum(b for b in bedragen if b > 0)
+        bedragen = [t[8] for t in transacties]
+        totaal_bedrag = sum(bedragen) / 100
+        uitgaven = sum(b for b in bedragen if b < 0) / 100
+        inkomsten = sum(b for b in bedragen if b > 0) / 100
         gemiddeld = totaal_bedrag / len(bedragen)
     else:
         totaal_bedrag = uitgaven = inkomsten = gemiddeld = 0
@@ -480,8 +159,6 @@ def transactie_details():
         'Juli', 'Augustus', 'September', 'Oktober', 'November', 'December'
     ]
     
-    conn.close()
-    
     # Format transactions for JSON
     transacties_formatted = []
     for t in transacties:
@@ -519,6 +196,11 @@ def transactie_details():
         }
     })
 
+@report_bp.route('/query-statistieken')
+def query_statistieken():
+    """API for the number of calls and time per repository query (when QUERY_TIMING is on)"""
+    return jsonify(repository.query_statistieken())
+
 @report_bp.route('/auto-categorisering')
 def auto_categorisering():
     """Page for automatic categorization"""
@@ -527,22 +209,8 @@ def auto_categorisering():
 @report_bp.route('/categoriseer-analyse')
 def categoriseer_analyse():
     """Analyze transaction names for automatic categorization with proper pattern matching"""
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
     # Get all uncategorized transactions
-    cursor.execute('''
-        SELECT naam, COUNT(*) as aantal, 
-               AVG(bedrag) as gemiddeld_bedrag,
-               MIN(bedrag) as min_bedrag,
-               MAX(bedrag) as max_bedrag
-        FROM transacties 
-        WHERE categorie_id IS NULL 
-        GROUP BY naam 
-        ORDER BY COUNT(*) DESC
-    ''')
-    
-    naam_statistieken = cursor.fetchall()
+    naam_statistieken = repository.naam_statistieken_ongecategoriseerd()
     
     # Detect patterns for automatic categorization
     categoriseer_suggesties = []
@@ -604,8 +272,7 @@ def categoriseer_analyse():
             })
     
     # Search for existing categories to link
-    cursor.execute('SELECT id, naam FROM categorien ORDER BY naam')
-    categorien = dict(cursor.fetchall())
+    categorien = dict(repository.alle_categorien())
     
     # Try to match categories
     boodschappen_cat_id = None
@@ -649,13 +316,8 @@ def categoriseer_analyse():
                 })
     
     # General statistics
-    cursor.execute('SELECT COUNT(*) FROM transacties WHERE categorie_id IS NULL')
-    totaal_ongecategoriseerd = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(*) FROM transacties WHERE categorie_id IS NOT NULL')
-    totaal_gecategoriseerd = cursor.fetchone()[0]
-    
-    conn.close()
+    totaal_ongecategoriseerd = repository.aantal_zonder_categorie()
+    totaal_gecategoriseerd = repository.aantal_gecategoriseerd()
     
     return jsonify({
         'totaal_ongecategoriseerd': totaal_ongecategoriseerd,
@@ -677,28 +339,14 @@ def auto_categoriseren():
     if not patronen or not categorie_id:
         return jsonify({'error': 'Patronen en categorie_id zijn verplicht'}), 400
     
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
     if transactie_ids:
         # Use only selected transaction IDs
-        placeholders = ','.join('?' * len(transactie_ids))
-        update_query = f'''
-            UPDATE transacties 
-            SET categorie_id = ? 
-            WHERE id IN ({placeholders}) AND categorie_id IS NULL
-        '''
-        cursor.execute(update_query, [categorie_id] + transactie_ids)
-        aantal_te_updaten = cursor.rowcount
+        aantal_te_updaten = repository.ken_categorie_toe(categorie_id, transactie_ids,
+                                                         alleen_ongecategoriseerd=True)
         
     else:
         # Old way: all transactions matching patterns
-        cursor.execute('''
-            SELECT id, naam FROM transacties 
-            WHERE categorie_id IS NULL
-        ''')
-        
-        alle_transacties = cursor.fetchall()
+        alle_transacties = repository.ongecategoriseerde_namen()
         te_updaten_ids = []
         
         # Filter transactions with Python regex
@@ -712,16 +360,7 @@ def auto_categoriseren():
         aantal_te_updaten = len(te_updaten_ids)
         
         if aantal_te_updaten > 0:
-            placeholders = ','.join('?' * len(te_updaten_ids))
-            update_query = f'''
-                UPDATE transacties 
-                SET categorie_id = ? 
-                WHERE id IN ({placeholders})
-            '''
-            cursor.execute(update_query, [categorie_id] + te_updaten_ids)
-    
-    conn.commit()
-    conn.close()
+            repository.ken_categorie_toe(categorie_id, te_updaten_ids)
     
     return jsonify({
         'aantal_updated': aantal_te_updaten,
@@ -737,18 +376,8 @@ def preview_transacties():
     if not patronen:
         return jsonify({'error': 'Patronen zijn verplicht'}), 400
     
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
     # Get ALL uncategorized transactions
-    cursor.execute('''
-        SELECT id, datum, naam, bedrag, code, mededelingen
-        FROM transacties 
-        WHERE categorie_id IS NULL
-        ORDER BY datum DESC
-    ''')
-    
-    alle_transacties = cursor.fetchall()
+    alle_transacties = repository.ongecategoriseerde_transacties()
     matched_transacties = []
     
     # Filter transactions with Python regex
@@ -770,8 +399,6 @@ def preview_transacties():
                 })
                 break
     
-    conn.close()
-    
     # Sort by date (newest first)
     matched_transacties.sort(key=lambda x: x['datum'], reverse=True)
     
@@ -792,27 +419,15 @@ def dashboard_maand_details():
     if maand < 1 or maand > 12:
         return jsonify({'error': 'Maand moet tussen 1 en 12 zijn'}), 400
     
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
     # Get all transactions for this month
-    cursor.execute('''
-        SELECT t.id, t.datum, t.naam, t.bedrag, t.code, t.mededelingen, 
-               t.tegenrekening, c.naam as categorie_naam
-        FROM transacties t
-        LEFT JOIN categorien c ON t.categorie_id = c.id
-        WHERE t.jaar = ? AND t.maand = ?
-        ORDER BY t.datum DESC, t.bedrag DESC
-    ''', (jaar, maand))
-    
-    transacties = cursor.fetchall()
-    
-    # Calculate statistics
+    transacties = repository.transacties_in_maand(jaar, maand)
+    
+    # Calculate statistics (exact, in integer cents)
     if transacties:
-        bedragen = [t[3] for t in transacties]
-        totaal_bedrag = sum(bedragen)
-        uitgaven = sum(b for b in bedragen if b < 0)
-        inkomsten = sum(b for b in bedragen if b > 0)
+        bedragen = [t[8] for t in transacties]
+        totaal_bedrag = sum(bedragen) / 100
+        uitgaven = sum(b for b in bedragen if b < 0) / 100
+        inkomsten = sum(b for b in bedragen if b > 0) / 100
         gemiddeld = totaal_bedrag / len(bedragen)
     else:
         totaal_bedrag = uitgaven = inkomsten = gemiddeld = 0
@@ -823,8 +438,6 @@ def dashboard_maand_details():
         'Juli', 'Augustus', 'September', 'Oktober', 'November', 'December'
     ]
     
-    conn.close()
-    
     # Format transactions for JSON
     transacties_formatted = []
     for t in transacties:
@@ -884,12 +497,7 @@ def dashboard_categorie_details():
     # Calculate period (last X months until eind_jaar/eind_maand)
     if not eind_jaar or not eind_maand:
         # Default: current month from data
-        conn = sqlite3.connect('transacties.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT MAX(jaar), MAX(maand) FROM transacties WHERE jaar = (SELECT MAX(jaar) FROM transacties)')
-        result = cursor.fetchone()
-        eind_jaar, eind_maand = result if result[0] else (datetime.now().year, datetime.now().month)
-        conn.close()
+        eind_jaar, eind_maand = repository.laatste_periode() or (datetime.now().year, datetime.now().month)
     
     # Calculate start period
     if eind_maand > periode_maanden:
@@ -899,53 +507,23 @@ def dashboard_categorie_details():
         start_jaar = eind_jaar - 1
         start_maand = eind_maand + 12 - periode_maanden + 1
     
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
     # Get category info
     if categorie_id is not None:
-        cursor.execute('SELECT naam FROM categorien WHERE id = ?', (categorie_id,))
-        categorie_result = cursor.fetchone()
-        if not categorie_result:
-            conn.close()
+        categorie_naam = repository.categorie_naam(categorie_id)
+        if categorie_naam is None:
             return jsonify({'error': f'Categorie {categorie_id} niet gevonden'}), 404
-        categorie_naam = categorie_result[0]
     else:
         categorie_naam = 'Zonder categorie'
     
-    # Build query for period
-    if categorie_id is not None:
-        cursor.execute('''
-            SELECT t.id, t.datum, t.naam, t.bedrag, t.code, t.mededelingen, 
-                   t.tegenrekening, c.naam as categorie_naam
-            FROM transacties t
-            LEFT JOIN categorien c ON t.categorie_id = c.id
-            WHERE t.categorie_id = ?
-            AND ((t.jaar = ? AND t.maand >= ?) OR 
-                 (t.jaar > ? AND t.jaar < ?) OR 
-                 (t.jaar = ? AND t.maand <= ?))
-            ORDER BY t.datum DESC, t.bedrag DESC
-        ''', (categorie_id, start_jaar, start_maand, start_jaar, eind_jaar, eind_jaar, eind_maand))
-    else:
-        cursor.execute('''
-            SELECT t.id, t.datum, t.naam, t.bedrag, t.code, t.mededelingen, 
-                   t.tegenrekening, 'Zonder categorie' as categorie_naam
-            FROM transacties t
-            WHERE t.categorie_id IS NULL
-            AND ((t.jaar = ? AND t.maand >= ?) OR 
-                 (t.jaar > ? AND t.jaar < ?) OR 
-                 (t.jaar = ? AND t.maand <= ?))
-            ORDER BY t.datum DESC, t.bedrag DESC
-        ''', (start_jaar, start_maand, start_jaar, eind_jaar, eind_jaar, eind_maand))
-    
-    transacties = cursor.fetchall()
-    
-    # Calculate statistics
+    # Transactions of the category in the period
+    transacties = repository.categorie_in_periode(categorie_id, start_jaar, start_maand, eind_jaar, eind_maand)
+    
+    # Calculate statistics (exact, in integer cents)
     if transacties:
-        bedragen = [t[3] for t in transacties]
-        totaal_bedrag = sum(bedragen)
-        uitgaven = sum(b for b in bedragen if b < 0)
-        inkomsten = sum(b for b in bedragen if b > 0)
+        bedragen = [t[8] for t in transacties]
+        totaal_bedrag = sum(bedragen) / 100
+        uitgaven = sum(b for b in bedragen if b < 0) / 100
+        inkomsten = sum(b for b in bedragen if b > 0) / 100
         gemiddeld = totaal_bedrag / len(bedragen)
     else:
         totaal_bedrag = uitgaven = inkomsten = gemiddeld = 0
@@ -958,8 +536,6 @@ def dashboard_categorie_details():
     
     periode_beschrijving = f"{maand_namen[start_maand]} {start_jaar} - {maand_namen[eind_maand]} {eind_jaar}"
     
-    conn.close()
-    
     # Format transactions for JSON
     transacties_formatted = []
     for t in transacties:
@@ -4,120 +4,164 @@ Transaction Routes - Transaction Display and Management
 Handles transaction listing, searching, sorting, and category assignment
 """
 
-from flask import Blueprint, render_template, request, jsonify
-import sqlite3
+import base64
+import json
+
+from flask import Blueprint, request, jsonify, flash
+from models import repository
+from services.zoektaal import ontleed_zoekopdracht
+from .weergave import toon, RijenStroom
 
 # Create blueprint for transaction routes
 transaction_bp = Blueprint('transactions', __name__)
 
-@transaction_bp.route('/')
-def transacties():
-    """Show all transactions in a table with categories - with server-side sorting and searching"""
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
-    
-    # Get parameters from URL
+# Rows rendered with the page; the rest is loaded while scrolling (/pagina)
+PAGINA_GROOTTE = 100
+MAX_PAGINA_GROOTTE = 1000
+
+# Search results are counted up to this number; beyond it the page says "meer dan"
+MAX_TELLING = 10000
+
+def lijst_parameters():
+    """Search term, sort column and sort order from the URL, with defaults for invalid values"""
     zoekterm = request.args.get('zoek', '').strip()
     sort_column = request.args.get('sort', 'datum')  # Default: datum
     sort_order = request.args.get('order', 'desc')   # Default: desc (newest first)
     
-    # Validate sort parameters for security
-    valid_columns = {
-        'datum': 't.datum',
-        'naam': 't.naam', 
-        'bedrag': 't.bedrag',
-        'code': 't.code',
-        'categorie': 'c.naam'
-    }
-    
-    valid_orders = ['asc', 'desc']
-    
-    # Use defaults if parameters are invalid
-    if sort_column not in valid_columns:
+    # Use defaults if parameters are invalid (only known columns reach the SQL)
+    if sort_column not in repository.SORTEER_KOLOMMEN:
         sort_column = 'datum'
-    if sort_order not in valid_orders:
+    if sort_order not in repository.SORTEER_RICHTINGEN:
         sort_order = 'desc'
     
-    # Build SQL query
-    base_query = '''
-        SELECT t.id, t.datum, t.naam, t.bedrag, t.code, t.mededelingen, 
-               t.tegenrekening, t.saldo_na_mutatie, c.naam as categorie_naam, c.id as categorie_id
-        FROM transacties t
-        LEFT JOIN categorien c ON t.categorie_id = c.id
-    '''
-    
-    # WHERE clause for searching
-    params = []
-    if zoekterm:
-        where_clause = '''
-            WHERE (t.datum LIKE ? OR 
-                   t.naam LIKE ? OR 
-                   t.bedrag LIKE ? OR 
-                   t.code LIKE ? OR 
-                   t.mededelingen LIKE ? OR 
-                   t.tegenrekening LIKE ? OR
-                   c.naam LIKE ?)
-        '''
-        search_pattern = f'%{zoekterm}%'
-        params = [search_pattern] * 7
-        base_query += where_clause
-    
-    # ORDER BY clause
-    sql_column = valid_columns[sort_column]
-    
-    # Special handling for category (NULL values at bottom)
-    if sort_column == 'categorie':
-        if sort_order == 'asc':
-            order_clause = f' ORDER BY {sql_column} IS NULL, {sql_column} ASC, t.datum DESC'
-        else:
-            order_clause = f' ORDER BY {sql_column} IS NULL, {sql_column} DESC, t.datum DESC'
+    return zoekterm, sort_column, sort_order
+
+def maak_cursor(rij, sort_column):
+    """Opaque page cursor after rij: the keyset (sort value, id) as URL-safe base64 JSON"""
+    sleutel = json.dumps(repository.pagina_sleutel(rij, sort_column), separators=(',', ':'))
+    return base64.urlsafe_b64encode(sleutel.encode()).decode()
+
+def lees_cursor(cursor):
+    """
+    Keyset (sort value, id) from a page cursor
+    
+    Raises:
+        ValueError: When the cursor was not made by maak_cursor
+    """
+    try:
+        waarde, transactie_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Ongeldige cursor') from None
+    if not isinstance(transactie_id, int) or not isinstance(waarde, (str, int, type(None))):
+        raise ValueError('Ongeldige cursor')
+    return waarde, transactie_id
+
+def lees_wijzigingen(data, categorie_ids):
+    """
+    Category changes from a JSON body {"wijzigingen": [[transactie_id, categorie_id], ...]}
+    
+    Args:
+        data: The parsed JSON body
+        categorie_ids (set): Ids of the existing categories; None clears the category
+    
+    Returns:
+        list: (transactie_id, categorie_id) pairs; for a transaction listed twice only the last
+    
+    Raises:
+        ValueError: When the body is not a list of such pairs
+    """
+    wijzigingen = data.get('wijzigingen') if isinstance(data, dict) else None
+    if not isinstance(wijzigingen, list):
+        raise ValueError('Lijst met wijzigingen ontbreekt')
+    
+    per_transactie = {}
+    for wijziging in wijzigingen:
+        if not isinstance(wijziging, list) or len(wijziging) != 2:
+            raise ValueError('Wijziging moet een paar [transactie_id, categorie_id] zijn')
+        transactie_id, categorie_id = wijziging
+        if type(transactie_id) is not int:
+            raise ValueError(f'Ongeldig transactie_id: {transactie_id!r}')
+        if categorie_id is not None and (type(categorie_id) is not int or categorie_id not in categorie_ids):
+            raise ValueError(f'Onbekende categorie: {categorie_id!r}')
+        per_transactie[transactie_id] = categorie_id
+    return list(per_transactie.items())
+
+class TransactiePagina(RijenStroom):
+    """One page of the transaction list, streamed from the cursor"""
+    
+    def __init__(self, vrije_tekst, filters, sort_column, sort_order, limit, na=None):
+        # One row more than the page tells whether another page follows
+        super().__init__(repository.zoek_transacties(vrije_tekst, sort_column, sort_order, limit=limit + 1,
+                                                     filters=filters, na=na, stroom=True),
+                         limit)
+        self.sort_column = sort_column
+    
+    @property
+    def volgende(self):
+        """Cursor of the next page once the rows are read, or None after the last page"""
+        return maak_cursor(self.laatste, self.sort_column) if self.meer else None
+
+@transaction_bp.route('/')
+def transacties():
+    """Show the first page of transactions with categories - with server-side sorting and searching"""
+    zoekterm, sort_column, sort_order = lijst_parameters()
+    
+    # Field filters such as bedrag:<-50 or datum:2024-03..2024-06, plus free text
+    try:
+        vrije_tekst, filters = ontleed_zoekopdracht(zoekterm)
+    except ValueError as e:
+        flash(str(e), 'error')
+        transacties_data, totaal_resultaten = [], 0
     else:
-        # For other columns: secondary sort on date (newest first)
-        if sort_column == 'datum':
-            order_clause = f' ORDER BY {sql_column} {sort_order.upper()}, t.id {sort_order.upper()}'
-        else:
-            order_clause = f' ORDER BY {sql_column} {sort_order.upper()}, t.datum DESC'
-    
-    # Complete query with limit
-    full_query = base_query + order_clause + ' LIMIT 1000'
-    
-    cursor.execute(full_query, params)
-    transacties_data = cursor.fetchall()
+        # Rows are read from the cursor while the template renders
+        transacties_data = TransactiePagina(vrije_tekst, filters, sort_column, sort_order, PAGINA_GROOTTE)
+        # Count total results, up to MAX_TELLING for searches
+        totaal_resultaten = repository.tel_transacties(vrije_tekst, filters, maximum=MAX_TELLING)
     
     # Get all categories for dropdown
-    cursor.execute('SELECT id, naam FROM categorien ORDER BY naam')
-    alle_categorien = cursor.fetchall()
-    
-    # Count total results
-    if zoekterm:
-        count_query = '''
-            SELECT COUNT(*) FROM transacties t
-            LEFT JOIN categorien c ON t.categorie_id = c.id
-            WHERE (t.datum LIKE ? OR 
-                   t.naam LIKE ? OR 
-                   t.bedrag LIKE ? OR 
-                   t.code LIKE ? OR 
-                   t.mededelingen LIKE ? OR 
-                   t.tegenrekening LIKE ? OR
-                   c.naam LIKE ?)
-        '''
-        cursor.execute(count_query, params)
-    else:
-        cursor.execute('SELECT COUNT(*) FROM transacties')
+    alle_categorien = repository.alle_categorien()
     
-    totaal_resultaten = cursor.fetchone()[0]
-    
-    conn.close()
-    
-    return render_template('transacties.html', 
+    return toon('transacties.html', 
                          transacties=transacties_data,
                          alle_categorien=alle_categorien,
                          zoekterm=zoekterm,
                          totaal_resultaten=totaal_resultaten,
-                         getoond_resultaten=len(transacties_data),
+                         meer_resultaten=totaal_resultaten > MAX_TELLING,
+                         max_telling=MAX_TELLING,
+                         pagina_grootte=PAGINA_GROOTTE,
                          current_sort=sort_column,
                          current_order=sort_order)
 
+@transaction_bp.route('/pagina')
+def transacties_pagina():
+    """API for the next page of the transaction list (keyset pagination, for infinite scrolling)"""
+    zoekterm, sort_column, sort_order = lijst_parameters()
+    limit = min(max(request.args.get('limit', PAGINA_GROOTTE, type=int), 1), MAX_PAGINA_GROOTTE)
+    
+    try:
+        vrije_tekst, filters = ontleed_zoekopdracht(zoekterm)
+        na = lees_cursor(request.args['na']) if request.args.get('na') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    pagina = TransactiePagina(vrije_tekst, filters, sort_column, sort_order, limit, na)
+    
+    return jsonify({
+        'transacties': [{
+            'id': t[0],
+            'datum': t[1],
+            'naam': t[2],
+            'bedrag': t[3],
+            'code': t[4],
+            'mededelingen': t[5] or '',
+            'tegenrekening': t[6] or '',
+            'saldo': t[7],
+            'categorie': t[8],
+            'categorie_id': t[9]
+        } for t in pagina],
+        'volgende': pagina.volgende
+    })
+
 @transaction_bp.route('/update-categorie', methods=['POST'])
 def update_transactie_categorie():
     """Update the category of a transaction"""
@@ -128,16 +172,19 @@ def update_transactie_categorie():
     if categorie_id == '':
         categorie_id = None
     
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
+    repository.zet_transactie_categorie(transactie_id, categorie_id)
     
-    cursor.execute('''
-        UPDATE transacties 
-        SET categorie_id = ? 
-        WHERE id = ?
-    ''', (categorie_id, transactie_id))
-    
-    conn.commit()
-    conn.close()
-    
-    return '', 204  # No content response for AJAX calls
\ No newline at end of file
+    return '', 204  # No content response for AJAX calls
+
+@transaction_bp.route('/update-categorien', methods=['POST'])
+def update_transactie_categorien():
+    """API to update the categories of many transactions in one transaction (changes queued by the table)"""
+    categorie_ids = {categorie[0] for categorie in repository.alle_categorien()}
+    try:
+        wijzigingen = lees_wijzigingen(request.get_json(silent=True), categorie_ids)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    bijgewerkt = repository.zet_transactie_categorien(wijzigingen) if wijzigingen else 0
+    
+    return jsonify({'bijgewerkt': bijgewerkt})
@@ -0,0 +1,59 @@
+"""
+Rendering Helpers
+=================
+Pages with long tables (transactions, category suggestions) are rendered
+from a RijenStroom: rows come straight from the database cursor while the
+template renders. With STREAM_TEMPLATES on, the HTML is also sent as it is
+rendered, so the browser starts on the page before the last row is read.
+"""
+
+from itertools import chain, islice
+from flask import current_app, render_template, stream_template, get_flashed_messages
+
+def toon(template, **context):
+    """
+    render_template, or stream_template when app.config['STREAM_TEMPLATES'] is on
+    
+    Args:
+        template (str): Template name
+        **context: Template variables; RijenStroom values are read while rendering
+    """
+    if current_app.config.get('STREAM_TEMPLATES'):
+        # The session is saved before the body streams; popping the flashed
+        # messages now removes them from it, the template gets them from the request
+        get_flashed_messages()
+        return stream_template(template, **context)
+    return render_template(template, **context)
+
+class RijenStroom:
+    """
+    Rows for a template, read from a cursor or generator while it renders
+    
+    Iterating yields at most limit rows. Afterwards aantal holds the number
+    of rows yielded, laatste the last of them and meer whether the source
+    had more. A template can test the stream ({% if rijen %}) before the
+    loop; that reads one row ahead.
+    """
+    
+    def __init__(self, rijen, limit=None):
+        self._rijen = iter(rijen)
+        self._vooruit = []
+        self._limit = limit
+        self.aantal = 0
+        self.laatste = None
+        self.meer = False
+    
+    def __bool__(self):
+        if self.aantal == 0 and not self._vooruit:
+            self._vooruit = list(islice(self._rijen, 1))
+        return self.aantal > 0 or bool(self._vooruit)
+    
+    def __iter__(self):
+        for rij in chain(self._vooruit, self._rijen):
+            if self._limit is not None and self.aantal == self._limit:
+                self.meer = True
+                break
+            self.aantal += 1
+            self.laatste = rij
+            yield rij
+        self._vooruit = []
@@ -0,0 +1,161 @@
+"""
+CAMT.053 Parser
+===============
+Streams ISO 20022 CAMT.053 bank statements (XML) into normalized rows
+"""
+
+import xml.etree.ElementTree as ET
+from .hash_generator import parse_cents
+from .parser_registry import (registreer_parser, iter_record_batches, parse_normalized_batch, ing_code,
+                              CHUNK_SIZE, BATCH_SIZE)
+
+# Balance types the running saldo starts from: opening booked, or previous closing
+BEGIN_SALDO_TYPES = ('OPBD', 'PRCD')
+
+# Entry statuses that are not (yet) booked and are left out of the import
+NIET_GEBOEKT = ('PDNG', 'INFO')
+
+def lokale_naam(tag):
+    """Tag without its XML namespace, which differs per CAMT.053 version"""
+    return tag.rpartition('}')[2]
+
+def kind(element, *pad):
+    """First descendant following a path of local tag names, or None"""
+    for naam in pad:
+        if element is None:
+            return None
+        element = next((sub for sub in element if lokale_naam(sub.tag) == naam), None)
+    return element
+
+def tekst(element, *pad):
+    """Stripped text of kind(element, *pad), or '' when it is missing"""
+    gevonden = kind(element, *pad)
+    return (gevonden.text or '').strip() if gevonden is not None else ''
+
+def bedrag_cent(element):
+    """Signed amount in cents of an element with Amt and CdtDbtInd (debit is negative)"""
+    cent = parse_cents(tekst(element, 'Amt').replace('.', ','))
+    return -cent if tekst(element, 'CdtDbtInd') == 'DBIT' else cent
+
+def rekeningnummer(rekening):
+    """IBAN of an account element, or its other identification"""
+    return tekst(rekening, 'Id', 'IBAN') or tekst(rekening, 'Id', 'Othr', 'Id')
+
+def partijnaam(partij):
+    """Name of a related party; from version 8 on it is nested in a Pty element"""
+    return tekst(partij, 'Nm') or tekst(partij, 'Pty', 'Nm')
+
+def entry_record(ntry, rekening, saldo_cent):
+    """
+    Normalize one Ntry element
+    
+    Returns:
+        tuple: (record for parse_normalized_batch, saldo after this entry)
+    """
+    bedrag = bedrag_cent(ntry)
+    saldo_cent += bedrag
+    
+    datum = (tekst(ntry, 'BookgDt', 'Dt') or tekst(ntry, 'BookgDt', 'DtTm')
+             or tekst(ntry, 'ValDt', 'Dt'))[:10].replace('-', '')
+    
+    # The ISO code before the bank's own: it is what MT940 types map onto as well
+    code = ing_code(tekst(ntry, 'BkTxCd', 'Domn', 'Fmly', 'SubFmlyCd'), tekst(ntry, 'BkTxCd', 'Prtry', 'Cd'))
+    
+    # The counterparty is the creditor of a debit and the debtor of a credit
+    tx = kind(ntry, 'NtryDtls', 'TxDtls')
+    tegenpartij = 'Cdtr' if bedrag < 0 else 'Dbtr'
+    naam = partijnaam(kind(tx, 'RltdPties', tegenpartij))
+    tegenrekening = rekeningnummer(kind(tx, 'RltdPties', tegenpartij + 'Acct'))
+    
+    rmt_inf = kind(tx, 'RmtInf')
+    ustrd = [sub.text.strip() for sub in (rmt_inf if rmt_inf is not None else [])
+             if lokale_naam(sub.tag) == 'Ustrd' and sub.text]
+    mededelingen = (' '.join(ustrd) or tekst(rmt_inf, 'Strd', 'CdtrRefInf', 'Ref')
+                    or tekst(tx, 'AddtlTxInf') or tekst(ntry, 'AddtlNtryInf'))
+    
+    return (datum, naam or tekst(ntry, 'AddtlNtryInf'), rekening, tegenrekening, code,
+            bedrag, mededelingen, saldo_cent), saldo_cent
+
+def iter_camt_records(raw, chunk_size=CHUNK_SIZE, progress_callback=None):
+    """
+    Stream the entries of a CAMT.053 file as normalized records
+    
+    The file is fed to an XMLPullParser chunk by chunk, and every Bal and
+    Ntry element is removed from the tree once it has been read, so memory
+    stays bounded however many entries a statement has. The saldo after
+    each entry is the running total from the statement's opening balance
+    (0 when the statement has none).
+    
+    Args:
+        raw: Binary stream with the XML
+        chunk_size (int): Number of bytes read per chunk
+        progress_callback (callable): Called with (chunk_number, bytes_read)
+    
+    Yields:
+        tuple or str: A record for parse_normalized_batch, or an error
+            message for an entry that could not be read
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    pad = []  # open elements, root first
+    rekening = ''
+    saldo_cent = 0
+    chunk_number = 0
+    bytes_read = 0
+    
+    while True:
+        chunk = raw.read(chunk_size)
+        if chunk:
+            parser.feed(chunk)
+            chunk_number += 1
+            bytes_read += len(chunk)
+            if progress_callback:
+                progress_callback(chunk_number, bytes_read)
+        else:
+            parser.close()
+        
+        for event, element in parser.read_events():
+            if event == 'start':
+                pad.append(element)
+                continue
+            
+            pad.pop()
+            naam = lokale_naam(element.tag)
+            if naam == 'Stmt':
+                rekening = ''
+                saldo_cent = 0
+            elif naam == 'Acct' and pad and lokale_naam(pad[-1].tag) == 'Stmt':
+                rekening = rekeningnummer(element)
+            elif naam == 'Bal':
+                if tekst(element, 'Tp', 'CdOrPrtry', 'Cd') in BEGIN_SALDO_TYPES:
+                    try:
+                        saldo_cent = bedrag_cent(element)
+                    except ValueError as e:
+                        yield f"Beginsaldo: {str(e)}"
+            elif naam == 'Ntry':
+                status = tekst(element, 'Sts') or tekst(element, 'Sts', 'Cd')
+                if status not in NIET_GEBOEKT:
+                    try:
+                        record, saldo_cent = entry_record(element, rekening, saldo_cent)
+                        yield record
+                    except ValueError as e:
+                        yield str(e)
+            else:
+                continue
+            
+            # Done with this element: drop it from its parent so the tree stays small
+            if pad:
+                pad[-1].remove(element)
+        
+        if not chunk:
+            break
+
+def herken_camt053(kop):
+    """A CAMT.053 statement is XML with a BkToCstmrStmt document or camt.053 namespace"""
+    return kop.startswith(b'<') and (b'BkToCstmrStmt' in kop or b'camt.053' in kop)
+
+def iter_camt_batches(raw, batch_size=BATCH_SIZE, chunk_size=CHUNK_SIZE, progress_callback=None, skip_rows=0):
+    """iter_batches for the registry"""
+    yield from iter_record_batches(iter_camt_records(raw, chunk_size, progress_callback),
+                                   batch_size, skip_rows)
+
+registreer_parser('camt053', herken_camt053, iter_camt_batches, parse_normalized_batch)
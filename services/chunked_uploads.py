@@ -0,0 +1,224 @@
+"""
+Chunked Upload Service
+======================
+Receives large exports in chunks, beyond the MAX_CONTENT_LENGTH of a single
+request. Chunks are hashed and appended as they arrive, an interrupted
+upload continues from the last complete chunk, and the import is queued
+once the upload is complete: the single import worker never waits on a
+client that may not come back.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import uuid
+from .import_jobs import start_import_job
+
+# Uploaded parts are kept here until their import has finished
+UPLOAD_DIR = os.path.join(tempfile.gettempdir(), 'ing-uploads')
+
+# Unfinished uploads without a new chunk for this long are discarded
+UPLOAD_TTL = 60 * 60  # seconds
+
+# Bytes copied per read from the request body
+KOPIEER_BLOK = 64 * 1024
+
+_uploads = {}
+_uploads_lock = threading.Lock()
+
+class UploadFout(Exception):
+    """A chunk that doesn't fit the upload; ontvangen says where to continue"""
+    
+    def __init__(self, melding, ontvangen):
+        super().__init__(melding)
+        self.ontvangen = ontvangen
+
+def _annuleer(upload):
+    """Mark an unfinished upload as cancelled and remove its file; a finished one belongs to its job"""
+    with upload['lock']:
+        if upload['status'] != 'ontvangen':
+            return
+        upload['status'] = 'geannuleerd'
+        if os.path.exists(upload['pad']):
+            os.remove(upload['pad'])
+
+def _purge_uploads():
+    """Forget uploads without activity for UPLOAD_TTL (caller holds _uploads_lock)"""
+    grens = time.time() - UPLOAD_TTL
+    verlopen = [upload_id for upload_id, upload in _uploads.items() if upload['bijgewerkt_op'] < grens]
+    for upload_id in verlopen:
+        _annuleer(_uploads.pop(upload_id))
+
+def start_upload(bestandsnaam, grootte=None):
+    """
+    Begin a chunked upload; its import job starts when the upload is finished
+    
+    Args:
+        bestandsnaam (str): Original filename
+        grootte (int): Announced total size in bytes, optional
+    
+    Returns:
+        dict: Snapshot of the upload, see get_upload()
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    upload_id = uuid.uuid4().hex
+    pad = os.path.join(UPLOAD_DIR, f'{upload_id}.part')
+    open(pad, 'wb').close()
+    
+    upload = {
+        'id': upload_id,
+        'bestandsnaam': bestandsnaam,
+        'grootte': grootte,
+        'pad': pad,
+        'ontvangen': 0,
+        'sha256': hashlib.sha256(),
+        'digest': None,
+        'status': 'ontvangen',
+        'job_id': None,
+        'lock': threading.Lock(),
+        'schrijf_lock': threading.Lock(),
+        'bijgewerkt_op': time.time()
+    }
+    
+    with _uploads_lock:
+        _purge_uploads()
+        _uploads[upload_id] = upload
+    
+    return _snapshot(upload)
+
+def voeg_chunk_toe(upload_id, offset, stream, chunk_sha256=None):
+    """
+    Append one chunk to an upload
+    
+    The chunk is written behind the bytes received so far and only counts
+    once it has been read completely (and matches chunk_sha256, if given).
+    A dropped connection or a wrong checksum therefore leaves the upload,
+    and its file, at the last complete chunk, and the client resumes from
+    the ontvangen it gets back.
+    
+    Args:
+        upload_id (str): Id from start_upload()
+        offset (int): Byte offset of the chunk; must equal the bytes received so far
+        stream: Binary stream with the chunk (the request body)
+        chunk_sha256 (str): Optional hex SHA256 of the chunk
+    
+    Returns:
+        dict: Snapshot of the upload, or None for an unknown upload
+    
+    Raises:
+        UploadFout: When the offset or checksum doesn't match
+    """
+    upload = _uploads.get(upload_id)
+    if upload is None:
+        return None
+    
+    # One chunk at a time per upload: the check and the write happen under the same lock
+    with upload['schrijf_lock']:
+        if upload['status'] != 'ontvangen':
+            raise UploadFout('Upload is al afgerond', upload['ontvangen'])
+        if offset != upload['ontvangen']:
+            raise UploadFout(f"Verwacht deel vanaf byte {upload['ontvangen']}", upload['ontvangen'])
+        
+        sha256 = upload['sha256'].copy()
+        chunk_hash = hashlib.sha256()
+        with open(upload['pad'], 'r+b') as bestand:
+            try:
+                bestand.seek(offset)
+                while True:
+                    blok = stream.read(KOPIEER_BLOK)
+                    if not blok:
+                        break
+                    bestand.write(blok)
+                    sha256.update(blok)
+                    chunk_hash.update(blok)
+                # A shorter retry of an earlier chunk leaves nothing of it behind
+                bestand.truncate()
+                lengte = bestand.tell() - offset
+                
+                if chunk_sha256 and chunk_sha256.lower() != chunk_hash.hexdigest():
+                    raise UploadFout('Controlegetal van het deel klopt niet', upload['ontvangen'])
+            except BaseException:
+                # The file must hold exactly the bytes the running digest covers
+                bestand.truncate(upload['ontvangen'])
+                raise
+        
+        with upload['lock']:
+            upload['sha256'] = sha256
+            upload['ontvangen'] += lengte
+            upload['bijgewerkt_op'] = time.time()
+    
+    return _snapshot(upload)
+
+def voltooi_upload(upload_id, sha256=None):
+    """
+    Mark an upload as complete
+    
+    Args:
+        upload_id (str): Id from start_upload()
+        sha256 (str): Optional hex SHA256 of the whole file, checked against
+            the digest built up from the chunks
+    
+    Returns:
+        dict: Snapshot of the upload, or None for an unknown upload
+    
+    Raises:
+        UploadFout: When the size or checksum doesn't match
+    """
+    upload = _uploads.get(upload_id)
+    if upload is None:
+        return None
+    
+    # No chunk is being written while the upload is completed, and a repeated
+    # or concurrent request finds the job already queued
+    with upload['schrijf_lock'], upload['lock']:
+        if upload['status'] == 'ontvangen':
+            if upload['grootte'] is not None and upload['ontvangen'] != upload['grootte']:
+                raise UploadFout(f"Upload onvolledig: {upload['ontvangen']} van {upload['grootte']} bytes",
+                                 upload['ontvangen'])
+            digest = upload['sha256'].hexdigest()
+            if sha256 and sha256.lower() != digest:
+                raise UploadFout('Controlegetal van het bestand klopt niet', upload['ontvangen'])
+            
+            upload['digest'] = digest
+            upload['status'] = 'voltooid'
+            upload['bijgewerkt_op'] = time.time()
+        
+        # The digest of the chunks goes along, so the import ledger does not hash the file again
+        if upload['status'] == 'voltooid' and upload['job_id'] is None:
+            upload['job_id'] = start_import_job([upload['pad']], bestandsnamen=[upload['bestandsnaam']],
+                                                bekende_digests=[(upload['digest'], upload['ontvangen'])])
+    
+    return _snapshot(upload)
+
+def annuleer_upload(upload_id):
+    """
+    Stop an upload and discard the chunks received so far
+    
+    Only unfinished uploads can be cancelled this way: a finished upload
+    already has its import job, which runs to the end.
+    
+    Returns:
+        bool: False for an unknown upload
+    """
+    with _uploads_lock:
+        upload = _uploads.pop(upload_id, None)
+    if upload is None:
+        return False
+    
+    _annuleer(upload)
+    return True
+
+def get_upload(upload_id):
+    """
+    Get a snapshot of an upload
+    
+    Returns:
+        dict: id, bestandsnaam, grootte, ontvangen, status and job_id, or None
+    """
+    upload = _uploads.get(upload_id)
+    return _snapshot(upload) if upload else None
+
+def _snapshot(upload):
+    return {veld: upload[veld] for veld in ('id', 'bestandsnaam', 'grootte', 'ontvangen', 'status', 'job_id')}
@@ -1,107 +1,396 @@
 """
 CSV Processing Service
 ======================
-Handles ING CSV file processing and transaction import
+Handles ING CSV file processing and transaction import; CAMT.053 and MT940
+statements go through the same pipeline via the parser registry
 """
 
-import csv
 import io
-import sqlite3
-from .hash_generator import generate_transaction_hash
+import multiprocessing
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from models.database import (get_hash_formaat, open_connection, pauzeer_insert_triggers,
+                             herstel_insert_triggers)
+from .parser_registry import (kies_parser, CHUNK_SIZE, BATCH_SIZE, HASH_POSITIE,
+                              BESTANDSEXTENSIES)
+from .hash_filter import get_hash_filter
+from .import_ledger import (bekende_bestanden, bepaal_vingerafdruk, registreer_import,
+                            laad_checkpoint, bewaar_checkpoint, verwijder_checkpoint)
 
-def process_ing_csv(file_path):
+CHECKPOINT_ROWS = 10000  # rows per commit + checkpoint during an import
+
+# Parser processes come from a fork server (or are spawned where there is
+# none): forking the threaded web server itself could hand a child a lock
+# that another thread held at that moment. Children import the main module,
+# so it must be safe to import (app.py and cli.py are); the server preloads
+# the parsers, so every worker forks with them already imported.
+if 'forkserver' in multiprocessing.get_all_start_methods():
+    PARSER_CONTEXT = multiprocessing.get_context('forkserver')
+    PARSER_CONTEXT.set_forkserver_preload(['services.parser_registry'])
+else:
+    PARSER_CONTEXT = multiprocessing.get_context('spawn')
+
+INSERT_TRANSACTIE_SQL = '''
+    INSERT OR IGNORE INTO transacties 
+    (datum, jaar, maand, dag, naam, rekening, tegenrekening, code, 
+     bedrag, mededelingen, saldo_na_mutatie, hash, bedrag_cent, saldo_cent)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+def insert_batch(conn, batch):
     """
-    Process an ING CSV file and import transactions
+    Insert a batch of parsed rows, letting the hash UNIQUE index drop duplicates
+    
+    Duplicates against the database and within the batch itself are resolved
+    in one executemany call instead of a SELECT per row.
     
     Args:
-        file_path (str): Path to the CSV file
+        conn (sqlite3.Connection): Open database connection
+        batch (list): Tuples from make_ing_row_parser
         
     Returns:
-        dict: Processing results with counts and errors
+        int: Number of rows actually inserted
+    """
+    if not batch:
+        return 0
+    
+    # rowcount counts the inserted rows only; total_changes would also count
+    # the maandtotalen rows the insert trigger writes
+    return conn.executemany(INSERT_TRANSACTIE_SQL, batch).rowcount
+
+class GeleendeStream(io.BufferedIOBase):
+    """
+    Read-only view of a binary stream owned by the caller
+    
+    Reading starts at the beginning of the stream, and closing the view
+    leaves the stream itself open, so an uploaded file can be read more
+    than once without being copied.
+    """
+    
+    def __init__(self, stream):
+        super().__init__()
+        self._stream = stream
+        self._stream.seek(0)
+    
+    def readable(self):
+        return True
+    
+    def read(self, size=-1):
+        return self._stream.read(-1 if size is None else size)
+    
+    def read1(self, size=-1):
+        return self.read(size)
+
+def bron_naam(bron):
+    """Default display name of an import source: its file name, if it has one"""
+    if isinstance(bron, str):
+        return os.path.basename(bron)
+    return os.path.basename(getattr(bron, 'name', None) or 'upload.csv')
+
+def iter_csv_sources(bron, bestandsnaam=None, inhoud=None):
+    """
+    Find the statement file, or every statement file inside a ZIP archive
+    
+    Sources are returned as openers rather than open streams, because the
+    import reads each source twice: once to fingerprint it, once to parse it.
+    
+    Args:
+        bron: Path to a statement file or .zip archive, or a seekable binary
+            stream (e.g. an uploaded file) with the contents of one
+        bestandsnaam (str): Display name of a plain file (defaults to its name on disk)
+        inhoud (tuple): (digest, grootte) of bron when already known
+        
+    Yields:
+        tuple: (display name, callable that opens the source as a binary
+            stream, its (digest, grootte) or None; None for archive members)
+    """
+    if isinstance(bron, str):
+        open_bron = lambda: open(bron, 'rb')
+    else:
+        open_bron = lambda: GeleendeStream(bron)
+    
+    if zipfile.is_zipfile(bron):
+        with zipfile.ZipFile(bron) as archive:
+            for member in archive.infolist():
+                if member.is_dir() or not member.filename.lower().endswith(BESTANDSEXTENSIES):
+                    continue
+                yield member.filename, lambda member=member: archive.open(member), None
+    else:
+        yield bestandsnaam or bron_naam(bron), open_bron, inhoud
+
+def process_ing_files(bronnen, jobs=1, progress_callback=None, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE,
+                      bestandsnamen=None, checkpoint_rows=CHECKPOINT_ROWS, dry_run=False, bekende_digests=None):
     """
-    conn = sqlite3.connect('transacties.db')
-    cursor = conn.cursor()
+    Import one or more statement files (or ZIP archives of them)
+    
+    The format of every file (ING CSV, CAMT.053 XML or MT940) is sniffed by
+    the parser registry; all formats produce the same rows. Row batches
+    from all files are parsed and hashed in a process pool when jobs > 1,
+    while this process stays the single writer: batches are inserted in
+    order over one connection, so SQLite never sees competing writers and
+    the hash index still catches duplicates across files.
+    Rows whose hash the in-memory prefilter already knows are counted as
+    duplicates without a database round trip.
+    
+    Every source is fingerprinted against the import ledger first: a file
+    that was imported before is skipped entirely, and a file that extends a
+    known export only has its new rows parsed.
+    
+    The import commits every checkpoint_rows rows together with a checkpoint
+    (file digest plus rows done), so the write lock is never held for the
+    whole file and an interrupted import of the same file resumes after the
+    last checkpoint. Within each of those transactions the per-row insert
+    triggers are paused, and the tables they maintain (maandtotalen, the
+    search index) catch up with one statement each just before the commit.
+    
+    A dry run parses, hashes and inserts everything as usual but rolls the
+    whole import back at the end, so the counts show what an import would
+    do without changing the database, the ledger or the prefilter.
+    
+    Args:
+        bronnen (list): Paths to statement files or .zip archives, or seekable binary streams
+            with their contents; streams are read in place and left open
+        jobs (int): Number of parser processes; 1 parses inline
+        progress_callback (callable): Optional, called once per chunk with a
+            dict of the counts so far
+        chunk_size (int): Number of characters read per chunk
+        batch_size (int): Number of rows per parse/insert batch
+        bestandsnamen (list): Original names of the files, for messages and
+            the ledger (defaults to the file names on disk)
+        checkpoint_rows (int): Number of rows per commit and checkpoint
+        dry_run (bool): Roll back instead of committing
+        bekende_digests (list): (digest, grootte) of each source whose SHA256
+            is already known, or None, so fingerprinting does not read the
+            whole file again (see bepaal_vingerafdruk)
+        
+    Returns:
+        dict: Processing results with counts and errors; bekende_bestanden
+            lists the sources skipped because they were imported before,
+            hervat the sources resumed from a checkpoint
+    """
+    # A connection of its own: the import commits in chunks on this thread
+    conn = open_connection()
+    hash_formaat = get_hash_formaat(conn)
+    known_hashes = None if dry_run else get_hash_filter()
+    ledger = bekende_bestanden(conn)
+    
+    # Hashes written since the last commit; the prefilter only learns them once committed
+    ongecommitteerd = []
+    
+    # Insert triggers paused in the open transaction; their derived tables
+    # are brought up to date once per commit instead of once per row
+    gepauzeerd = None
     
-    imported_count = 0
-    duplicate_count = 0
-    error_count = 0
+    counts = {'imported': 0, 'duplicates': 0, 'errors': 0, 'rijen': 0, 'chunks': 0}
     errors = []
+    overgeslagen = []
+    hervat = []
     
-    try:
-        with open(file_path, 'r', encoding='utf-8') as csvfile:
-            # Skip BOM if present
-            content = csvfile.read()
-            if content.startswith('\ufeff'):
-                content = content[1:]
-            
-            reader = csv.DictReader(io.StringIO(content), delimiter=';')
-            
-            for row_num, row in enumerate(reader, 1):
-                try:
-                    # Parse datum from YYYYMMDD format
-                    datum_str = row['Datum']
-                    jaar = int(datum_str[:4])
-                    maand = int(datum_str[4:6])
-                    dag = int(datum_str[6:8])
-                    datum = f"{jaar}-{maand:02d}-{dag:02d}"
-                    
-                    # Extract transaction details
-                    naam = row['Naam / Omschrijving']
-                    rekening = row['Rekening']
-                    tegenrekening = row.get('Tegenrekening', '')
-                    code = row['Code']
-                    mededelingen = row.get('Mededelingen', '')
-                    
-                    # Process amount - convert comma to dot and handle Af/Bij logic
-                    bedrag_str = row['Bedrag (EUR)'].replace(',', '.')
-                    bedrag = float(bedrag_str)
-                    
-                    if row['Af Bij'] == 'Af':
-                        bedrag = -bedrag
-                    
-                    # Process balance after transaction
-                    saldo_str = row['Saldo na mutatie'].replace(',', '.')
-                    saldo_na_mutatie = float(saldo_str)
-                    
-                    # Generate hash for duplicate checking
-                    transaction_hash = generate_transaction_hash(
-                        jaar, maand, dag, naam, bedrag, code, mededelingen, tegenrekening, saldo_na_mutatie
-                    )
+    def report_chunk(chunk_number, characters_read):
+        counts['chunks'] += 1
+        if progress_callback:
+            progress_callback({
+                'chunks': counts['chunks'],
+                'gelezen': characters_read,
+                'rijen': counts['rijen'],
+                'imported': counts['imported'],
+                'duplicates': counts['duplicates'],
+                'errors': counts['errors']
+            })
+    
+    def write(bron, parse_result):
+        nonlocal gepauzeerd
+        parsed, batch_errors = parse_result
+        bron['sinds_checkpoint'] += len(parsed) + len(batch_errors)
+        
+        # Rows the prefilter knows are skipped without touching the database
+        if known_hashes and parsed:
+            bekend = known_hashes.bekende_hashes(conn, [row[HASH_POSITIE] for row in parsed])
+            nieuw = [row for row in parsed if row[HASH_POSITIE] not in bekend]
+        else:
+            nieuw = parsed
+        
+        if nieuw and gepauzeerd is None:
+            gepauzeerd = pauzeer_insert_triggers(conn)
+        inserted = insert_batch(conn, nieuw)
+        if known_hashes:
+            ongecommitteerd.extend(row[HASH_POSITIE] for row in nieuw)
+        
+        for teller in (counts, bron):
+            teller['imported'] += inserted
+            teller['duplicates'] += len(parsed) - inserted
+            teller['errors'] += len(batch_errors)
+            teller['rijen'] += len(parsed) + len(batch_errors)
+        
+        if parsed:
+            datums = [row[0] for row in parsed]
+            bron['eerste_datum'] = min(filter(None, (bron['eerste_datum'], min(datums))))
+            bron['laatste_datum'] = max(filter(None, (bron['laatste_datum'], max(datums))))
+        
+        if bron['label']:
+            batch_errors = [f"{bron['label']}: {error}" for error in batch_errors]
+        errors.extend(batch_errors)
+        
+        if bron['sinds_checkpoint'] >= checkpoint_rows:
+            checkpoint(bron)
+    
+    def commit():
+        nonlocal gepauzeerd
+        if gepauzeerd:
+            herstel_insert_triggers(conn, gepauzeerd)
+            gepauzeerd = None
+        conn.commit()
+        if known_hashes:
+            known_hashes.voeg_toe(ongecommitteerd)
+        ongecommitteerd.clear()
+    
+    def checkpoint(bron):
+        if dry_run:
+            bron['sinds_checkpoint'] = 0
+            return
+        
+        # The checkpoint is committed together with the rows it covers
+        bewaar_checkpoint(conn, bron['naam'], bron['vingerafdruk']['digest'], bron['rijen'],
+                          bron['imported'], bron['duplicates'], bron['errors'],
+                          bron['eerste_datum'], bron['laatste_datum'])
+        commit()
+        bron['sinds_checkpoint'] = 0
+    
+    def finish(bron):
+        if dry_run:
+            return
+        
+        # Only completely processed sources go into the ledger
+        entry = registreer_import(conn, bron['naam'], bron['vingerafdruk'],
+                                  bron['overgeslagen_rijen'] + bron['rijen'],
+                                  bron['eerste_datum'], bron['laatste_datum'],
+                                  bron['imported'], bron['duplicates'], bron['errors'])
+        verwijder_checkpoint(conn, bron['vingerafdruk']['digest'])
+        commit()
+        ledger.insert(0, entry)
+    
+    def iter_work():
+        # Yields ('batch', bron, parse_batch, context, records, first_row_num) and ('einde', bron)
+        for invoer, bestandsnaam, inhoud in zip(bronnen, bestandsnamen or [None] * len(bronnen),
+                                                bekende_digests or [None] * len(bronnen)):
+            bestandsnaam = bestandsnaam or bron_naam(invoer)
+            try:
+                for naam, open_binary, inhoud in iter_csv_sources(invoer, bestandsnaam, inhoud):
+                    digest, grootte = inhoud or (None, None)
+                    with open_binary() as raw:
+                        vingerafdruk = bepaal_vingerafdruk(raw, ledger, digest=digest, grootte=grootte)
                     
-                    # Check if transaction already exists
-                    cursor.execute('SELECT id FROM transacties WHERE hash = ?', (transaction_hash,))
-                    if cursor.fetchone():
-                        duplicate_count += 1
+                    if vingerafdruk['identiek']:
+                        bekend_aantal = vingerafdruk['identiek']['aantal_rijen']
+                        counts['duplicates'] += bekend_aantal
+                        counts['rijen'] += bekend_aantal
+                        overgeslagen.append(naam)
                         continue
                     
-                    # Insert transaction
-                    cursor.execute('''
-                        INSERT INTO transacties 
-                        (datum, jaar, maand, dag, naam, rekening, tegenrekening, code, 
-                         bedrag, mededelingen, saldo_na_mutatie, hash)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (datum, jaar, maand, dag, naam, rekening, tegenrekening, code,
-                          bedrag, mededelingen, saldo_na_mutatie, transaction_hash))
+                    prefix = vingerafdruk['prefix']
+                    enkel_bestand = len(bronnen) == 1 and naam == bestandsnaam
+                    bron = {
+                        'naam': naam,
+                        # Error messages only name the source file when there is more than one
+                        'label': None if enkel_bestand else naam,
+                        'vingerafdruk': vingerafdruk,
+                        'overgeslagen_rijen': prefix['aantal_rijen'] if prefix else 0,
+                        'eerste_datum': prefix['eerste_datum'] if prefix else None,
+                        'laatste_datum': prefix['laatste_datum'] if prefix else None,
+                        'imported': 0, 'duplicates': 0, 'errors': 0, 'rijen': 0,
+                        'sinds_checkpoint': 0
+                    }
+                    counts['duplicates'] += bron['overgeslagen_rijen']
+                    counts['rijen'] += bron['overgeslagen_rijen']
                     
-                    imported_count += 1
+                    # Resume an interrupted import of this exact file after its last checkpoint
+                    eerdere_voortgang = laad_checkpoint(conn, vingerafdruk['digest'])
+                    if eerdere_voortgang:
+                        bron.update(eerdere_voortgang)
+                        counts['rijen'] += bron['rijen']
+                        hervat.append((naam, bron['overgeslagen_rijen'] + bron['rijen']))
                     
-                except Exception as e:
-                    error_count += 1
-                    errors.append(f"Regel {row_num}: {str(e)}")
-                    continue
+                    with open_binary() as raw:
+                        parser, stream = kies_parser(raw)
+                        for context, records, first_row_num in parser['iter_batches'](
+                                stream, batch_size, chunk_size, report_chunk,
+                                bron['overgeslagen_rijen'] + bron['rijen']):
+                            yield 'batch', bron, parser['parse_batch'], context, records, first_row_num
+                    
+                    yield 'einde', bron
+            except Exception as e:
+                counts['errors'] += 1
+                errors.append(f"{bestandsnaam}: {str(e)}")
+    
+    def handle(item, resultaat):
+        if item[0] == 'batch':
+            write(item[1], resultaat)
+        else:
+            finish(item[1])
+    
+    try:
+        if jobs > 1:
+            with ProcessPoolExecutor(max_workers=jobs, mp_context=PARSER_CONTEXT) as pool:
+                # Bounded window of in-flight batches keeps memory flat
+                pending = deque()
+                for item in iter_work():
+                    future = None
+                    if item[0] == 'batch':
+                        future = pool.submit(*item[2:], hash_formaat)
+                    pending.append((item, future))
+                    if len(pending) >= jobs * 2:
+                        klaar, future = pending.popleft()
+                        handle(klaar, future.result() if future else None)
+                while pending:
+                    klaar, future = pending.popleft()
+                    handle(klaar, future.result() if future else None)
+        else:
+            for item in iter_work():
+                handle(item, item[2](*item[3:], hash_formaat) if item[0] == 'batch' else None)
         
-        conn.commit()
+        if dry_run:
+            conn.rollback()
+        else:
+            commit()
         
     except Exception as e:
         errors.append(f"Algemene fout: {str(e)}")
-        error_count += 1
+        counts['errors'] += 1
+        
+        # Uncommitted rows are rolled back when the connection closes; their
+        # hashes never reached the prefilter
     
     finally:
         conn.close()
     
     return {
-        'imported': imported_count,
-        'duplicates': duplicate_count,
-        'errors': error_count,
-        'error_details': errors
-    }
\ No newline at end of file
+        'imported': counts['imported'],
+        'duplicates': counts['duplicates'],
+        'errors': counts['errors'],
+        'error_details': errors,
+        'bekende_bestanden': overgeslagen,
+        'hervat': hervat
+    }
+
+def process_ing_csv(file_path, progress_callback=None, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE):
+    """
+    Process an ING CSV file and import transactions
+    
+    The file is streamed chunk by chunk through a generator, so peak memory
+    does not grow with the size of the export. Parsed rows are inserted in
+    batches; every row that was not inserted is counted as a duplicate.
+    
+    Args:
+        file_path: Path to the CSV file, or a seekable binary stream with its contents
+        progress_callback (callable): Optional, called once per chunk with a
+            dict of the counts so far
+        chunk_size (int): Number of characters read per chunk
+        batch_size (int): Number of rows per insert batch
+        
+    Returns:
+        dict: Processing results with counts and errors
+    """
+    return process_ing_files([file_path], jobs=1, progress_callback=progress_callback,
+                             chunk_size=chunk_size, batch_size=batch_size)
@@ -0,0 +1,250 @@
+"""
+Hash Filter Service
+===================
+In-memory prefilter of known transaction hashes, so duplicate rows can be
+recognised during an import without asking SQLite about every row
+"""
+
+import math
+import sys
+import threading
+
+# 'exact' keeps every hash in a set, 'bloom' uses a Bloom filter, None disables the prefilter
+DEFAULT_FILTER_SOORT = 'exact'
+DEFAULT_FOUT_KANS = 0.001  # false-positive rate of the Bloom filter
+
+# Bloom filter capacity: room for this many times the current number of hashes
+BLOOM_GROEI_FACTOR = 2
+BLOOM_MIN_CAPACITEIT = 100000
+
+# Maximum number of parameters in one IN (...) verification query
+VERIFICATIE_BATCH = 500
+
+def _digest_bytes(transaction_hash):
+    """Raw digest bytes of a stored hash, whichever storage format it has"""
+    if isinstance(transaction_hash, str):
+        return bytes.fromhex(transaction_hash[:32])
+    return transaction_hash
+
+class ExactHashFilter:
+    """Exact set of every known hash: no false positives, memory grows with the table"""
+    
+    soort = 'exact'
+    
+    def __init__(self):
+        self.hashes = set()
+        self.opzoekingen = 0
+        self.treffers = 0
+    
+    def voeg_toe(self, transaction_hash):
+        self.hashes.add(transaction_hash)
+    
+    def misschien_bekend(self, transaction_hash):
+        return transaction_hash in self.hashes
+    
+    def is_exact(self):
+        return True
+    
+    def aantal(self):
+        return len(self.hashes)
+    
+    def geheugen_bytes(self):
+        elementen = sum(sys.getsizeof(h) for h in self.hashes)
+        return sys.getsizeof(self.hashes) + elementen
+    
+    def extra_statistieken(self):
+        return {}
+
+class BloomHashFilter:
+    """
+    Bloom filter over the known hashes
+    
+    The stored hashes are SHA256 digests already, so the bit positions are
+    derived from the digest itself (double hashing on two 64-bit halves)
+    instead of hashing again.
+    """
+    
+    soort = 'bloom'
+    
+    def __init__(self, capaciteit, fout_kans):
+        self.capaciteit = capaciteit
+        self.fout_kans = fout_kans
+        self.aantal_bits = max(8, int(-capaciteit * math.log(fout_kans) / (math.log(2) ** 2)))
+        self.aantal_hashes = max(1, round(self.aantal_bits / capaciteit * math.log(2)))
+        self.bits = bytearray((self.aantal_bits + 7) // 8)
+        self.toegevoegd = 0
+        self.opzoekingen = 0
+        self.treffers = 0
+    
+    def _posities(self, transaction_hash):
+        digest = _digest_bytes(transaction_hash)
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:16], 'little') | 1
+        return ((h1 + i * h2) % self.aantal_bits for i in range(self.aantal_hashes))
+    
+    def voeg_toe(self, transaction_hash):
+        for positie in self._posities(transaction_hash):
+            self.bits[positie >> 3] |= 1 << (positie & 7)
+        self.toegevoegd += 1
+    
+    def misschien_bekend(self, transaction_hash):
+        return all(self.bits[positie >> 3] & (1 << (positie & 7))
+                   for positie in self._posities(transaction_hash))
+    
+    def is_exact(self):
+        return False
+    
+    def aantal(self):
+        return self.toegevoegd
+    
+    def geheugen_bytes(self):
+        return sys.getsizeof(self.bits)
+    
+    def extra_statistieken(self):
+        return {
+            'capaciteit': self.capaciteit,
+            'fout_kans': self.fout_kans,
+            'aantal_hashfuncties': self.aantal_hashes
+        }
+
+class KnownHashes:
+    """
+    Lazily loaded filter of the hashes in transacties.hash
+    
+    The filter is filled from the database on first use and kept up to date
+    by the import after every commit, so it never holds hashes of rows that
+    were rolled back. It belongs to the database it was loaded from and is
+    loaded again when a connection to another database asks. Only positive
+    answers of a Bloom filter are checked against the database, with one IN
+    query per batch.
+    """
+    
+    def __init__(self, soort=DEFAULT_FILTER_SOORT, fout_kans=DEFAULT_FOUT_KANS):
+        self.soort = soort
+        self.fout_kans = fout_kans
+        self.filter = None
+        self.database = None
+        self.geverifieerd = 0
+        self.vals_positief = 0
+        self.lock = threading.Lock()
+    
+    def _laad(self, conn):
+        """Build the filter from the database (caller holds self.lock)"""
+        cursor = conn.cursor()
+        if self.soort == 'bloom':
+            aantal = cursor.execute('SELECT COUNT(*) FROM transacties').fetchone()[0]
+            capaciteit = max(BLOOM_MIN_CAPACITEIT, aantal * BLOOM_GROEI_FACTOR)
+            nieuw_filter = BloomHashFilter(capaciteit, self.fout_kans)
+        else:
+            nieuw_filter = ExactHashFilter()
+        
+        # Iterate the cursor instead of fetchall() so loading stays streaming
+        for (transaction_hash,) in cursor.execute('SELECT hash FROM transacties'):
+            nieuw_filter.voeg_toe(transaction_hash)
+        
+        self.filter = nieuw_filter
+    
+    def _filter_voor(self, conn):
+        # The file of the main database; '' for the shared in-memory database
+        database = conn.execute('PRAGMA database_list').fetchone()[2]
+        
+        # A Bloom filter that outgrew its capacity is rebuilt at a larger size
+        if self.filter is None or database != self.database or (
+                self.filter.soort == 'bloom' and self.filter.aantal() > self.filter.capaciteit):
+            self._laad(conn)
+            self.database = database
+        return self.filter
+    
+    def bekende_hashes(self, conn, hashes):
+        """
+        Determine which of the given hashes are already in the database
+        
+        Args:
+            conn (sqlite3.Connection): Connection used for loading and verification
+            hashes (list): Hashes of a batch of parsed rows
+            
+        Returns:
+            set: The hashes that certainly exist in transacties
+        """
+        with self.lock:
+            hash_filter = self._filter_voor(conn)
+            kandidaten = [h for h in hashes if hash_filter.misschien_bekend(h)]
+            hash_filter.opzoekingen += len(hashes)
+            
+            if hash_filter.is_exact():
+                hash_filter.treffers += len(kandidaten)
+                return set(kandidaten)
+            
+            bekend = set()
+            for start in range(0, len(kandidaten), VERIFICATIE_BATCH):
+                deel = kandidaten[start:start + VERIFICATIE_BATCH]
+                placeholders = ','.join('?' * len(deel))
+                cursor = conn.execute(f'SELECT hash FROM transacties WHERE hash IN ({placeholders})', deel)
+                bekend.update(row[0] for row in cursor)
+            
+            hash_filter.treffers += len(bekend)
+            self.geverifieerd += len(kandidaten)
+            self.vals_positief += len(set(kandidaten)) - len(bekend)
+            return bekend
+    
+    def voeg_toe(self, hashes):
+        """Record hashes of rows that are now committed to the database"""
+        with self.lock:
+            if self.filter is not None:
+                for transaction_hash in hashes:
+                    self.filter.voeg_toe(transaction_hash)
+    
+    def reset(self):
+        """Forget the filter, e.g. after the hash storage format changed"""
+        with self.lock:
+            self.filter = None
+            self.database = None
+            self.geverifieerd = 0
+            self.vals_positief = 0
+    
+    def statistieken(self):
+        """Memory footprint and hit rate of the filter"""
+        with self.lock:
+            if self.soort is None:
+                return {'soort': None, 'geladen': False}
+            if self.filter is None:
+                return {'soort': self.soort, 'geladen': False}
+            
+            hash_filter = self.filter
+            stats = {
+                'soort': hash_filter.soort,
+                'geladen': True,
+                'aantal_hashes': hash_filter.aantal(),
+                'geheugen_bytes': hash_filter.geheugen_bytes(),
+                'opzoekingen': hash_filter.opzoekingen,
+                'treffers': hash_filter.treffers,
+                'hit_rate': hash_filter.treffers / hash_filter.opzoekingen if hash_filter.opzoekingen else 0,
+                'geverifieerd': self.geverifieerd,
+                'vals_positief': self.vals_positief
+            }
+            stats.update(hash_filter.extra_statistieken())
+            return stats
+
+_known_hashes = KnownHashes()
+
+def configure_hash_filter(soort=DEFAULT_FILTER_SOORT, fout_kans=DEFAULT_FOUT_KANS):
+    """
+    Choose the prefilter used by imports
+    
+    Args:
+        soort (str): 'exact', 'bloom' or None to disable
+        fout_kans (float): False-positive rate of the Bloom filter
+    """
+    if soort not in ('exact', 'bloom', None):
+        raise ValueError(f"Onbekend filter: {soort}")
+    
+    global _known_hashes
+    _known_hashes = KnownHashes(soort=soort, fout_kans=fout_kans)
+
+def get_hash_filter():
+    """The shared KnownHashes instance, or None when the prefilter is disabled"""
+    return _known_hashes if _known_hashes.soort else None
+
+def hash_filter_statistieken():
+    """Statistics of the shared prefilter, see KnownHashes.statistieken"""
+    return _known_hashes.statistieken()
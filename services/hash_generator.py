@@ -6,7 +6,33 @@ Responsible for generating unique transaction hashes for duplicate detection
 
 import hashlib
 
-def generate_transaction_hash(jaar, maand, dag, naam, bedrag, code, mededelingen, tegenrekening, saldo_na_mutatie):
+# Storage formats for transacties.hash: the original 64-character hex string,
+# or the raw SHA256 digest as a BLOB (full 32 bytes, or truncated to 16 bytes)
+HASH_FORMATEN = {
+    'hex': None,
+    'blob32': 32,
+    'blob16': 16
+}
+DEFAULT_HASH_FORMAAT = 'hex'
+
+def hash_voor_opslag(sha256_hash, hash_formaat=DEFAULT_HASH_FORMAAT):
+    """
+    Turn a finished hashlib.sha256 object into the value stored in transacties.hash
+    
+    Args:
+        sha256_hash: hashlib.sha256 object
+        hash_formaat (str): One of HASH_FORMATEN
+        
+    Returns:
+        str or bytes: Hex string for 'hex', otherwise the (truncated) digest
+    """
+    lengte = HASH_FORMATEN[hash_formaat]
+    if lengte is None:
+        return sha256_hash.hexdigest()
+    return sha256_hash.digest()[:lengte]
+
+def generate_transaction_hash(jaar, maand, dag, naam, bedrag, code, mededelingen, tegenrekening, saldo_na_mutatie,
+                              hash_formaat=DEFAULT_HASH_FORMAAT):
     """
     Generate a unique hash for a transaction including saldo na mutatie
     
@@ -23,9 +49,10 @@ def generate_transaction_hash(jaar, maand, dag, naam, bedrag, code, mededelingen
         mededelingen (str): Transaction details/remarks
         tegenrekening (str): Counter account
         saldo_na_mutatie (float): Balance after transaction
+        hash_formaat (str): Storage format, see HASH_FORMATEN
         
     Returns:
-        str: SHA256 hash of transaction data
+        str or bytes: SHA256 hash of transaction data
     """
     # Convert amount to string with fixed precision
     bedrag_str = f"{bedrag:.2f}"
@@ -45,4 +72,73 @@ def generate_transaction_hash(jaar, maand, dag, naam, bedrag, code, mededelingen
     hash_string = '||'.join(hash_components)
     
     # Generate SHA256 hash
-    return hashlib.sha256(hash_string.encode('utf-8')).hexdigest()
\ No newline at end of file
+    return hash_voor_opslag(hashlib.sha256(hash_string.encode('utf-8')), hash_formaat)
+
+def parse_cents(tekst):
+    """
+    Parse an ING amount like '1234,56' or '-12,30' straight to integer cents
+    
+    Args:
+        tekst (str): Amount with a comma as decimal separator
+    
+    Returns:
+        int: Amount in cents
+    """
+    negatief = tekst[:1] == '-'
+    cijfers = tekst[1:] if negatief else tekst
+    
+    # Fast path: the canonical ING notation with exactly two decimals
+    if len(cijfers) >= 4 and cijfers[-3] == ',' and cijfers[:-3].isdigit() and cijfers[-2:].isdigit():
+        waarde = int(cijfers[:-3]) * 100 + int(cijfers[-2:])
+        return -waarde if negatief else waarde
+    
+    cijfers = cijfers.strip().lstrip('+')
+    euros, _, centen = cijfers.partition(',')
+    if (euros and not euros.isdigit()) or (centen and (not centen.isdigit() or len(centen) > 2)):
+        raise ValueError(f"Ongeldig bedrag: {tekst!r}")
+    
+    waarde = int(euros or 0) * 100 + int(centen.ljust(2, '0'))
+    return -waarde if negatief else waarde
+
+def format_cents(cents):
+    """
+    Format an integer amount in cents exactly like f"{euros:.2f}" would
+    
+    Args:
+        cents (int): Amount in cents
+        
+    Returns:
+        str: Amount with two decimals and a dot separator, e.g. '-12.34'
+    """
+    teken = '-' if cents < 0 else ''
+    euros, rest = divmod(abs(cents), 100)
+    return f"{teken}{euros}.{rest:02d}"
+
+def transaction_hash_from_cents(datum_str, naam, bedrag_cent, code, mededelingen, tegenrekening, saldo_cent,
+                                hash_formaat=DEFAULT_HASH_FORMAAT):
+    """
+    Same hash as generate_transaction_hash, for amounts already in integer cents
+    
+    Args:
+        datum_str (str): Transaction date as YYYYMMDD
+        naam (str): Transaction name/description
+        bedrag_cent (int): Signed transaction amount in cents
+        code (str): Transaction code
+        mededelingen (str): Transaction details/remarks
+        tegenrekening (str): Counter account
+        saldo_cent (int): Balance after transaction in cents
+        hash_formaat (str): Storage format, see HASH_FORMATEN
+        
+    Returns:
+        str or bytes: SHA256 hash of transaction data
+    """
+    hash_string = '||'.join([
+        datum_str,
+        naam.strip(),
+        format_cents(bedrag_cent),
+        code.strip(),
+        mededelingen.strip(),
+        tegenrekening.strip(),
+        format_cents(saldo_cent)
+    ])
+    return hash_voor_opslag(hashlib.sha256(hash_string.encode('utf-8')), hash_formaat)
@@ -0,0 +1,147 @@
+"""
+Import Job Service
+==================
+Runs CSV imports in a background worker and keeps track of their progress
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from .csv_processor import process_ing_files, bron_naam
+
+# SQLite allows one writer at a time, so a single worker runs the imports in order
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='import')
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+# Parser processes per import; the job thread itself is the only database writer
+IMPORT_JOBS = os.cpu_count() or 1
+
+# Smaller imports are parsed in the job thread: starting a process pool
+# costs more than it saves on a typical monthly export
+PARALLEL_VANAF = 8 * 1024 * 1024  # bytes, about 40k ING CSV rows
+
+# Finished jobs are kept this long so the import page can still show the summary
+JOB_TTL = 60 * 60  # seconds
+
+def _update_job(job_id, **velden):
+    with _jobs_lock:
+        _jobs[job_id].update(velden)
+
+def _purge_finished_jobs():
+    """Forget finished jobs older than JOB_TTL (caller holds _jobs_lock)"""
+    grens = time.time() - JOB_TTL
+    verlopen = [job_id for job_id, job in _jobs.items()
+                if job['klaar_op'] is not None and job['klaar_op'] < grens]
+    for job_id in verlopen:
+        del _jobs[job_id]
+
+def _parser_jobs(bronnen):
+    """Number of parser processes for an import, by the total size of its files"""
+    grootte = 0
+    for bron in bronnen:
+        if isinstance(bron, str):
+            grootte += os.path.getsize(bron)
+        else:
+            bron.seek(0, os.SEEK_END)
+            grootte += bron.tell()
+            bron.seek(0)
+    return IMPORT_JOBS if grootte >= PARALLEL_VANAF else 1
+
+def _run_import(job_id, bronnen, bestandsnamen, remove_files, bekende_digests):
+    """Worker body: run the import and record progress and results on the job"""
+    _update_job(job_id, status='bezig', gestart_op=time.time())
+    
+    def on_progress(stats):
+        _update_job(job_id,
+                    rijen=stats['rijen'],
+                    imported=stats['imported'],
+                    duplicates=stats['duplicates'],
+                    errors=stats['errors'])
+    
+    try:
+        result = process_ing_files(bronnen, jobs=_parser_jobs(bronnen), progress_callback=on_progress,
+                                   bestandsnamen=bestandsnamen, bekende_digests=bekende_digests)
+        _update_job(job_id,
+                    status='klaar',
+                    imported=result['imported'],
+                    duplicates=result['duplicates'],
+                    errors=result['errors'],
+                    rijen=result['imported'] + result['duplicates'] + result['errors'],
+                    error_details=result['error_details'],
+                    bekende_bestanden=result['bekende_bestanden'],
+                    hervat=result['hervat'])
+    except Exception as e:
+        _update_job(job_id, status='mislukt', error_details=[f"Algemene fout: {str(e)}"])
+    finally:
+        _update_job(job_id, klaar_op=time.time())
+        for bron in bronnen:
+            if not isinstance(bron, str):
+                bron.close()
+            elif remove_files and os.path.exists(bron):
+                os.remove(bron)
+
+def start_import_job(bronnen, bestandsnamen=None, remove_files=True, bekende_digests=None):
+    """
+    Queue one or more CSV or ZIP files for import in the background
+    
+    Streams are handed over to the job, which closes them once the import
+    has finished; the caller must not close or reuse them.
+    
+    Args:
+        bronnen (list): Paths to saved files or seekable binary streams
+            (a single path or stream is accepted too)
+        bestandsnamen (list): Original filenames, for display and the import ledger
+        remove_files (bool): Delete the saved files once the import has finished
+        bekende_digests (list): (digest, grootte) per source when its SHA256 is
+            already known, so the import ledger need not hash it again
+        
+    Returns:
+        str: Job id for get_job()
+    """
+    if isinstance(bronnen, str) or hasattr(bronnen, 'read'):
+        bronnen = [bronnen]
+    
+    job_id = uuid.uuid4().hex
+    
+    with _jobs_lock:
+        _purge_finished_jobs()
+        _jobs[job_id] = {
+            'id': job_id,
+            'bestandsnaam': ', '.join(bestandsnamen or [bron_naam(bron) for bron in bronnen]),
+            'status': 'wachtrij',
+            'rijen': 0,
+            'imported': 0,
+            'duplicates': 0,
+            'errors': 0,
+            'error_details': [],
+            'bekende_bestanden': [],
+            'hervat': [],
+            'aangemaakt_op': time.time(),
+            'gestart_op': None,
+            'klaar_op': None,
+            'gemeld': False
+        }
+    
+    _executor.submit(_run_import, job_id, bronnen, bestandsnamen, remove_files, bekende_digests)
+    return job_id
+
+def get_job(job_id):
+    """
+    Get a snapshot of an import job
+    
+    Returns:
+        dict: Copy of the job state, or None if the job is unknown or expired
+    """
+    with _jobs_lock:
+        _purge_finished_jobs()
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+
+def mark_job_reported(job_id):
+    """Remember that the summary of a finished job has been shown to the user"""
+    with _jobs_lock:
+        if job_id in _jobs:
+            _jobs[job_id]['gemeld'] = True
@@ -0,0 +1,164 @@
+"""
+Import Ledger Service
+=====================
+Remembers which export files have been imported, so identical files can be
+skipped at once and files that only extend a known export are processed
+from where the known part ends. Checkpoints of unfinished imports let an
+interrupted import resume where it stopped.
+"""
+
+import hashlib
+from datetime import datetime
+
+# Bytes per read while fingerprinting a file
+FINGERPRINT_CHUNK = 1024 * 1024
+
+def bekende_bestanden(conn):
+    """
+    All files in the ledger, newest first
+    
+    Returns:
+        list: Dicts with digest, grootte, aantal_rijen, eerste_datum and laatste_datum
+    """
+    cursor = conn.execute('''
+        SELECT digest, grootte, aantal_rijen, eerste_datum, laatste_datum
+        FROM import_bestanden
+        ORDER BY id DESC
+    ''')
+    return [{'digest': digest, 'grootte': grootte, 'aantal_rijen': aantal_rijen,
+             'eerste_datum': eerste_datum, 'laatste_datum': laatste_datum}
+            for digest, grootte, aantal_rijen, eerste_datum, laatste_datum in cursor]
+
+def bepaal_vingerafdruk(raw, bekend, chunk_size=FINGERPRINT_CHUNK, digest=None, grootte=None):
+    """
+    Read a binary stream once and fingerprint it against the ledger
+    
+    Besides the SHA256 of the whole content, the running hash is compared at
+    every byte offset where a known file ended: if the first N bytes equal a
+    known file of N bytes (ending on a line break), the new file is that
+    export plus extra rows.
+    
+    When the digest and size are already known (a chunked upload hashes its
+    chunks as they arrive), the stream is only read up to the largest known
+    file that could be a prefix of it, and not at all when there is none.
+    
+    Args:
+        raw: Binary file object, read to the end
+        bekend (list): Ledger entries from bekende_bestanden()
+        chunk_size (int): Bytes per read
+        digest (str): Hex SHA256 of the whole content, if known
+        grootte (int): Size of the content in bytes, given with digest
+        
+    Returns:
+        dict: digest, grootte, identiek (ledger entry or None) and
+            prefix (largest ledger entry the file extends, or None)
+    """
+    per_grootte = {}
+    for entry in bekend:
+        per_grootte.setdefault(entry['grootte'], []).append(entry)
+    grenzen = sorted(per_grootte)
+    
+    # With the digest known, an identical file needs no reading at all and
+    # only a known file shorter than this one can be its prefix
+    tot = None
+    if digest is not None:
+        al_bekend = any(entry['digest'] == digest and entry['grootte'] == grootte for entry in bekend)
+        grenzen = [] if al_bekend else [grens for grens in grenzen if grens < grootte]
+        tot = grenzen[-1] if grenzen else 0
+    
+    sha256 = hashlib.sha256()
+    gelezen = 0
+    prefix = None
+    volgende = 0  # index in grenzen of the next offset to check
+    
+    while tot is None or gelezen < tot:
+        chunk = raw.read(chunk_size if tot is None else min(chunk_size, tot - gelezen))
+        if not chunk:
+            break
+        
+        einde = gelezen + len(chunk)
+        while volgende < len(grenzen) and grenzen[volgende] <= einde:
+            grens = grenzen[volgende]
+            volgende += 1
+            positie = grens - gelezen
+            if grens == 0 or positie < 1 or chunk[positie - 1:positie] != b'\n':
+                continue
+            
+            kopie = sha256.copy()
+            kopie.update(chunk[:positie])
+            kop_digest = kopie.hexdigest()
+            for entry in per_grootte[grens]:
+                if entry['digest'] == kop_digest:
+                    prefix = entry
+        
+        sha256.update(chunk)
+        gelezen = einde
+    
+    if digest is None:
+        digest, grootte = sha256.hexdigest(), gelezen
+    identiek = next((entry for entry in bekend
+                     if entry['digest'] == digest and entry['grootte'] == grootte), None)
+    if prefix is not None and prefix['grootte'] >= grootte:
+        prefix = None  # the whole file matched: that is the identiek case
+    
+    return {'digest': digest, 'grootte': grootte, 'identiek': identiek, 'prefix': prefix}
+
+def registreer_import(conn, bestandsnaam, vingerafdruk, aantal_rijen, eerste_datum, laatste_datum,
+                      imported, duplicates, errors):
+    """
+    Record a completely processed file in the ledger
+    
+    Returns:
+        dict: The new ledger entry, in the form used by bekende_bestanden()
+    """
+    conn.execute('''
+        INSERT INTO import_bestanden
+        (bestandsnaam, digest, grootte, aantal_rijen, eerste_datum, laatste_datum,
+         imported, duplicates, errors, geimporteerd_op)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (bestandsnaam, vingerafdruk['digest'], vingerafdruk['grootte'], aantal_rijen,
+          eerste_datum, laatste_datum, imported, duplicates, errors,
+          datetime.now().isoformat(timespec='seconds')))
+    
+    return {'digest': vingerafdruk['digest'], 'grootte': vingerafdruk['grootte'],
+            'aantal_rijen': aantal_rijen, 'eerste_datum': eerste_datum, 'laatste_datum': laatste_datum}
+
+def laad_checkpoint(conn, digest):
+    """
+    Checkpoint of an unfinished import of the file with this digest
+    
+    Returns:
+        dict: rijen, imported, duplicates, errors, eerste_datum and
+            laatste_datum processed so far, or None
+    """
+    row = conn.execute('''
+        SELECT rijen, imported, duplicates, errors, eerste_datum, laatste_datum
+        FROM import_checkpoints
+        WHERE digest = ?
+    ''', (digest,)).fetchone()
+    if row is None:
+        return None
+    
+    rijen, imported, duplicates, errors, eerste_datum, laatste_datum = row
+    return {'rijen': rijen, 'imported': imported, 'duplicates': duplicates, 'errors': errors,
+            'eerste_datum': eerste_datum, 'laatste_datum': laatste_datum}
+
+def bewaar_checkpoint(conn, bestandsnaam, digest, rijen, imported, duplicates, errors,
+                      eerste_datum, laatste_datum):
+    """
+    Store how far the import of a file has come
+    
+    Written in the same transaction as the rows it covers, so the checkpoint
+    never claims rows that were not committed.
+    """
+    conn.execute('''
+        INSERT OR REPLACE INTO import_checkpoints
+        (digest, bestandsnaam, rijen, imported, duplicates, errors,
+         eerste_datum, laatste_datum, bijgewerkt_op)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (digest, bestandsnaam, rijen, imported, duplicates, errors,
+          eerste_datum, laatste_datum, datetime.now().isoformat(timespec='seconds')))
+
+def verwijder_checkpoint(conn, digest):
+    """Forget the checkpoint of a file whose import has finished"""
+    conn.execute('DELETE FROM import_checkpoints WHERE digest = ?', (digest,))
@@ -0,0 +1,195 @@
+"""
+ING CSV Parser
+==============
+Parses the semicolon-separated ING CSV export straight to integer cents
+"""
+
+import csv
+import hashlib
+import io
+from .hash_generator import format_cents, parse_cents, HASH_FORMATEN, DEFAULT_HASH_FORMAAT
+from .parser_registry import (registreer_parser, iter_text_chunks, iter_lines,
+                              CHUNK_SIZE, BATCH_SIZE)
+
+# Column names of the ING CSV export
+KOLOM_DATUM = 'Datum'
+KOLOM_NAAM = 'Naam / Omschrijving'
+KOLOM_REKENING = 'Rekening'
+KOLOM_TEGENREKENING = 'Tegenrekening'
+KOLOM_CODE = 'Code'
+KOLOM_AF_BIJ = 'Af Bij'
+KOLOM_BEDRAG = 'Bedrag (EUR)'
+KOLOM_MEDEDELINGEN = 'Mededelingen'
+KOLOM_SALDO = 'Saldo na mutatie'
+
+VERPLICHTE_KOLOMMEN = (KOLOM_DATUM, KOLOM_NAAM, KOLOM_REKENING, KOLOM_CODE,
+                       KOLOM_AF_BIJ, KOLOM_BEDRAG, KOLOM_SALDO)
+
+def make_ing_row_parser(fieldnames, hash_formaat=DEFAULT_HASH_FORMAAT):
+    """
+    Build a parser for the fixed ING column layout
+    
+    Column positions are looked up once from the header; the returned
+    function then works on raw csv.reader rows without building a dict,
+    parses amounts straight to integer cents and hashes from the original
+    YYYYMMDD date string.
+    
+    Args:
+        fieldnames (list): Header of the CSV file
+        hash_formaat (str): Storage format of the hash, see HASH_FORMATEN
+        
+    Returns:
+        callable: Takes a raw row (list of str) and returns a tuple in
+            INSERT_TRANSACTIE_SQL order
+    """
+    ontbrekend = [kolom for kolom in VERPLICHTE_KOLOMMEN if kolom not in fieldnames]
+    if ontbrekend:
+        raise ValueError(f"Kolom ontbreekt: {', '.join(ontbrekend)}")
+    
+    i_datum = fieldnames.index(KOLOM_DATUM)
+    i_naam = fieldnames.index(KOLOM_NAAM)
+    i_rekening = fieldnames.index(KOLOM_REKENING)
+    i_code = fieldnames.index(KOLOM_CODE)
+    i_af_bij = fieldnames.index(KOLOM_AF_BIJ)
+    i_bedrag = fieldnames.index(KOLOM_BEDRAG)
+    i_saldo = fieldnames.index(KOLOM_SALDO)
+    i_tegenrekening = fieldnames.index(KOLOM_TEGENREKENING) if KOLOM_TEGENREKENING in fieldnames else None
+    i_mededelingen = fieldnames.index(KOLOM_MEDEDELINGEN) if KOLOM_MEDEDELINGEN in fieldnames else None
+    
+    def bedrag_velden(tekst, negatief):
+        # Canonical ING notation ('1234,56'): cents and hash text come straight from
+        # the digits; anything else goes through parse_cents/format_cents
+        cijfers = tekst[1:] if tekst[:1] == '-' else tekst
+        if len(cijfers) >= 4 and cijfers[-3] == ',' and cijfers[:-3].isdigit() and cijfers[-2:].isdigit():
+            cent = int(cijfers[:-3] + cijfers[-2:])
+            if negatief != (cijfers is not tekst):
+                return -cent, f"-{cijfers[:-3]}.{cijfers[-2:]}"
+            return cent, f"{cijfers[:-3]}.{cijfers[-2:]}"
+        
+        cent = parse_cents(tekst)
+        if negatief:
+            cent = -cent
+        return cent, format_cents(cent)
+    
+    sha256 = hashlib.sha256
+    digest_lengte = HASH_FORMATEN[hash_formaat]
+    
+    def parse(values):
+        if len(values) < len(fieldnames):
+            raise ValueError('Ontbrekende kolommen')
+        
+        # Datum is YYYYMMDD; slicing ints is enough, no datetime needed
+        datum_str = values[i_datum]
+        if len(datum_str) != 8 or not datum_str.isdigit():
+            raise ValueError(f"Ongeldige datum: {datum_str!r}")
+        
+        naam = values[i_naam]
+        code = values[i_code]
+        tegenrekening = values[i_tegenrekening] if i_tegenrekening is not None else ''
+        mededelingen = values[i_mededelingen] if i_mededelingen is not None else ''
+        
+        bedrag_cent, bedrag_tekst = bedrag_velden(values[i_bedrag], values[i_af_bij] == 'Af')
+        saldo_cent, saldo_tekst = bedrag_velden(values[i_saldo], False)
+        
+        # Same hash input as generate_transaction_hash, built without float formatting
+        hash_string = (f"{datum_str}||{naam.strip()}||{bedrag_tekst}||{code.strip()}||"
+                       f"{mededelingen.strip()}||{tegenrekening.strip()}||{saldo_tekst}")
+        if digest_lengte is None:
+            transaction_hash = sha256(hash_string.encode('utf-8')).hexdigest()
+        else:
+            transaction_hash = sha256(hash_string.encode('utf-8')).digest()[:digest_lengte]
+        
+        return (f"{datum_str[:4]}-{datum_str[4:6]}-{datum_str[6:]}",
+                int(datum_str[:4]), int(datum_str[4:6]), int(datum_str[6:]),
+                naam, values[i_rekening], tegenrekening, code,
+                bedrag_cent / 100, mededelingen, saldo_cent / 100, transaction_hash,
+                bedrag_cent, saldo_cent)
+    
+    return parse
+
+def parse_row_batch(fieldnames, rows, first_row_num, hash_formaat=DEFAULT_HASH_FORMAAT):
+    """
+    Parse a batch of raw CSV rows
+    
+    Module-level so it can run in a worker process; returns plain tuples and
+    strings that pickle cheaply back to the writer. The whole batch is hashed
+    in one go, in the worker rather than in the writer.
+    
+    Args:
+        fieldnames (list): Header of the CSV file
+        rows (list): Raw rows as lists of strings from csv.reader
+        first_row_num (int): Row number of the first row, for error messages
+        hash_formaat (str): Storage format of the hash, see HASH_FORMATEN
+        
+    Returns:
+        tuple: (list of row tuples, list of error messages)
+    """
+    parsed = []
+    errors = []
+    
+    try:
+        parse = make_ing_row_parser(fieldnames, hash_formaat)
+    except ValueError as e:
+        return parsed, [f"Regel {row_num}: {str(e)}"
+                        for row_num in range(first_row_num, first_row_num + len(rows))]
+    
+    for row_num, values in enumerate(rows, first_row_num):
+        try:
+            parsed.append(parse(values))
+        except Exception as e:
+            errors.append(f"Regel {row_num}: {str(e)}")
+    
+    return parsed, errors
+
+def iter_row_batches(csvfile, batch_size=BATCH_SIZE, chunk_size=CHUNK_SIZE, progress_callback=None, skip_rows=0):
+    """
+    Stream an ING CSV file as batches of raw rows
+    
+    Only the csv tokenizer runs here; the expensive parsing and hashing is
+    left to parse_row_batch so it can be spread over worker processes.
+    
+    Args:
+        csvfile: Open text file object
+        batch_size (int): Number of rows per batch
+        chunk_size (int): Number of characters read per chunk
+        progress_callback (callable): Passed on to iter_text_chunks
+        skip_rows (int): Number of leading data rows to skip (already imported)
+        
+    Yields:
+        tuple: (fieldnames, rows, first_row_num)
+    """
+    chunks = iter_text_chunks(csvfile, chunk_size, progress_callback)
+    reader = csv.reader(iter_lines(chunks), delimiter=';')
+    
+    fieldnames = next(reader, None)
+    if fieldnames is None:
+        return
+    
+    batch = []
+    first_row_num = skip_rows + 1
+    for values in reader:
+        if not values:
+            continue  # csv.DictReader skips empty lines as well
+        if skip_rows:
+            skip_rows -= 1
+            continue
+        batch.append(values)
+        if len(batch) >= batch_size:
+            yield fieldnames, batch, first_row_num
+            first_row_num += len(batch)
+            batch = []
+    
+    if batch:
+        yield fieldnames, batch, first_row_num
+
+def herken_ing_csv(kop):
+    """An ING CSV export starts with a semicolon-separated header naming the Datum column"""
+    eerste_regel = kop.split(b'\n', 1)[0]
+    return b';' in eerste_regel and KOLOM_DATUM.encode() in eerste_regel
+
+def iter_ing_batches(raw, batch_size=BATCH_SIZE, chunk_size=CHUNK_SIZE, progress_callback=None, skip_rows=0):
+    """iter_batches for the registry: decode the binary stream and batch its rows"""
+    csvfile = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+    yield from iter_row_batches(csvfile, batch_size, chunk_size, progress_callback, skip_rows)
+
+registreer_parser('ing_csv', herken_ing_csv, iter_ing_batches, parse_row_batch, standaard=True)
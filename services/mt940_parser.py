@@ -0,0 +1,176 @@
+"""
+MT940 Parser
+============
+Streams SWIFT MT940 statements into normalized rows
+"""
+
+import io
+import re
+from .hash_generator import parse_cents
+from .parser_registry import (registreer_parser, iter_text_chunks, iter_lines, iter_record_batches,
+                              parse_normalized_batch, ing_code, CHUNK_SIZE, BATCH_SIZE)
+
+# A field starts a line with :tag: (e.g. :61: or :60F:)
+VELD_PATROON = re.compile(r':(\d{2}[A-Z]?):(.*)')
+
+# :61: value date YYMMDD, optional booking date MMDD, debit/credit mark,
+# optional funds code, amount and transaction type (e.g. NTRF)
+REGEL_61_PATROON = re.compile(r'(\d{6})(\d{4})?(RC|RD|C|D)([A-Z])?(\d+,\d{0,2})([A-Z][A-Z0-9]{3})?')
+
+# :60F:/:60M: opening balance: debit/credit mark, YYMMDD, currency and amount
+SALDO_PATROON = re.compile(r'([CD])(\d{6})([A-Z]{3})(\d+,\d{0,2})')
+
+# Keys of the structured :86: layout used by ING, Rabobank and others
+CODE_86_PATROON = re.compile(r'/(CNTP|REMI|EREF|MARF|CSID|BUSP|PURP|ORDP|BENM|ULTC|ULTD|NAME|IBAN|'
+                             r'ADDR|TRCD|RTRN|ISDT|BIC|REMT)/')
+
+def datum_61(valutadatum, boekdatum):
+    """
+    YYYYMMDD date of a :61: line: the booking date when given, else the value date
+    
+    The booking date has no year of its own; it takes the year of the value
+    date, moved by one when the two straddle a new year.
+    """
+    jaar = 2000 + int(valutadatum[:2])
+    if not boekdatum:
+        return f"{jaar}{valutadatum[2:]}"
+    
+    valutamaand = int(valutadatum[2:4])
+    boekmaand = int(boekdatum[:2])
+    if boekmaand < valutamaand - 6:
+        jaar += 1
+    elif boekmaand > valutamaand + 6:
+        jaar -= 1
+    return f"{jaar}{boekdatum}"
+
+def omschrijving_86(tekst):
+    """
+    Counterparty and remittance information from a :86: field
+    
+    Returns:
+        tuple: (naam, tegenrekening, mededelingen)
+    """
+    if not CODE_86_PATROON.match(tekst):
+        # Free text: the first line names the counterparty
+        naam, _, rest = tekst.partition('\n')
+        return naam.strip(), '', ' '.join(rest.split())
+    
+    delen = CODE_86_PATROON.split(tekst.replace('\n', ''))
+    velden = dict(zip(delen[1::2], delen[2::2]))
+    
+    naam = velden.get('NAME', '')
+    tegenrekening = velden.get('IBAN', '')
+    if 'CNTP' in velden:
+        # CNTP is IBAN/BIC/name/city
+        cntp = velden['CNTP'].split('/')
+        tegenrekening = cntp[0]
+        if len(cntp) > 2:
+            naam = cntp[2]
+    
+    remi = velden.get('REMI', '')
+    if remi.startswith('USTD//'):
+        mededelingen = remi[6:]
+    elif remi.startswith('STRD/'):
+        mededelingen = remi.rpartition('/')[2] or remi[5:]
+    else:
+        mededelingen = remi or velden.get('EREF', '')
+    
+    return naam.strip(), tegenrekening.strip(), mededelingen.strip('/ ')
+
+def iter_velden(regels):
+    """
+    Group the lines of an MT940 file into (tag, value) fields
+    
+    Continuation lines are appended to their field; block headers, the '-'
+    that ends a statement and blank lines are left out.
+    """
+    tag = None
+    waarde = []
+    for regel in regels:
+        regel = regel.rstrip('\r\n')
+        match = VELD_PATROON.match(regel)
+        if match or regel.strip() in ('-', '') or regel.startswith(('{', '0000 ')):
+            if tag:
+                yield tag, '\n'.join(waarde)
+            tag, waarde = (match.group(1), [match.group(2)]) if match else (None, [])
+        elif tag:
+            waarde.append(regel)
+    
+    if tag:
+        yield tag, '\n'.join(waarde)
+
+def iter_mt940_records(csvfile, chunk_size=CHUNK_SIZE, progress_callback=None):
+    """
+    Stream the :61: entries of an MT940 file as normalized records
+    
+    Each entry is combined with the :86: field that follows it. The saldo
+    after each entry is the running total from the opening balance of its
+    statement.
+    
+    Args:
+        csvfile: Open text file object
+        chunk_size (int): Number of characters read per chunk
+        progress_callback (callable): Passed on to iter_text_chunks
+    
+    Yields:
+        tuple or str: A record for parse_normalized_batch, or an error
+            message for an entry that could not be read
+    """
+    rekening = ''
+    saldo_cent = 0
+    open_entry = None  # (datum, rekening, code, bedrag_cent, saldo_cent) awaiting its :86:
+    
+    def record(entry, omschrijving=''):
+        datum, entry_rekening, code, bedrag, saldo = entry
+        naam, tegenrekening, mededelingen = omschrijving_86(omschrijving)
+        return (datum, naam, entry_rekening, tegenrekening, code, bedrag, mededelingen, saldo)
+    
+    for tag, waarde in iter_velden(iter_lines(iter_text_chunks(csvfile, chunk_size, progress_callback))):
+        if tag == '86' and open_entry:
+            yield record(open_entry, waarde)
+            open_entry = None
+            continue
+        
+        if open_entry:
+            yield record(open_entry)
+            open_entry = None
+        
+        if tag == '25':
+            # Account as IBAN, or BIC/IBAN; ING appends the currency
+            rekening = waarde.strip().rpartition('/')[2]
+        elif tag in ('60F', '60M'):
+            match = SALDO_PATROON.match(waarde.strip())
+            if not match:
+                yield f"Ongeldig beginsaldo: {waarde!r}"
+                continue
+            teken, _, valuta, bedrag = match.groups()
+            saldo_cent = -parse_cents(bedrag) if teken == 'D' else parse_cents(bedrag)
+            if rekening.endswith(valuta) and len(rekening) > len(valuta):
+                rekening = rekening[:-len(valuta)]
+        elif tag == '61':
+            match = REGEL_61_PATROON.match(waarde)
+            if not match:
+                yield f"Ongeldige transactieregel: {waarde.splitlines()[0]!r}"
+                continue
+            valutadatum, boekdatum, teken, _, bedrag, code = match.groups()
+            bedrag_cent = parse_cents(bedrag)
+            # D and RC (reversal of a credit) lower the balance
+            if teken in ('D', 'RC'):
+                bedrag_cent = -bedrag_cent
+            saldo_cent += bedrag_cent
+            open_entry = (datum_61(valutadatum, boekdatum), rekening, ing_code(code), bedrag_cent, saldo_cent)
+    
+    if open_entry:
+        yield record(open_entry)
+
+def herken_mt940(kop):
+    """An MT940 statement has :20: and :25: fields at the start of a line"""
+    return re.search(rb'(^|\n):20:', kop) is not None and b'\n:25:' in kop
+
+def iter_mt940_batches(raw, batch_size=BATCH_SIZE, chunk_size=CHUNK_SIZE, progress_callback=None, skip_rows=0):
+    """iter_batches for the registry: decode the binary stream and batch its entries"""
+    csvfile = io.TextIOWrapper(raw, encoding='utf-8', errors='replace', newline='')
+    yield from iter_record_batches(iter_mt940_records(csvfile, chunk_size, progress_callback),
+                                   batch_size, skip_rows)
+
+registreer_parser('mt940', herken_mt940, iter_mt940_batches, parse_normalized_batch)
@@ -0,0 +1,275 @@
+"""
+Parser Registry
+===============
+Picks the parser for an import file by sniffing its first bytes. Every
+parser streams the file as batches of raw records and turns a batch into
+the same transaction rows, so they all share the hashing, the batched
+insert and the worker processes of the import pipeline.
+
+A parser is registered with:
+    herken(kop)            -> bool, given the first SNIFF_BYTES of the file
+    iter_batches(raw, batch_size, chunk_size, progress_callback, skip_rows)
+                           -> yields (context, records, first_row_num)
+    parse_batch(context, records, first_row_num, hash_formaat)
+                           -> (row tuples, error messages); module-level,
+                              so it can run in a worker process
+"""
+
+import io
+from .hash_generator import transaction_hash_from_cents, DEFAULT_HASH_FORMAAT
+
+# Read uploads in fixed-size chunks so memory stays flat regardless of file size
+CHUNK_SIZE = 1024 * 1024  # characters per chunk
+
+def iter_text_chunks(csvfile, chunk_size=CHUNK_SIZE, progress_callback=None):
+    """
+    Read an open text file in fixed-size chunks
+    
+    The BOM is stripped from the first chunk only, so the header row is
+    recognised by csv.DictReader without reading the whole file first.
+    
+    Args:
+        csvfile: Open text file object
+        chunk_size (int): Number of characters per chunk
+        progress_callback (callable): Called with (chunk_number, characters_read)
+    
+    Yields:
+        str: Consecutive chunks of the file
+    """
+    chunk_number = 0
+    characters_read = 0
+    
+    while True:
+        chunk = csvfile.read(chunk_size)
+        if not chunk:
+            break
+        
+        if chunk_number == 0 and chunk.startswith('\ufeff'):
+            chunk = chunk[1:]
+        
+        chunk_number += 1
+        characters_read += len(chunk)
+        
+        if progress_callback:
+            progress_callback(chunk_number, characters_read)
+        
+        yield chunk
+
+def iter_lines(chunks):
+    """
+    Turn a stream of text chunks into complete lines for the csv module
+    
+    Args:
+        chunks: Iterable of text chunks
+    
+    Yields:
+        str: Lines including their line ending
+    """
+    rest = ''
+    for chunk in chunks:
+        lines = (rest + chunk).split('\n')
+        rest = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    
+    if rest:
+        yield rest
+
+BATCH_SIZE = 1000  # records per batch
+
+# Bytes looked at to recognise the file format
+SNIFF_BYTES = 4096
+
+# Position of the hash in the row tuples (INSERT_TRANSACTIE_SQL order)
+HASH_POSITIE = 11
+
+# Extensions of statement files, on their own or inside a ZIP archive
+BESTANDSEXTENSIES = ('.csv', '.xml', '.sta', '.940', '.mt940')
+
+PARSERS = []
+
+def registreer_parser(naam, herken, iter_batches, parse_batch, standaard=False):
+    """
+    Add a parser to the registry
+    
+    Args:
+        naam (str): Name of the format, e.g. 'camt053'
+        herken (callable): Sniffer, see the module docstring
+        iter_batches (callable): Streams raw record batches
+        parse_batch (callable): Turns a record batch into row tuples
+        standaard (bool): Use this parser when no sniffer recognises the file
+    """
+    PARSERS.append({'naam': naam, 'herken': herken, 'iter_batches': iter_batches,
+                    'parse_batch': parse_batch, 'standaard': standaard})
+
+class VoorgelezenStream(io.BufferedIOBase):
+    """Binary stream that first returns bytes already read from it, then the rest"""
+    
+    def __init__(self, raw, kop):
+        super().__init__()
+        self._raw = raw
+        self._kop = kop
+    
+    def readable(self):
+        return True
+    
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data, self._kop = self._kop + self._raw.read(), b''
+            return data
+        if self._kop:
+            data, self._kop = self._kop[:size], self._kop[size:]
+            return data
+        return self._raw.read(size)
+    
+    def read1(self, size=-1):
+        return self.read(size)
+    
+    def close(self):
+        if not self.closed:
+            super().close()
+            self._raw.close()
+
+def kies_parser(raw):
+    """
+    Recognise the format of a binary stream
+    
+    Only the first SNIFF_BYTES are read, and they are handed back in front
+    of the returned stream, so read-once sources (members of a ZIP archive)
+    can be sniffed too.
+    
+    Args:
+        raw: Binary stream at the start of the file
+    
+    Returns:
+        tuple: (parser dict, stream to read the whole file from)
+    """
+    kop = b''
+    while len(kop) < SNIFF_BYTES:
+        data = raw.read(SNIFF_BYTES - len(kop))
+        if not data:
+            break
+        kop += data
+    
+    stream = VoorgelezenStream(raw, kop)
+    kop = kop.lstrip(b'\xef\xbb\xbf').lstrip()
+    for parser in PARSERS:
+        if parser['herken'](kop):
+            return parser, stream
+    return next(parser for parser in PARSERS if parser['standaard']), stream
+
+# Transaction codes of the ING CSV export (its Code column). The code is part
+# of the transaction hash, so the other formats are mapped onto these: the
+# same booking must hash the same whichever export it came from.
+ING_CODES = ('AC', 'BA', 'DV', 'FL', 'GF', 'GM', 'GT', 'IC', 'ID', 'OV', 'PK', 'PO', 'ST', 'VZ')
+
+# ISO 20022 bank transaction sub-family codes (CAMT.053 BkTxCd/Domn/Fmly/SubFmlyCd)
+ISO_CODES = {
+    'ESCT': 'OV', 'DMCT': 'OV', 'XBCT': 'OV', 'SALA': 'OV', 'AUTT': 'OV', 'BOOK': 'OV',
+    'STDO': 'PO',
+    'ESDD': 'IC', 'BBDD': 'IC', 'PMDD': 'IC', 'OODD': 'IC',
+    'POSD': 'BA', 'POSP': 'BA', 'POSC': 'BA',
+    'CWDL': 'GM',
+    'CDPT': 'ST'
+}
+
+# SWIFT transaction types of MT940 :61: lines, without their N/F/S prefix
+SWIFT_CODES = {'TRF': 'OV', 'STO': 'PO', 'DDT': 'IC', 'CHK': 'DV', 'CHG': 'DV', 'INT': 'DV', 'MSC': 'DV'}
+
+def ing_code(*kandidaten):
+    """
+    ING CSV code of a transaction, from the codes another format gives
+    
+    The first candidate that is an ING code, an ISO sub-family code or a
+    SWIFT transaction type decides; otherwise the transaction is 'DV'
+    (diversen), as ING itself books what has no code of its own.
+    
+    Args:
+        *kandidaten (str): Codes in order of preference, empty ones are skipped
+    
+    Returns:
+        str: One of ING_CODES
+    """
+    for kandidaat in kandidaten:
+        kandidaat = (kandidaat or '').strip().upper()
+        if kandidaat in ING_CODES:
+            return kandidaat
+        if kandidaat in ISO_CODES:
+            return ISO_CODES[kandidaat]
+        if len(kandidaat) == 4 and kandidaat[0] in 'NFS' and kandidaat[1:] in SWIFT_CODES:
+            return SWIFT_CODES[kandidaat[1:]]
+    return 'DV'
+
+def normaliseer_rij(datum_str, naam, rekening, tegenrekening, code, bedrag_cent, mededelingen, saldo_cent,
+                    hash_formaat=DEFAULT_HASH_FORMAAT):
+    """
+    Build the row tuple for one normalized transaction
+    
+    Args:
+        datum_str (str): Date as YYYYMMDD
+        naam, rekening, tegenrekening, code, mededelingen (str): Text fields
+        bedrag_cent (int): Signed amount in cents (negative for debit)
+        saldo_cent (int): Balance after the transaction in cents
+        hash_formaat (str): Storage format of the hash, see HASH_FORMATEN
+    
+    Returns:
+        tuple: Row in INSERT_TRANSACTIE_SQL order
+    """
+    if len(datum_str) != 8 or not datum_str.isdigit():
+        raise ValueError(f"Ongeldige datum: {datum_str!r}")
+    
+    transaction_hash = transaction_hash_from_cents(datum_str, naam, bedrag_cent, code, mededelingen,
+                                                   tegenrekening, saldo_cent, hash_formaat)
+    return (f"{datum_str[:4]}-{datum_str[4:6]}-{datum_str[6:]}",
+            int(datum_str[:4]), int(datum_str[4:6]), int(datum_str[6:]),
+            naam, rekening, tegenrekening, code,
+            bedrag_cent / 100, mededelingen, saldo_cent / 100, transaction_hash,
+            bedrag_cent, saldo_cent)
+
+def iter_record_batches(records, batch_size=BATCH_SIZE, skip_rows=0):
+    """
+    Group a stream of normalized records into batches for the registry
+    
+    Args:
+        records: Iterable of records for parse_normalized_batch
+        batch_size (int): Number of records per batch
+        skip_rows (int): Number of leading records to skip (already imported)
+    
+    Yields:
+        tuple: (None, records, first_row_num)
+    """
+    batch = []
+    first_row_num = skip_rows + 1
+    for record in records:
+        if skip_rows:
+            skip_rows -= 1
+            continue
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield None, batch, first_row_num
+            first_row_num += len(batch)
+            batch = []
+    
+    if batch:
+        yield None, batch, first_row_num
+
+def parse_normalized_batch(context, records, first_row_num, hash_formaat=DEFAULT_HASH_FORMAAT):
+    """
+    parse_batch for parsers whose records are already normalized
+    
+    Records are tuples of normaliseer_rij arguments (without hash_formaat),
+    or an error message string for an entry the reader could not make sense of.
+    """
+    parsed = []
+    errors = []
+    for row_num, record in enumerate(records, first_row_num):
+        try:
+            if isinstance(record, str):
+                raise ValueError(record)
+            parsed.append(normaliseer_rij(*record, hash_formaat))
+        except Exception as e:
+            errors.append(f"Regel {row_num}: {str(e)}")
+    return parsed, errors
+
+# The built-in parsers register themselves; the ING CSV layout is the fallback
+from . import camt053_parser, mt940_parser, ing_csv_parser  # noqa: E402,F401
@@ -0,0 +1,319 @@
+"""
+Rapportage Service
+==================
+Dashboard and kruistabel aggregates, shared by the report routes and the CLI
+"""
+
+from datetime import datetime
+from models import repository
+
+MAANDEN = ['Jan', 'Feb', 'Mrt', 'Apr', 'Mei', 'Jun',
+           'Jul', 'Aug', 'Sep', 'Okt', 'Nov', 'Dec']
+
+# Row of the kruistabel for transactions without category
+ZONDER_CATEGORIE = 'Zonder categorie'
+
+# Longest range of a kruistabel over several years, in months
+MAX_KRUISTABEL_MAANDEN = 120
+
+def periode_12_maanden(eind_jaar, eind_maand):
+    """
+    First month of the 12-month window that ends with eind_jaar/eind_maand
+    
+    Returns:
+        tuple: (start_jaar, start_maand)
+    """
+    if eind_maand == 12:
+        return eind_jaar, 1
+    return eind_jaar - 1, eind_maand + 1
+
+def uitgaven_per_maand(eind_jaar=None, eind_maand=None):
+    """
+    Expenses per month for the 12 months up to eind_jaar/eind_maand
+    
+    Args:
+        eind_jaar (int): Last year of the period (default: the 12 most recent months)
+        eind_maand (int): Last month of the period
+    
+    Returns:
+        dict: Chart.js labels and data
+    """
+    if eind_jaar and eind_maand:
+        start_jaar, start_maand = periode_12_maanden(eind_jaar, eind_maand)
+        data = repository.uitgaven_per_maand(start_jaar, start_maand, eind_jaar, eind_maand)
+    else:
+        # Default: last 12 months
+        data = repository.uitgaven_laatste_maanden(12)
+    
+    labels = []
+    bedragen = []
+    
+    # For specific period: chronological order
+    # For default: reverse for chronological order
+    data_sorted = data if (eind_jaar and eind_maand) else reversed(data)
+    
+    for jaar, maand, totaal in data_sorted:
+        labels.append(f"{MAANDEN[maand-1]} {jaar}")
+        bedragen.append(abs(totaal))
+    
+    return {
+        'labels': labels,
+        'data': bedragen
+    }
+
+def top_categorien(eind_jaar, eind_maand):
+    """
+    Top expense categories over the 12 months up to eind_jaar/eind_maand
+    
+    Returns:
+        dict: Chart.js labels, data and colors, plus categorie_ids for drill-down
+    """
+    start_jaar, start_maand = periode_12_maanden(eind_jaar, eind_maand)
+    
+    data = repository.top_categorien(start_jaar, start_maand, eind_jaar, eind_maand)
+    
+    # Also uncategorized transactions for this period
+    zonder_categorie = repository.uitgaven_zonder_categorie(start_jaar, start_maand, eind_jaar, eind_maand)
+    
+    labels = []
+    bedragen = []
+    kleuren = []
+    categorie_ids = []
+    
+    for cat_id, naam, kleur, totaal in data:
+        labels.append(naam)
+        bedragen.append(abs(totaal))
+        kleuren.append(kleur)
+        categorie_ids.append(cat_id)
+    
+    if abs(zonder_categorie) > 50:
+        labels.append('Zonder categorie')
+        bedragen.append(abs(zonder_categorie))
+        kleuren.append('#6c757d')
+        categorie_ids.append(None)
+    
+    return {
+        'labels': labels,
+        'data': bedragen,
+        'colors': kleuren,
+        'categorie_ids': categorie_ids
+    }
+
+def inkomsten_uitgaven(eind_jaar=None, eind_maand=None):
+    """
+    Income and expenses per month for the 6 months up to eind_jaar/eind_maand
+    
+    Returns:
+        dict: Chart.js labels with inkomsten and uitgaven series
+    """
+    if eind_jaar and eind_maand:
+        # Last 6 months from chosen period
+        if eind_maand > 6:
+            start_jaar = eind_jaar
+            start_maand = eind_maand - 5
+        else:
+            start_jaar = eind_jaar - 1
+            start_maand = eind_maand + 6
+        
+        data = repository.inkomsten_uitgaven(start_jaar, start_maand, eind_jaar, eind_maand)
+    else:
+        # Default: last 6 months
+        data = repository.inkomsten_uitgaven_laatste_maanden(6)
+    
+    labels = []
+    inkomsten_data = []
+    uitgaven_data = []
+    
+    data_sorted = data if (eind_jaar and eind_maand) else reversed(data)
+    
+    for jaar, maand, inkomsten, uitgaven in data_sorted:
+        labels.append(f"{MAANDEN[maand-1]} {jaar}")
+        inkomsten_data.append(inkomsten)
+        uitgaven_data.append(abs(uitgaven))
+    
+    return {
+        'labels': labels,
+        'inkomsten': inkomsten_data,
+        'uitgaven': uitgaven_data
+    }
+
+def statistieken(eind_jaar, eind_maand):
+    """
+    General statistics over the 12 months up to eind_jaar/eind_maand
+    
+    Returns:
+        dict: Totals, net result, category counts and the period label
+    """
+    start_jaar, start_maand = periode_12_maanden(eind_jaar, eind_maand)
+    
+    # Totals for selected period
+    stats = repository.periode_totalen(start_jaar, start_maand, eind_jaar, eind_maand)
+    
+    # Number of categories (total, not period-specific)
+    aantal_categorien = repository.aantal_categorien()
+    
+    # Without category for this period
+    zonder_categorie = repository.zonder_categorie_in_periode(start_jaar, start_maand, eind_jaar, eind_maand)
+    
+    totaal_transacties, totaal_inkomsten, totaal_uitgaven, gecategoriseerd = stats
+    totaal_inkomsten = totaal_inkomsten or 0  # SUM is NULL for a period without transactions
+    totaal_uitgaven = totaal_uitgaven or 0
+    netto = totaal_inkomsten + totaal_uitgaven  # expenses are negative
+    
+    periode_label = f"{MAANDEN[start_maand-1]} {start_jaar} - {MAANDEN[eind_maand-1]} {eind_jaar}"
+    
+    return {
+        'totaal_transacties': totaal_transacties,
+        'totaal_inkomsten': totaal_inkomsten,
+        'totaal_uitgaven': abs(totaal_uitgaven),
+        'netto_resultaat': netto,
+        'aantal_categorien': aantal_categorien,
+        'zonder_categorie': zonder_categorie,
+        'periode': periode_label,
+        'eind_jaar': eind_jaar,
+        'eind_maand': eind_maand
+    }
+
+def dashboard(eind_jaar=None, eind_maand=None):
+    """
+    All dashboard aggregates for one period, as the dashboard API returns them
+    
+    Args:
+        eind_jaar (int): Last year of the period (default: the most recent
+            month with transactions, like the dashboard page)
+        eind_maand (int): Last month of the period
+
+    Returns:
+        dict: uitgaven_per_maand, top_categorien, inkomsten_uitgaven and statistieken
+    """
+    if not (eind_jaar and eind_maand):
+        laatste = repository.laatste_periode()
+        eind_jaar, eind_maand = laatste or (datetime.now().year, datetime.now().month)
+
+    return {
+        'uitgaven_per_maand': uitgaven_per_maand(eind_jaar, eind_maand),
+        'top_categorien': top_categorien(eind_jaar, eind_maand),
+        'inkomsten_uitgaven': inkomsten_uitgaven(eind_jaar, eind_maand),
+        'statistieken': statistieken(eind_jaar, eind_maand)
+    }
+
+def lees_jaar_maand(tekst):
+    """
+    Year and month from 'YYYY-MM'
+    
+    Raises:
+        ValueError: When tekst is not a valid year and month
+    """
+    try:
+        jaar, maand = (int(deel) for deel in tekst.split('-'))
+    except ValueError:
+        raise ValueError(f"Ongeldige maand '{tekst}', verwacht JJJJ-MM") from None
+    if not 1 <= maand <= 12:
+        raise ValueError(f"Ongeldige maand '{tekst}', verwacht JJJJ-MM")
+    return jaar, maand
+
+def maanden_in_periode(start_jaar, start_maand, eind_jaar, eind_maand):
+    """(jaar, maand) of every month from start up to and including eind"""
+    maanden = []
+    jaar, maand = start_jaar, start_maand
+    while (jaar, maand) <= (eind_jaar, eind_maand):
+        maanden.append((jaar, maand))
+        jaar, maand = (jaar + 1, 1) if maand == 12 else (jaar, maand + 1)
+    return maanden
+
+def draaitabel(start_jaar, start_maand, eind_jaar, eind_maand, kolom):
+    """
+    Amounts per category and month over a range of months
+    
+    One query returns every (category, month) amount; the pivot into rows
+    and columns happens here, accumulated in integer cents.
+    
+    Args:
+        kolom (callable): Column key of a month, kolom(jaar, maand)
+    
+    Returns:
+        dict: data, categorie_ids, maand_totalen, categorie_totalen and grand_total
+    """
+    kolommen = {jaar * 100 + maand: kolom(jaar, maand)
+                for jaar, maand in maanden_in_periode(start_jaar, start_maand, eind_jaar, eind_maand)}
+    
+    # Cents per column for each category, by name with "zonder categorie" last
+    bedragen_per_categorie = {}
+    for cat_id, cat_naam, periode, bedrag in repository.kruistabel_bedragen(start_jaar, start_maand,
+                                                                           eind_jaar, eind_maand):
+        naam = ZONDER_CATEGORIE if cat_id is None else cat_naam
+        bedragen = bedragen_per_categorie.setdefault((cat_id, naam), {})
+        if periode is not None:
+            bedragen[kolommen[periode]] = bedrag
+    
+    # The row without category is shown even when it is empty
+    bedragen_per_categorie.setdefault((None, ZONDER_CATEGORIE), {})
+    
+    kruistabel_data = {}
+    categorie_ids = {}
+    maand_totalen = dict.fromkeys(kolommen.values(), 0)
+    categorie_totalen = {}
+    
+    for (cat_id, naam), bedragen in bedragen_per_categorie.items():
+        kruistabel_data[naam] = {sleutel: bedragen.get(sleutel, 0) / 100 for sleutel in kolommen.values()}
+        categorie_ids[naam] = cat_id
+        categorie_totalen[naam] = sum(bedragen.values()) / 100
+        for sleutel, bedrag in bedragen.items():
+            maand_totalen[sleutel] += bedrag
+    
+    # Calculate grand total
+    grand_total = sum(maand_totalen.values()) / 100
+    maand_totalen = {sleutel: totaal / 100 for sleutel, totaal in maand_totalen.items()}
+    
+    return {
+        'data': kruistabel_data,
+        'categorie_ids': categorie_ids,
+        'maand_totalen': maand_totalen,
+        'categorie_totalen': categorie_totalen,
+        'grand_total': grand_total
+    }
+
+def kruistabel(jaar):
+    """
+    Amounts per category and month for one year
+    
+    Args:
+        jaar (int): Year of the kruistabel
+    
+    Returns:
+        dict: data, categorie_ids, maand_totalen, categorie_totalen, grand_total
+            and jaar; months are the keys 1-12
+    """
+    data = draaitabel(jaar, 1, jaar, 12, lambda _jaar, maand: maand)
+    data['jaar'] = jaar
+    return data
+
+def kruistabel_periode(start_jaar, start_maand, eind_jaar, eind_maand):
+    """
+    Amounts per category and month over any range of months, also across years
+    
+    Returns:
+        dict: Like kruistabel(), with 'YYYY-MM' keys instead of month numbers,
+            plus kolommen (sleutel, jaar, maand and label per month), van and tot
+    
+    Raises:
+        ValueError: For an invalid month, a range that ends before it starts
+            or one longer than MAX_KRUISTABEL_MAANDEN
+    """
+    if not (1 <= start_maand <= 12 and 1 <= eind_maand <= 12):
+        raise ValueError('Maand moet tussen 1 en 12 zijn')
+    if (start_jaar, start_maand) > (eind_jaar, eind_maand):
+        raise ValueError('Begin van de periode ligt na het einde')
+    maanden = maanden_in_periode(start_jaar, start_maand, eind_jaar, eind_maand)
+    if len(maanden) > MAX_KRUISTABEL_MAANDEN:
+        raise ValueError(f'Periode mag maximaal {MAX_KRUISTABEL_MAANDEN} maanden zijn')
+    
+    def sleutel(jaar, maand):
+        return f"{jaar}-{maand:02d}"
+    
+    data = draaitabel(start_jaar, start_maand, eind_jaar, eind_maand, sleutel)
+    data['kolommen'] = [{'sleutel': sleutel(jaar, maand), 'jaar': jaar, 'maand': maand,
+                         'label': f"{MAANDEN[maand-1]} {jaar}"} for jaar, maand in maanden]
+    data['van'] = sleutel(start_jaar, start_maand)
+    data['tot'] = sleutel(eind_jaar, eind_maand)
+    return data
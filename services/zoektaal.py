@@ -0,0 +1,167 @@
+"""
+Zoektaal
+========
+The search box of the transaction list understands field filters next to
+free text:
+
+    bedrag:<-50              amount below -50 (also <=, >, >=, = or a range)
+    bedrag:-100..-50         amount from -100 up to and including -50
+    datum:2024-03..2024-06   months March to June 2024 (open ends allowed)
+    datum:2024 / 2024-03 / 2024-03-15
+    categorie:Boodschappen   category name (values with spaces are quoted)
+    code:BA                  mutation code
+    tegenrekening:NL12INGB0001234567, or a prefix: tegenrekening:NL12*
+
+Everything else is free text and goes to the full-text search over name,
+description and counter account; dates, amounts and codes are found with
+the filters above. Filters are returned as (veld, operator, parameters);
+the repository turns every (veld, operator) into an equality or range
+on one column, so they combine into index scans instead of LIKE over
+every column.
+"""
+
+import re
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+# field:value, field:"value with spaces", "quoted text" or a plain word
+TOKEN = re.compile(r'(\w+):("[^"]*"|\S+)|"([^"]*)"|(\S+)')
+
+BEDRAG = re.compile(r'^(<=|>=|<|>|=)?(.*)$')
+BEREIK = '..'
+
+def ontleed_zoekopdracht(zoekterm):
+    """
+    Split a search into field filters and free text
+    
+    Words like 'tijd:12' with an unknown field name stay free text.
+    
+    Args:
+        zoekterm (str): Contents of the search box
+    
+    Returns:
+        tuple: (free text, list of (veld, operator, parameters))
+    
+    Raises:
+        ValueError: When a known field has a value it cannot use
+    """
+    woorden = []
+    filters = []
+    
+    for match in TOKEN.finditer(zoekterm):
+        veld, waarde, fraze, woord = match.groups()
+        if veld and veld.lower() in VELDEN:
+            filters.append(VELDEN[veld.lower()](waarde.strip('"')))
+        else:
+            woorden.append(fraze if fraze is not None else match.group(0))
+    
+    return ' '.join(woord for woord in woorden if woord), filters
+
+def _centen(tekst, waarde):
+    """Amount in cents from '-50', '12.5' or '12,50'"""
+    try:
+        bedrag = Decimal(tekst.replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f"Ongeldig bedrag in bedrag:{waarde}") from None
+    if not bedrag.is_finite() or bedrag != bedrag.quantize(Decimal('0.01')):
+        raise ValueError(f"Ongeldig bedrag in bedrag:{waarde}")
+    return int(bedrag * 100)
+
+def bedrag_filter(waarde):
+    """bedrag:<-50, bedrag:>=100, bedrag:-12,50 or bedrag:-100..-50"""
+    if BEREIK in waarde:
+        van, tot = waarde.split(BEREIK, 1)
+        if van and tot:
+            return 'bedrag', 'tussen', tuple(sorted((_centen(van, waarde), _centen(tot, waarde))))
+        if van:
+            return 'bedrag', '>=', (_centen(van, waarde),)
+        if tot:
+            return 'bedrag', '<=', (_centen(tot, waarde),)
+        raise ValueError(f"Ongeldig bedrag in bedrag:{waarde}")
+    
+    operator, getal = BEDRAG.match(waarde).groups()
+    return 'bedrag', operator or '=', (_centen(getal, waarde),)
+
+def _datumgrens(tekst, waarde):
+    """
+    A date bound of the form JJJJ, JJJJ-MM or JJJJ-MM-DD
+    
+    Returns:
+        tuple: (eerste dag, laatste dag, periode or None); the periode
+            (jaar * 100 + maand) only for whole months, with the first and
+            last month of a year
+    """
+    try:
+        delen = [int(deel) for deel in tekst.split('-')]
+        if len(delen) == 1:
+            jaar, = delen
+            date(jaar, 1, 1)
+            return f'{jaar:04d}-01-01', f'{jaar:04d}-12-31', (jaar * 100 + 1, jaar * 100 + 12)
+        if len(delen) == 2:
+            jaar, maand = delen
+            date(jaar, maand, 1)
+            # Text dates compare as strings, so day 31 ends every month
+            return f'{jaar:04d}-{maand:02d}-01', f'{jaar:04d}-{maand:02d}-31', (jaar * 100 + maand,) * 2
+        if len(delen) == 3:
+            dag = date(*delen).isoformat()
+            return dag, dag, None
+    except ValueError:
+        pass
+    raise ValueError(f"Ongeldige datum in datum:{waarde}, verwacht JJJJ, JJJJ-MM of JJJJ-MM-DD")
+
+def datum_filter(waarde):
+    """
+    datum:2024-03, datum:2024-03..2024-06, datum:2024-03-01.. or datum:..2024-06-15
+    
+    Whole months and years filter on periode, which the covering period
+    indexes serve together with a category; a bound with a day filters on
+    datum (idx_datum).
+    """
+    van, tot = waarde.split(BEREIK, 1) if BEREIK in waarde else (waarde, waarde)
+    if not van and not tot:
+        raise ValueError(f"Ongeldige datum in datum:{waarde}, verwacht JJJJ, JJJJ-MM of JJJJ-MM-DD")
+    begin = _datumgrens(van, waarde) if van else None
+    eind = _datumgrens(tot, waarde) if tot else None
+    
+    if all(grens is None or grens[2] for grens in (begin, eind)):
+        if begin and eind:
+            return 'periode', 'tussen', (begin[2][0], eind[2][1])
+        if begin:
+            return 'periode', '>=', (begin[2][0],)
+        return 'periode', '<=', (eind[2][1],)
+    
+    if begin and eind:
+        return 'datum', 'tussen', (begin[0], eind[1])
+    if begin:
+        return 'datum', '>=', (begin[0],)
+    return 'datum', '<=', (eind[1],)
+
+def categorie_filter(waarde):
+    """categorie:Boodschappen or categorie:"Vaste lasten" (not case-sensitive)"""
+    if not waarde:
+        raise ValueError('Lege categorie in categorie:')
+    return 'categorie', '=', (waarde,)
+
+def code_filter(waarde):
+    """code:BA"""
+    return 'code', '=', (waarde.upper(),)
+
+def tegenrekening_filter(waarde):
+    """tegenrekening:NL12INGB0001234567, or tegenrekening:NL12* for every account starting with NL12"""
+    rekening = waarde.replace(' ', '').upper()
+    if rekening.endswith('*'):
+        prefix = rekening.rstrip('*')
+        if not prefix:
+            raise ValueError(f"Lege tegenrekening in tegenrekening:{waarde}")
+        # Range on the index: everything from the prefix up to the next prefix
+        return 'tegenrekening', 'begint', (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+    return 'tegenrekening', '=', (rekening,)
+
+# Field name -> function that turns the value into (veld, operator, parameters)
+VELDEN = {
+    'bedrag': bedrag_filter,
+    'datum': datum_filter,
+    'categorie': categorie_filter,
+    'code': code_filter,
+    'tegenrekening': tegenrekening_filter
+}
@@ -8,6 +8,18 @@ class TransactionsManager {
         this.currentSort = null;
         this.currentOrder = null;
         this.searchTerm = null;
+        this.hiddenColumns = new Set();
+        
+        // Keyset paginering: cursor van de volgende pagina (null na de laatste)
+        this.nextCursor = null;
+        this.loadingPage = false;
+        this.pageObserver = null;
+        
+        // Categorie wijzigingen: per transactie de laatste keuze, samen verstuurd na een korte pauze
+        this.pendingCategories = new Map();
+        this.categoryFlushDelay = 500;
+        this.categoryFlushTimer = null;
+        this.flushingCategories = false;
         
         this.init();
     }
@@ -29,6 +41,7 @@ class TransactionsManager {
         this.setupCategoryUpdateHandlers();
         this.setupColumnToggleHandlers();
         this.setupSearchForm();
+        this.setupInfiniteScroll();
         
         console.log('Transactions module initialized');
     }
@@ -117,63 +130,136 @@ class TransactionsManager {
     }
 
     setupCategoryUpdateHandlers() {
-        const categorySelects = document.querySelectorAll('.categorie-select');
+        const tbody = document.querySelector('#transactiesTable tbody');
+        if (!tbody) return;
         
-        categorySelects.forEach(select => {
-            // Remove any existing onchange attributes
-            select.removeAttribute('onchange');
-            
-            select.addEventListener('change', (e) => {
-                this.updateCategorie(e.target);
-            });
+        // Eén handler op de tabel, zodat ook rijen die bij het scrollen geladen worden meedoen
+        tbody.addEventListener('change', (e) => {
+            if (e.target.classList.contains('categorie-select')) {
+                this.queueCategorie(e.target);
+            }
+        });
+        
+        // Wachtrij nog versturen als de pagina verdwijnt (sluiten, sorteren, zoeken, ander tabblad)
+        window.addEventListener('pagehide', () => this.flushCategoriesOnUnload());
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'hidden') {
+                this.flushCategoriesOnUnload();
+            }
         });
     }
 
-    async updateCategorie(selectElement) {
-        const transactieId = selectElement.getAttribute('data-transactie-id');
-        const categorieId = selectElement.value;
-        
-        // Show loading state
-        const originalBackgroundColor = selectElement.style.backgroundColor;
+    queueCategorie(selectElement) {
+        // Nog een wijziging van dezelfde rij vervangt de vorige in de wachtrij
+        this.pendingCategories.set(selectElement.getAttribute('data-transactie-id'), selectElement);
         selectElement.style.backgroundColor = '#fff3cd';
-        selectElement.disabled = true;
         
+        clearTimeout(this.categoryFlushTimer);
+        this.categoryFlushTimer = setTimeout(() => this.flushCategories(), this.categoryFlushDelay);
+    }
+
+    takePendingCategories() {
+        clearTimeout(this.categoryFlushTimer);
+        this.categoryFlushTimer = null;
+        
+        const changes = Array.from(this.pendingCategories, ([transactieId, select]) => ({
+            select,
+            transactieId,
+            categorieId: select.value
+        }));
+        this.pendingCategories.clear();
+        return changes;
+    }
+
+    async flushCategories() {
+        // Eén verzending tegelijk; wat intussen gewijzigd wordt gaat mee met de volgende
+        if (this.flushingCategories || this.pendingCategories.size === 0) return;
+        this.flushingCategories = true;
+        
+        const changes = this.takePendingCategories();
         UI.showLoading('loadingIndicator');
         
         try {
-            const formData = `transactie_id=${transactieId}&categorie_id=${categorieId}`;
-            const response = await API.postForm('/transactions/update-categorie', formData);
+            const data = await API.post('/transactions/update-categorien', {
+                wijzigingen: changes.map(change => [
+                    Number(change.transactieId),
+                    change.categorieId === '' ? null : Number(change.categorieId)
+                ])
+            });
             
-            if (response.ok) {
-                // Success state
-                selectElement.style.backgroundColor = '#d4edda';
-                
-                // Reset after animation
-                setTimeout(() => {
-                    selectElement.style.backgroundColor = originalBackgroundColor;
-                }, 1500);
-                
-                console.log(`Category updated for transaction ${transactieId}`);
-            } else {
-                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
-            }
+            changes.forEach(change => {
+                this.markCategorieSaved(change.select, change.categorieId);
+                // Success state, tenzij de rij alweer gewijzigd is
+                if (!this.pendingCategories.has(change.transactieId)) {
+                    this.flashSelect(change.select, '#d4edda', 1500);
+                }
+            });
             
+            console.log(`Category updated for ${data.bijgewerkt} transactions`);
         } catch (error) {
-            // Error state
-            selectElement.style.backgroundColor = '#f8d7da';
-            selectElement.selectedIndex = 0; // Reset to "Geen categorie"
+            changes.forEach(change => {
+                if (!this.pendingCategories.has(change.transactieId)) {
+                    // Error state: terug naar de laatst opgeslagen categorie
+                    change.select.value = this.savedCategorie(change.select);
+                    this.flashSelect(change.select, '#f8d7da', 3000);
+                }
+            });
             
             ErrorHandler.handle(error, 'Category update');
-            
-            // Reset na 3 seconden
-            setTimeout(() => {
-                selectElement.style.backgroundColor = originalBackgroundColor;
-            }, 3000);
-            
         } finally {
-            selectElement.disabled = false;
+            this.flushingCategories = false;
             UI.hideLoading('loadingIndicator');
         }
+        
+        if (this.pendingCategories.size > 0 && !this.categoryFlushTimer) {
+            this.categoryFlushTimer = setTimeout(() => this.flushCategories(), this.categoryFlushDelay);
+        }
+    }
+
+    flushCategoriesOnUnload() {
+        if (this.pendingCategories.size === 0) return;
+        
+        // sendBeacon wordt ook na het sluiten van de pagina nog verstuurd
+        const changes = this.takePendingCategories();
+        const body = JSON.stringify({
+            wijzigingen: changes.map(change => [
+                Number(change.transactieId),
+                change.categorieId === '' ? null : Number(change.categorieId)
+            ])
+        });
+        navigator.sendBeacon('/transactions/update-categorien', new Blob([body], { type: 'application/json' }));
+        
+        // De pagina kan terugkomen (ander tabblad, back/forward cache)
+        changes.forEach(change => {
+            this.markCategorieSaved(change.select, change.categorieId);
+            change.select.style.backgroundColor = '';
+        });
+    }
+
+    savedCategorie(selectElement) {
+        // De opgeslagen categorie is de optie met het selected attribuut
+        const option = Array.from(selectElement.options).find(option => option.defaultSelected);
+        return option ? option.value : '';
+    }
+
+    markCategorieSaved(selectElement, categorieId) {
+        // Het selected attribuut kan de keuze verzetten; de huidige waarde blijft staan
+        const value = selectElement.value;
+        Array.from(selectElement.options).forEach(option => {
+            option.defaultSelected = option.value === categorieId;
+        });
+        selectElement.value = value;
+    }
+
+    flashSelect(selectElement, color, duration) {
+        selectElement.style.backgroundColor = color;
+        
+        // Reset na de animatie, tenzij de rij intussen weer in de wachtrij staat
+        setTimeout(() => {
+            if (!this.pendingCategories.has(selectElement.getAttribute('data-transactie-id'))) {
+                selectElement.style.backgroundColor = '';
+            }
+        }, duration);
     }
 
     setupColumnToggleHandlers() {
@@ -203,6 +289,13 @@ class TransactionsManager {
             col.style.display = isHidden ? '' : 'none';
         });
         
+        // Onthouden voor rijen die later geladen worden
+        if (isHidden) {
+            this.hiddenColumns.delete(columnClass);
+        } else {
+            this.hiddenColumns.add(columnClass);
+        }
+        
         // Update button icon
         const icon = buttonElement.querySelector('i');
         if (icon) {
@@ -264,6 +357,106 @@ class TransactionsManager {
         }
     }
 
+    setupInfiniteScroll() {
+        this.table = document.getElementById('transactiesTable');
+        this.pageSentinel = document.getElementById('meerTransacties');
+        if (!this.table || !this.pageSentinel || !this.pageSentinel.dataset.volgende) return;
+        
+        this.nextCursor = this.pageSentinel.dataset.volgende;
+        
+        // Volgende pagina laden zodra het einde van de tabel in beeld komt
+        this.pageObserver = new IntersectionObserver((entries) => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                this.loadNextPage();
+            }
+        }, { rootMargin: '400px' });
+        this.pageObserver.observe(this.pageSentinel);
+    }
+
+    async loadNextPage() {
+        if (this.loadingPage || !this.nextCursor) return;
+        this.loadingPage = true;
+        
+        // Zelfde zoekopdracht en sortering als de pagina, na de laatste geladen rij
+        const urlParams = new URLSearchParams(window.location.search);
+        urlParams.set('na', this.nextCursor);
+        
+        try {
+            const data = await API.get('/transactions/pagina?' + urlParams.toString());
+            
+            const fragment = document.createDocumentFragment();
+            data.transacties.forEach(transactie => fragment.appendChild(this.buildRow(transactie)));
+            this.table.querySelector('tbody').appendChild(fragment);
+            
+            this.nextCursor = data.volgende;
+        } catch (error) {
+            ErrorHandler.handle(error, 'Load transactions');
+            this.nextCursor = null;
+        } finally {
+            this.loadingPage = false;
+        }
+        
+        if (this.nextCursor) {
+            // Opnieuw observeren, zodat een sentinel die nog in beeld is direct weer laadt
+            this.pageObserver.unobserve(this.pageSentinel);
+            this.pageObserver.observe(this.pageSentinel);
+        } else {
+            this.pageObserver.disconnect();
+            this.pageSentinel.classList.add('d-none');
+        }
+    }
+
+    buildRow(transactie) {
+        // Zelfde opbouw als de rijen in transacties.html
+        const row = document.createElement('tr');
+        const addCell = (className) => {
+            const cell = document.createElement('td');
+            if (className) {
+                cell.className = className;
+                if (this.hiddenColumns.has(className.replace('-col', ''))) {
+                    cell.style.display = 'none';
+                }
+            }
+            row.appendChild(cell);
+            return cell;
+        };
+        const addText = (cell, tagName, className, text) => {
+            const element = document.createElement(tagName);
+            element.className = className;
+            element.textContent = text;
+            cell.appendChild(element);
+            return element;
+        };
+        
+        addCell().textContent = transactie.datum;
+        addCell().textContent = transactie.naam;
+        addText(addCell(), 'span', transactie.bedrag >= 0 ? 'transaction-positive' : 'transaction-negative',
+                `€${transactie.bedrag.toFixed(2)}`);
+        addText(addCell(), 'span', 'badge bg-secondary', transactie.code);
+        addText(addCell('tegenrekening-col'), 'small', 'text-muted', transactie.tegenrekening || '-');
+        
+        const mededelingen = transactie.mededelingen;
+        const mededelingenText = addText(addCell('mededelingen-col'), 'small', 'text-muted',
+            mededelingen ? mededelingen.slice(0, 50) + (mededelingen.length > 50 ? '...' : '') : '-');
+        if (mededelingen) {
+            mededelingenText.title = mededelingen;
+        }
+        
+        addText(addCell(), 'small', 'text-muted',
+                transactie.saldo === null ? '-' : `€${transactie.saldo.toFixed(2)}`);
+        
+        // Categorie dropdown: kopie van een bestaande, met de opties uit de template
+        const select = document.querySelector('#transactiesTable .categorie-select').cloneNode(true);
+        select.setAttribute('data-transactie-id', transactie.id);
+        this.markCategorieSaved(select, transactie.categorie_id === null ? '' : String(transactie.categorie_id));
+        select.value = this.savedCategorie(select);
+        select.disabled = false;
+        select.style.backgroundColor = '';
+        addCell().appendChild(select);
+        
+        return row;
+    }
+
     // Public methods voor externe gebruik
     refreshTable() {
         window.location.reload();